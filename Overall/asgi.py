@@ -2,6 +2,8 @@
 ASGI config for Overall project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django, WebSockets go to the chat consumers (chat/routing.py),
+and lifespan shutdown flushes the chat messages not yet written.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -13,4 +15,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Overall.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from chat.routing import lifespan_application, websocket_application  # noqa: E402  (needs apps loaded)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await lifespan_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
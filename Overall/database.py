@@ -0,0 +1,187 @@
+"""
+Environment driven DATABASES.
+
+    DB_ENGINE=sqlite (default) | mysql | postgres
+    DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+    DB_CONN_MAX_AGE        seconds a connection is reused (server databases, default 60)
+    DB_CONN_HEALTH_CHECKS  1/0, ping reused connections first (default 1)
+    DB_POOL                1/0, psycopg connection pool (postgres only)
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
+    DB_SQLITE_TIMEOUT      seconds a writer waits for the lock (default 20)
+
+    DB_REPLICA_NAME / DB_REPLICA_HOST / DB_REPLICA_PORT / DB_REPLICA_USER /
+    DB_REPLICA_PASSWORD    adds a read-only 'replica' alias (unset values
+                           default to the primary's). With SQLite,
+                           DB_REPLICA_NAME is a second file refreshed by
+                           `manage.py sync_replica`.
+
+SQLite runs in WAL mode: readers never block the writer and the writer
+never blocks readers. Transactions start with BEGIN IMMEDIATE, so a
+transaction that reads before it writes takes the write lock up front and
+waits (busy_timeout) instead of failing with "database is locked" when
+another worker process wrote first.
+"""
+import os
+
+
+SQLITE = 'sqlite'
+MYSQL = 'mysql'
+POSTGRES = 'postgres'
+
+ENGINES = {
+    SQLITE: 'django.db.backends.sqlite3',
+    MYSQL: 'django.db.backends.mysql',
+    POSTGRES: 'django.db.backends.postgresql',
+}
+
+# Oldest mysqlclient Django 6.0 accepts, see _use_pymysql()
+MYSQLCLIENT_MIN_VERSION = (2, 2, 1)
+
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    # Durable on checkpoint, not on every commit (safe with WAL)
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = {busy_timeout}',
+    'PRAGMA mmap_size = 134217728',
+    'PRAGMA cache_size = -20000',
+    'PRAGMA temp_store = MEMORY',
+]
+
+
+def _flag(env, name, default):
+    value = env.get(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _int(env, name, default):
+    value = env.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _use_pymysql():
+    """
+    Let PyMySQL (req.txt) stand in for mysqlclient when that is not installed
+    """
+    try:
+        import MySQLdb  # noqa: F401
+    except ImportError:
+        import pymysql
+        # Django 6.0 (req.txt) refuses mysqlclient older than 2.2.1 and
+        # PyMySQL 1.1 reports itself as mysqlclient 1.4.6. Drop this once
+        # PyMySQL reports 2.2.1 or newer, or when moving to mysqlclient.
+        if pymysql.version_info[:3] < MYSQLCLIENT_MIN_VERSION:
+            pymysql.version_info = (*MYSQLCLIENT_MIN_VERSION, 'final', 0)
+        pymysql.install_as_MySQLdb()
+
+
+def sqlite_config(env, base_dir):
+    timeout = _int(env, 'DB_SQLITE_TIMEOUT', 20)
+    return {
+        'ENGINE': ENGINES[SQLITE],
+        'NAME': env.get('DB_NAME') or base_dir / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': '; '.join(SQLITE_PRAGMAS).format(busy_timeout=timeout * 1000),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': timeout,
+        },
+    }
+
+
+def server_config(engine, env):
+    config = {
+        'ENGINE': ENGINES[engine],
+        'NAME': env.get('DB_NAME', ''),
+        'USER': env.get('DB_USER', ''),
+        'PASSWORD': env.get('DB_PASSWORD', ''),
+        'HOST': env.get('DB_HOST', 'localhost'),
+        'PORT': env.get('DB_PORT', ''),
+        'CONN_MAX_AGE': _int(env, 'DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': _flag(env, 'DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {},
+    }
+
+    if engine == MYSQL:
+        _use_pymysql()
+        config['OPTIONS'] = {
+            'charset': 'utf8mb4',
+            'init_command': "SET sql_mode = 'STRICT_TRANS_TABLES'",
+            # SKIP LOCKED job claims and fewer gap locks
+            'isolation_level': 'read committed',
+        }
+
+    if engine == POSTGRES and _flag(env, 'DB_POOL', False):
+        config['OPTIONS']['pool'] = {
+            'min_size': _int(env, 'DB_POOL_MIN_SIZE', 2),
+            'max_size': _int(env, 'DB_POOL_MAX_SIZE', 10),
+        }
+        # The pool owns connection reuse; Django refuses both together
+        config['CONN_MAX_AGE'] = 0
+
+    return config
+
+
+def replica_config(engine, primary, env):
+    if engine == SQLITE:
+        # Read-only connection to a plain (non WAL) copy: no -wal/-shm files,
+        # so sync_replica can swap the file underneath it
+        return {
+            'ENGINE': ENGINES[SQLITE],
+            'NAME': f"file:{env['DB_REPLICA_NAME']}?mode=ro",
+            'OPTIONS': {'uri': True, 'timeout': primary['OPTIONS']['timeout']},
+            'TEST': {'MIRROR': 'default'},
+        }
+
+    replica = {**primary, 'OPTIONS': dict(primary['OPTIONS']), 'TEST': {'MIRROR': 'default'}}
+    for key in ('NAME', 'HOST', 'PORT', 'USER', 'PASSWORD'):
+        value = env.get(f'DB_REPLICA_{key}')
+        if value:
+            replica[key] = value
+    return replica
+
+
+def database_config(base_dir, env=None):
+    env = os.environ if env is None else env
+    engine = (env.get('DB_ENGINE') or SQLITE).strip().lower()
+    if engine not in ENGINES:
+        raise ValueError(f"DB_ENGINE must be one of {', '.join(ENGINES)}, not '{engine}'.")
+
+    if engine == SQLITE:
+        databases = {'default': sqlite_config(env, base_dir)}
+        has_replica = bool(env.get('DB_REPLICA_NAME'))
+    else:
+        databases = {'default': server_config(engine, env)}
+        has_replica = any(env.get(f'DB_REPLICA_{key}') for key in ('NAME', 'HOST', 'PORT'))
+
+    if has_replica:
+        databases['replica'] = replica_config(engine, databases['default'], env)
+    return databases
+
+
+def describe(config):
+    """
+    One line summary of a DATABASES entry, for `manage.py check --deploy`
+    """
+    engine = config['ENGINE'].rsplit('.', 1)[-1]
+    options = config.get('OPTIONS', {})
+
+    if engine == 'sqlite3':
+        if options.get('uri') and 'mode=ro' in str(config['NAME']):
+            return f"sqlite {config['NAME']} (read-only copy)"
+        wal = 'journal_mode = WAL' in options.get('init_command', '')
+        return (
+            f"sqlite {config['NAME']} ("
+            f"{'WAL' if wal else 'rollback journal'}, "
+            f"transaction_mode={options.get('transaction_mode') or 'DEFERRED'}, "
+            f"timeout={options.get('timeout', 5)}s)"
+        )
+
+    location = f"{config.get('HOST') or 'localhost'}:{config.get('PORT') or 'default'}/{config.get('NAME')}"
+    pool = options.get('pool')
+    if pool:
+        reuse = f"pool {pool.get('min_size')}-{pool.get('max_size')}" if isinstance(pool, dict) else 'pool'
+    else:
+        reuse = f"CONN_MAX_AGE={config.get('CONN_MAX_AGE', 0)}"
+    checks = 'on' if config.get('CONN_HEALTH_CHECKS') else 'off'
+    return f"{engine} {location} ({reuse}, health checks {checks})"
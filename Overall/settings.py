@@ -1,4 +1,5 @@
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -29,6 +30,7 @@ EXTERNAL_APPS = [
     'chat',
     'homecontrol',
     'finance',
+    'search',
     'mathfilters',
 ]
 
@@ -39,11 +41,14 @@ INSTALLED_APPS += EXTERNAL_APPS
 
 # -------- MiddleWare ----------
 MIDDLEWARE = [
+    'homecontrol.metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'homecontrol.audit.CurrentUserMiddleware',
+    'homecontrol.replicas.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -52,7 +57,8 @@ ROOT_URLCONF = 'Overall.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that adds render time to the request metrics
+        'BACKEND': 'homecontrol.metrics.TimedTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -70,25 +76,65 @@ WSGI_APPLICATION = 'Overall.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+# Configured from DB_* environment variables, see Overall/database.py
+# (SQLite in WAL mode by default; DB_ENGINE=mysql / postgres for a server)
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+from .database import database_config
+
+DATABASES = database_config(BASE_DIR)
+
+# Finance / chat reads inside @replica_reads views go to 'replica' when
+# configured; a user who just wrote reads from the primary for
+# REPLICA_PIN_SECONDS (homecontrol/replicas.py)
+DATABASE_ROUTERS = ['homecontrol.replicas.ReplicaRouter']
+REPLICA_APPS = ('finance', 'chat')
+REPLICA_PIN_SECONDS = 15
+
+# Async views run their independent queries in parallel threads, one
+# connection each (homecontrol/concurrency.py), on server databases only;
+# False runs them in turn everywhere
+CONCURRENT_QUERIES = True
+
+
+
+# Cache
+# Dashboard / debt summary contexts are cached per user, see finance/cache.py.
+# The cache is shared by every worker process (a write bumps the user's
+# version for all of them): files on this host by default, Redis
+# (CACHE_REDIS_URL, needs the redis package) when workers span hosts.
+
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+            # One entry per user and page / report: the default 300 would
+            # cull all the time
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
+FINANCE_CACHE_TIMEOUT = 60 * 60
+
+# Part of every ETag (homecontrol/conditional.py): a new release re-renders
+# pages the browsers hold
+ETAG_SALT = os.environ.get('RELEASE', '')
+
 
 
-# DATABASES = {
-#     "default": {
-#         "ENGINE": "django.db.backends.mysql",
-#         "NAME": "u482774181_Django",
-#         "USER": "u482774181_max",
-#         "PASSWORD": "Tmax@0311",
-#         "HOST": "kuldeepsaini.in",
-#         "PORT": "3306",
-#     }
-# }
+# Email
+# Report mails are sent by the job workers (manage.py run_workers)
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+DEFAULT_FROM_EMAIL = 'reports@kuldeepsaini.in'
 
 
 
@@ -131,3 +177,56 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+
+
+# Chat
+# WebSocket fan-out layer and batched message writes, see chat/consumers.py
+
+CHAT_CHANNEL_LAYER = 'chat.channel_layer.InMemoryChannelLayer'
+CHAT_BATCH_SIZE = 100
+CHAT_BATCH_INTERVAL = 0.25
+
+
+
+# Search
+# 'auto' uses SQLite FTS5 when available, else the SearchPosting table ('fts5' / 'table' to force)
+
+SEARCH_BACKEND = 'auto'
+
+
+
+# Audit
+# Field diffs of Expense / Debt, written by a background thread in batches (homecontrol/changelog.py)
+
+CHANGELOG_ENABLED = True
+CHANGELOG_BATCH_SIZE = 200
+CHANGELOG_FLUSH_INTERVAL = 2.0
+
+
+
+# Metrics
+# Per-view query count / SQL / render time: Server-Timing headers and /metrics (homecontrol/metrics.py).
+# A view running more queries than its budget logs a warning, and fails the tests (BudgetTestRunner).
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+QUERY_BUDGETS = {
+    'finance:finance_dashboard': 7,
+    'finance:exp_list': 6,
+    'finance:debt_list': 5,
+    'finance:debt_info': 6,
+    'finance:report': 5,
+    'finance:report_api': 5,
+    'finance:chart_spend': 5,
+    'finance:chart_categories': 5,
+    'chat:chat_index': 5,
+    'chat:conversations_api': 5,
+    'chat:messages_api': 6,
+}
+QUERY_BUDGETS_RAISE = False
+
+TEST_RUNNER = 'homecontrol.metrics.BudgetTestRunner'
+
+# Perf data (homecontrol/perfdata.py) raw-deletes and bulk-writes users:
+# only on a scratch database. manage.py benchmark uses test databases.
+PERF_DATA_ALLOWED = os.environ.get('PERF_DATA_ALLOWED') == '1'
@@ -1,13 +1,16 @@
 
 from django.contrib import admin
 from django.urls import path, include
+from homecontrol import views as home_views
 
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', home_views.metrics, name='metrics'),
     path('', include('homecontrol.urls')),
     path('chat/', include('chat.urls')),
     path('finance/', include('finance.urls')),
+    path('search/', include('search.urls')),
 
 ]
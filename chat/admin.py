@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import ConversationMember
 
 # Register your models here.
+
+@admin.register(ConversationMember)
+class ConversationMemberList(admin.ModelAdmin):
+    list_display = ('conversation', 'user', 'unread_count', 'last_read_message', 'last_message')
+    list_select_related = ('conversation', 'user', 'last_read_message', 'last_message')
+    raw_id_fields = ('last_read_message', 'last_message')
@@ -0,0 +1,72 @@
+"""
+In-process pub/sub for chat fan-out.
+
+The API mirrors the channels layer one (new_channel / group_add /
+group_discard / group_send / receive), so a Redis backed layer can replace
+it later through the CHAT_CHANNEL_LAYER setting without touching the
+consumer. This one only fans out inside a single worker process.
+"""
+import asyncio
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+DEFAULT_CHANNEL_CAPACITY = 100
+
+
+class InMemoryChannelLayer:
+
+    def __init__(self, capacity=DEFAULT_CHANNEL_CAPACITY):
+        self.capacity = capacity
+        self.channels = {}
+        self.groups = defaultdict(set)
+
+    async def new_channel(self, prefix='chat'):
+        name = f'{prefix}.{uuid.uuid4().hex}'
+        self.channels[name] = asyncio.Queue(maxsize=self.capacity)
+        return name
+
+    async def group_add(self, group, channel):
+        self.groups[group].add(channel)
+
+    async def group_discard(self, group, channel):
+        members = self.groups.get(group)
+        if members is None:
+            return
+        members.discard(channel)
+        if not members:
+            del self.groups[group]
+
+    async def close_channel(self, channel):
+        self.channels.pop(channel, None)
+
+    async def send(self, channel, message):
+        queue = self.channels.get(channel)
+        if queue is None:
+            return
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A stalled client must not grow memory without bound
+            pass
+
+    async def group_send(self, group, message):
+        for channel in list(self.groups.get(group, ())):
+            await self.send(channel, message)
+
+    async def receive(self, channel):
+        return await self.channels[channel].get()
+
+
+_layer = None
+
+
+def get_channel_layer():
+    global _layer
+    if _layer is None:
+        path = getattr(settings, 'CHAT_CHANNEL_LAYER', 'chat.channel_layer.InMemoryChannelLayer')
+        _layer = import_string(path)()
+    return _layer
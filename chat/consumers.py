@@ -0,0 +1,169 @@
+"""
+Raw ASGI WebSocket consumer for conversations.
+
+    ws://<host>/ws/chat/<conversation_id>/
+
+Client -> server: {"message": "..."}
+Server -> client: {"type": "chat.message", "conversation": id,
+                   "sender": id, "sender_name": "...", "message": "...",
+                   "created_at": "..."}
+
+An idle connection is just a coroutine waiting on two queues, so a worker
+can hold thousands of them without any polling.
+"""
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from urllib.parse import urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from .channel_layer import get_channel_layer
+from .models import Conversation
+from .persistence import get_batcher
+
+
+MAX_MESSAGE_LENGTH = 4000
+
+
+def conversation_group(conversation_id):
+    return f'conversation.{conversation_id}'
+
+
+class _SessionRequest:
+    """
+    Just enough of a request for django.contrib.auth.get_user()
+    """
+    def __init__(self, session):
+        self.session = session
+
+
+def _headers(scope):
+    return {k.decode('latin1'): v.decode('latin1') for k, v in scope.get('headers', [])}
+
+
+def _load_user(session_key):
+    engine = import_string(settings.SESSION_ENGINE)
+    session = engine.SessionStore(session_key)
+    return get_user(_SessionRequest(session))
+
+
+def _conversation_members(conversation_id, user):
+    """
+    Member ids of the conversation, None if `user` is not one of them
+    """
+    conversation = (
+        Conversation.objects
+        .filter(pk=conversation_id, users=user)
+        .only('id', 'is_group')
+        .first()
+    )
+    if conversation is None:
+        return None, None
+    return conversation, list(conversation.users.values_list('id', flat=True))
+
+
+class ChatConsumer:
+
+    def __init__(self, scope, receive, send, conversation_id):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.conversation_id = conversation_id
+        self.group = conversation_group(conversation_id)
+        self.layer = get_channel_layer()
+        self.channel = None
+        self.user = None
+
+    async def __call__(self):
+        message = await self.receive()
+        if message['type'] != 'websocket.connect':
+            return
+
+        if not await self.authorize():
+            await self.send({'type': 'websocket.close', 'code': 4403})
+            return
+
+        self.channel = await self.layer.new_channel()
+        await self.layer.group_add(self.group, self.channel)
+        await self.send({'type': 'websocket.accept'})
+
+        client = asyncio.ensure_future(self.client_loop())
+        fanout = asyncio.ensure_future(self.fanout_loop())
+        try:
+            await asyncio.wait([client, fanout], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            client.cancel()
+            fanout.cancel()
+            await self.layer.group_discard(self.group, self.channel)
+            await self.layer.close_channel(self.channel)
+
+    async def authorize(self):
+        headers = _headers(self.scope)
+
+        # Cross-site WebSocket hijacking: browsers always send Origin
+        origin = headers.get('origin')
+        if origin and urlparse(origin).netloc != headers.get('host'):
+            return False
+
+        cookies = SimpleCookie(headers.get('cookie', ''))
+        morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+        if morsel is None:
+            return False
+
+        user = await sync_to_async(_load_user)(morsel.value)
+        if not user.is_authenticated:
+            return False
+
+        conversation, members = await sync_to_async(_conversation_members)(self.conversation_id, user)
+        if conversation is None:
+            return False
+
+        self.user = user
+        self.is_group = conversation.is_group
+        self.other_members = [pk for pk in members if pk != user.pk]
+        return True
+
+    async def client_loop(self):
+        while True:
+            message = await self.receive()
+
+            if message['type'] == 'websocket.disconnect':
+                return
+
+            if message['type'] == 'websocket.receive':
+                await self.handle_text(message.get('text') or '')
+
+    async def handle_text(self, text):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(data, dict):
+            return
+
+        chat = str(data.get('message') or '').strip()[:MAX_MESSAGE_LENGTH]
+        if not chat:
+            return
+
+        # Group messages have no single receiver; the model requires one
+        receiver_id = self.user.pk if self.is_group or not self.other_members else self.other_members[0]
+
+        await self.layer.group_send(self.group, {
+            'type': 'chat.message',
+            'conversation': self.conversation_id,
+            'sender': self.user.pk,
+            'sender_name': self.user.get_username(),
+            'message': chat,
+            'created_at': now().isoformat(),
+        })
+        await get_batcher().add(self.conversation_id, self.user.pk, receiver_id, chat)
+
+    async def fanout_loop(self):
+        while True:
+            event = await self.layer.receive(self.channel)
+            await self.send({'type': 'websocket.send', 'text': json.dumps(event)})
@@ -0,0 +1,83 @@
+"""
+Message history and conversation list queries.
+
+History uses keyset pagination on (created_at, id) backed by the
+(chat_conversation, created_at) index, so loading any page of a conversation
+costs the same whatever its size. The conversation list is read from the
+per-user ConversationMember rows (conversations created before that table
+need `manage.py backfill_conversation_members` once).
+"""
+from django.db.models import F, OuterRef, Q, Subquery
+
+from .models import Chats, ConversationMember
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def message_page(conversation_id, before=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Up to `limit` messages older than message `before` (newest page when
+    None), returned oldest first, plus the id to pass as the next `before`
+    """
+    qs = (
+        Chats.objects
+        .filter(chat_conversation_id=conversation_id)
+        .order_by('-created_at', '-id')
+    )
+
+    if before is not None:
+        # Resolved inside the same query
+        before_created = Subquery(
+            Chats.objects.filter(pk=before, chat_conversation_id=conversation_id).values('created_at')[:1]
+        )
+        qs = qs.filter(
+            Q(created_at__lt=before_created) |
+            Q(created_at=before_created, id__lt=before)
+        )
+
+    rows = list(
+        qs.values('id', 'sender_id', 'sender__username', 'chat', 'is_read', 'created_at')[:limit + 1]
+    )
+
+    next_before = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_before = rows[-1]['id']
+
+    rows.reverse()
+    return rows, next_before
+
+
+def conversation_list(user):
+    """
+    User's conversations with last message and unread count, newest first.
+    Reads the denormalized ConversationMember rows (chat/inbox.py), so there
+    is no COUNT or latest-message scan per conversation.
+    """
+    other_member = (
+        ConversationMember.objects
+        .filter(conversation_id=OuterRef('conversation_id'))
+        .exclude(user_id=user.pk)
+        .order_by('user_id')
+        .values('user__username')[:1]
+    )
+
+    return list(
+        ConversationMember.objects
+        .filter(user=user)
+        .annotate(
+            other_username=Subquery(other_member),
+            is_group=F('conversation__is_group'),
+            group_name=F('conversation__group_name'),
+            last_message_text=F('last_message__chat'),
+            last_message_at=F('last_message__created_at'),
+        )
+        .order_by(F('last_message_id').desc(nulls_last=True), '-conversation_id')
+        .values(
+            'conversation_id', 'is_group', 'group_name', 'other_username',
+            'last_message_id', 'last_message_text', 'last_message_at',
+            'last_read_message_id', 'unread_count',
+        )
+    )
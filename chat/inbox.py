@@ -0,0 +1,175 @@
+"""
+Keeps ConversationMember counters in sync with Chats.
+
+Every write goes through here: sending a message bumps the other members'
+unread_count, moves the sender's read pointer to it and everyone's
+last_message in the same transaction, and
+mark_read() moves a member's read pointer with one bulk UPDATE.
+rebuild_members() recomputes them from Chats for conversations that
+predate the table (`manage.py backfill_conversation_members`).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils.timezone import now
+
+from .models import Conversation, ConversationMember, Chats
+
+
+def ensure_members(conversation_id, user_ids):
+    ConversationMember.objects.bulk_create(
+        [ConversationMember(conversation_id=conversation_id, user_id=pk) for pk in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def _record(conversation_id, messages):
+    """
+    Counters for messages (already saved, sorted by id) of one conversation
+    """
+    last = messages[-1]
+
+    sent_by = defaultdict(list)
+    for message in messages:
+        sent_by[message.sender_id].append(message.pk)
+
+    members = ConversationMember.objects.filter(conversation_id=conversation_id)
+    members.exclude(user_id__in=sent_by).update(unread_count=F('unread_count') + len(messages))
+
+    for sender_id, ids in sent_by.items():
+        # Sending reads the conversation up to the own message: only what
+        # others sent after it in this batch stays unread
+        last_own = max(ids)
+        unread = sum(1 for message in messages if message.sender_id != sender_id and message.pk > last_own)
+        members.filter(user_id=sender_id).update(last_read_message_id=last_own, unread_count=unread)
+
+    members.update(last_message_id=last.pk)
+    Conversation.objects.filter(pk=conversation_id).update(updated_at=now())
+
+
+def send_message(conversation, sender, text, receiver=None):
+    with transaction.atomic():
+        message = Chats.objects.create(
+            chat_conversation=conversation,
+            sender=sender,
+            receiver=receiver or sender,
+            chat=text,
+        )
+        _record(conversation.pk, [message])
+    return message
+
+
+def record_messages(messages):
+    """
+    Counters for a batch of saved messages (e.g. after bulk_create)
+    """
+    by_conversation = defaultdict(list)
+    for message in sorted(messages, key=lambda m: m.pk):
+        by_conversation[message.chat_conversation_id].append(message)
+
+    with transaction.atomic():
+        for conversation_id, conversation_messages in by_conversation.items():
+            _record(conversation_id, conversation_messages)
+
+
+def mark_read(user, conversation_id, up_to_id):
+    """
+    Mark every message up to `up_to_id` as read for `user`
+    """
+    with transaction.atomic():
+        member = (
+            ConversationMember.objects
+            .select_for_update()
+            .filter(user=user, conversation_id=conversation_id)
+            .first()
+        )
+        if member is None or member.last_message_id is None:
+            return member
+
+        # The client's id is only a bound: the pointer moves to the last
+        # message of this conversation at or before it, never past the
+        # latest one (messages arriving later stay unread)
+        up_to_id = (
+            Chats.objects
+            .filter(chat_conversation_id=conversation_id, id__lte=min(up_to_id, member.last_message_id))
+            .order_by('-id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if up_to_id is None:
+            return member
+
+        if member.last_read_message_id and member.last_read_message_id >= up_to_id:
+            return member
+
+        Chats.objects.filter(
+            chat_conversation_id=conversation_id,
+            receiver=user,
+            is_read=False,
+            id__lte=up_to_id,
+        ).update(is_read=True)
+
+        if up_to_id >= member.last_message_id:
+            unread = 0
+        else:
+            unread = (
+                Chats.objects
+                .filter(chat_conversation_id=conversation_id, id__gt=up_to_id)
+                .exclude(sender=user)
+                .count()
+            )
+
+        ConversationMember.objects.filter(pk=member.pk).update(
+            last_read_message_id=up_to_id,
+            unread_count=unread,
+        )
+        member.last_read_message_id = up_to_id
+        member.unread_count = unread
+    return member
+
+
+def _rebuild_conversation(conversation_id, user_ids):
+    ensure_members(conversation_id, user_ids)
+
+    messages = Chats.objects.filter(chat_conversation_id=conversation_id)
+    last_message_id = messages.aggregate(last=Max('id'))['last']
+
+    members = list(ConversationMember.objects.filter(conversation_id=conversation_id, user_id__in=user_ids))
+    for member in members:
+        # Read up to the latest message the user sent or has read
+        member.last_read_message_id = (
+            messages
+            .filter(Q(sender_id=member.user_id) | Q(receiver_id=member.user_id, is_read=True))
+            .aggregate(last=Max('id'))['last']
+        )
+        unread = messages.exclude(sender_id=member.user_id)
+        if member.last_read_message_id:
+            unread = unread.filter(id__gt=member.last_read_message_id)
+        member.unread_count = unread.count()
+        member.last_message_id = last_message_id
+
+    ConversationMember.objects.bulk_update(members, ['last_read_message', 'last_message', 'unread_count'])
+    return len(members)
+
+
+def rebuild_members(conversation_ids=None):
+    """
+    Create the missing ConversationMember rows and recompute every
+    member's counters from Chats. Returns the number of members written.
+    """
+    pairs = Conversation.users.through.objects.order_by('conversation_id')
+    if conversation_ids is not None:
+        pairs = pairs.filter(conversation_id__in=conversation_ids)
+
+    users_of = defaultdict(list)
+    for conversation_id, user_id in pairs.values_list('conversation_id', 'user_id').iterator():
+        users_of[conversation_id].append(user_id)
+
+    written = 0
+    for conversation_id, user_ids in users_of.items():
+        # One transaction per conversation: mark_read / send_message
+        # running meanwhile see either the old or the rebuilt counters
+        with transaction.atomic():
+            written += _rebuild_conversation(conversation_id, user_ids)
+    return written
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from chat.inbox import rebuild_members
+
+
+class Command(BaseCommand):
+    help = "Create ConversationMember rows for existing conversations and recompute their counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversation', type=int, action='append', help="Only this conversation id (repeatable)")
+
+    def handle(self, *args, **options):
+        written = rebuild_members(conversation_ids=options['conversation'])
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {written} conversation members."))
@@ -1,10 +1,51 @@
-from django.db import models
-from homecontrol.models import LogFolder
+from django.db import models, transaction, IntegrityError
+from homecontrol.models import LogFolder, SoftDeleteManager
 from django.contrib.auth.models import User
 import hashlib
+import uuid
 
 
 
+def private_hash(user_a, user_b):
+    """
+    unique_hash of the private conversation between two users (or user ids)
+    """
+    low, high = sorted([getattr(user_a, 'pk', user_a), getattr(user_b, 'pk', user_b)])
+    raw_string = f"{low}_{high}"
+    return hashlib.sha256(raw_string.encode()).hexdigest()
+
+
+class ConversationManager(SoftDeleteManager):
+
+    def get_or_create_private(self, user_a, user_b):
+        """
+        (conversation, created) for the private chat between two users.
+        An existing chat is one indexed lookup on unique_hash.
+        """
+        unique_hash = private_hash(user_a, user_b)
+
+        # all_objects: unique_hash is unique over soft deleted rows too
+        conversation = self.model.all_objects.filter(unique_hash=unique_hash).first()
+        if conversation is not None:
+            if conversation.is_deleted:
+                conversation.restore()
+            return conversation, False
+
+        try:
+            with transaction.atomic():
+                conversation = self.create(is_group=False, unique_hash=unique_hash)
+                # Memberships are created by chat/signals.py
+                conversation.users.add(getattr(user_a, 'pk', user_a), getattr(user_b, 'pk', user_b))
+        except IntegrityError:
+            # Another request created it first, unless a user does not exist
+            conversation = self.model.all_objects.filter(unique_hash=unique_hash).first()
+            if conversation is None:
+                raise
+            return conversation, False
+
+        return conversation, True
+
+
 class Conversation(LogFolder):
     users = models.ManyToManyField(User,related_name='conversations_user')
     is_group = models.BooleanField(default=False, db_index=True)
@@ -12,18 +53,21 @@ class Conversation(LogFolder):
     group_image = models.ImageField(upload_to='chat/groups/', null=True, blank=True)
     unique_hash = models.CharField(max_length=64, unique=True, db_index=True)
 
+    objects = ConversationManager()
+
     class Meta:
         ordering = ['-updated_at']
 
     def __str__(self):
         if self.is_group:
             return f'Group: {self.group_name}'
-        
+        return f'Chat: {", ".join([u.username for u in self.users.all()])}'
+
     def save(self, *args, **kwargs):
-        if not self.is_group and not self.unique_hash:
-            super().save(*args, **kwargs)
-            self.generate_private_hash()
-            # return
+        # Private chats get their pair hash from get_or_create_private();
+        # anything else still needs a unique value
+        if not self.unique_hash:
+            self.unique_hash = uuid.uuid4().hex
 
         super().save(*args, **kwargs)
 
@@ -31,12 +75,10 @@ class Conversation(LogFolder):
         users = list(self.users.values_list('id', flat=True))
 
         if len(users) == 2:
-            users.sort()
-            raw_string = f"{users[0]}_{users[1]}"
-            self.unique_hash = hashlib.sha256(raw_string.encode()).hexdigest()
-            super().save(update_fields=['unique_hash'])
-        
-        return f'Chat: {", ".join([u.username for u in self.users.all()])}'
+            self.unique_hash = private_hash(*users)
+            Conversation.objects.filter(pk=self.pk).update(unique_hash=self.unique_hash)
+
+        return self.unique_hash
 
 
 
@@ -50,7 +92,42 @@ class Chats(LogFolder):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # History of one conversation, newest first (chat/history.py)
+            models.Index(fields=['chat_conversation', 'created_at'], name='chat_conv_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.sender} → {self.receiver} at {self.created_at}'
 
+
+
+class ConversationMember(LogFolder):
+    """
+    Per user, per conversation inbox state. Denormalized so the inbox is an
+    index read with no COUNT queries; maintained by chat/inbox.py.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_memberships')
+
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_message = models.ForeignKey(
+        Chats, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='+'
+    )
+    last_message = models.ForeignKey(
+        Chats, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='+'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='chat_member_unique'),
+        ]
+        indexes = [
+            # Inbox: my conversations, most recent message first
+            models.Index(fields=['user', '-last_message'], name='chat_member_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} in {self.conversation_id} ({self.unread_count} unread)'
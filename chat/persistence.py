@@ -0,0 +1,109 @@
+"""
+Batched persistence of chat messages sent over WebSockets.
+
+Messages are broadcast right away and written to Chats in batches: a batch
+is flushed when it reaches CHAT_BATCH_SIZE messages or CHAT_BATCH_INTERVAL
+seconds after its first message, whichever comes first. On server shutdown
+(the ASGI lifespan event, see chat/routing.py) the pending batch is flushed.
+"""
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from search.index import index_instances, CHAT
+
+from .inbox import record_messages
+from .models import Chats
+
+
+logger = logging.getLogger(__name__)
+
+
+def _write_batch(rows):
+    close_old_connections()
+    messages = [
+        Chats(
+            chat_conversation_id=row['conversation_id'],
+            sender_id=row['sender_id'],
+            receiver_id=row['receiver_id'],
+            chat=row['chat'],
+            # No request context here: the sender is the author
+            created_by_id=row['sender_id'],
+            updated_by_id=row['sender_id'],
+        )
+        for row in rows
+    ]
+
+    with transaction.atomic():
+        # Inbox counters need the new ids
+        if connection.features.can_return_rows_from_bulk_insert:
+            Chats.objects.bulk_create(messages)
+        else:
+            for message in messages:
+                message.save()
+        record_messages(messages)
+        # bulk_create skips the search signals
+        index_instances(CHAT, messages)
+
+
+class MessageBatcher:
+
+    def __init__(self, batch_size=None, interval=None):
+        self.batch_size = batch_size or getattr(settings, 'CHAT_BATCH_SIZE', 100)
+        self.interval = interval or getattr(settings, 'CHAT_BATCH_INTERVAL', 0.25)
+        self.pending = []
+        self._timer = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, conversation_id, sender_id, receiver_id, chat):
+        self.pending.append({
+            'conversation_id': conversation_id,
+            'sender_id': sender_id,
+            'receiver_id': receiver_id,
+            'chat': chat,
+        })
+
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self._timer = None
+        await self.flush()
+
+    async def close(self):
+        # A timer already past its sleep is flushing: flush() waits for it
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            rows, self.pending = self.pending, []
+            if not rows:
+                return
+            try:
+                await sync_to_async(_write_batch, thread_sensitive=True)(rows)
+            except Exception:
+                logger.exception("Could not persist %s chat messages", len(rows))
+
+
+_batcher = None
+
+
+def get_batcher():
+    global _batcher
+    if _batcher is None:
+        _batcher = MessageBatcher()
+    return _batcher
+
+
+async def flush_pending():
+    if _batcher is not None:
+        await _batcher.close()
@@ -0,0 +1,39 @@
+import re
+
+from .consumers import ChatConsumer
+from .persistence import flush_pending
+
+
+WEBSOCKET_ROUTES = [
+    (re.compile(r'^/ws/chat/(?P<conversation_id>\d+)/$'), ChatConsumer),
+]
+
+
+async def websocket_application(scope, receive, send):
+    """
+    ASGI app for every `websocket` scope, see Overall/asgi.py
+    """
+    for pattern, consumer in WEBSOCKET_ROUTES:
+        match = pattern.match(scope['path'])
+        if match:
+            await consumer(scope, receive, send, int(match.group('conversation_id')))()
+            return
+
+    # Unknown path: reject the handshake
+    await receive()
+    await send({'type': 'websocket.close', 'code': 4404})
+
+
+async def lifespan_application(scope, receive, send):
+    """
+    ASGI app for the `lifespan` scope: writes the pending chat batch before
+    the worker exits
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await flush_pending()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
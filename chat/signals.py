@@ -0,0 +1,26 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from .inbox import ensure_members
+from .models import Conversation, ConversationMember
+
+
+@receiver(m2m_changed, sender=Conversation.users.through)
+def conversation_users_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # user.conversations_user.add(conversation)
+        if action == 'post_add':
+            for conversation_id in pk_set:
+                ensure_members(conversation_id, [instance.pk])
+        elif action == 'post_remove':
+            ConversationMember.objects.filter(user=instance, conversation_id__in=pk_set).delete()
+        elif action == 'post_clear':
+            ConversationMember.objects.filter(user=instance).delete()
+        return
+
+    if action == 'post_add':
+        ensure_members(instance.pk, pk_set)
+    elif action == 'post_remove':
+        ConversationMember.objects.filter(conversation=instance, user_id__in=pk_set).delete()
+    elif action == 'post_clear':
+        ConversationMember.objects.filter(conversation=instance).delete()
@@ -1,3 +1,244 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from .inbox import mark_read, record_messages, send_message
+from .models import Chats, Conversation, ConversationMember
+from .persistence import MessageBatcher
+from .routing import lifespan_application, websocket_application
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every chat view in QUERY_BUDGETS requested with a few conversations and
+    messages, so an N+1 shows up as a budget overrun (BudgetTestRunner
+    raises QueryBudgetExceeded from the middleware).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('budget_user', password='x')
+
+        cls.conversations = []
+        for i in range(3):
+            peer = User.objects.create_user(f'budget_peer_{i}', password='x')
+            conversation, _ = Conversation.objects.get_or_create_private(cls.user, peer)
+            for n in range(4):
+                send_message(conversation, peer, f'hello {n}', receiver=cls.user)
+                send_message(conversation, cls.user, f'reply {n}', receiver=peer)
+            cls.conversations.append(conversation)
+
+    budgeted_views = (
+        'chat:chat_index',
+        'chat:conversations_api',
+        'chat:messages_api',
+    )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def url(self, view_name):
+        kwargs = {}
+        if view_name == 'chat:messages_api':
+            kwargs['conversation_id'] = self.conversations[0].pk
+        return reverse(view_name, kwargs=kwargs)
+
+    def test_budgeted_views(self):
+        for view_name in self.budgeted_views:
+            with self.subTest(view=view_name):
+                response = self.client.get(self.url(view_name))
+                self.assertEqual(response.status_code, 200)
+
+    def test_conversation_list_has_every_conversation(self):
+        response = self.client.get(self.url('chat:conversations_api'))
+        self.assertEqual(len(response.json()['conversations']), len(self.conversations))
+
+
+class ChatConsumerTests(TestCase):
+    """
+    The WebSocket consumer driven through raw ASGI messages
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('ws_user', password='x')
+        self.peer = User.objects.create_user('ws_peer', password='x')
+        self.conversation, _ = Conversation.objects.get_or_create_private(self.user, self.peer)
+        self.client.force_login(self.user)
+
+        # A batch per test, never flushed by its timer
+        self.batcher = MessageBatcher(interval=60)
+        patcher = mock.patch('chat.persistence._batcher', self.batcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def communicator(self, conversation_id):
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        return ApplicationCommunicator(websocket_application, {
+            'type': 'websocket',
+            'path': f'/ws/chat/{conversation_id}/',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'cookie', f'{settings.SESSION_COOKIE_NAME}={session}'.encode()),
+            ],
+        })
+
+    async def connect(self, conversation_id):
+        communicator = self.communicator(conversation_id)
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator, await communicator.receive_output()
+
+    async def test_non_members_rejected(self):
+        other = await Conversation.objects.acreate(is_group=True)
+        communicator, message = await self.connect(other.pk)
+        self.assertEqual(message, {'type': 'websocket.close', 'code': 4403})
+
+    async def test_ignores_anything_but_an_object(self):
+        communicator, message = await self.connect(self.conversation.pk)
+        self.assertEqual(message, {'type': 'websocket.accept'})
+
+        for text in ('[1, 2]', '"hello"', '3', 'null', 'not json'):
+            await communicator.send_input({'type': 'websocket.receive', 'text': text})
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps({'message': 'hello'})})
+
+        event = json.loads((await communicator.receive_output())['text'])
+        self.assertEqual((event['sender'], event['message']), (self.user.pk, 'hello'))
+        self.assertEqual(len(self.batcher.pending), 1)
+
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait()
+
+    async def test_pending_batch_written_on_shutdown(self):
+        await self.batcher.add(self.conversation.pk, self.user.pk, self.peer.pk, 'before shutdown')
+        self.assertFalse(await Chats.objects.filter(chat='before shutdown').aexists())
+
+        lifespan = ApplicationCommunicator(lifespan_application, {'type': 'lifespan'})
+        await lifespan.send_input({'type': 'lifespan.startup'})
+        self.assertEqual(await lifespan.receive_output(), {'type': 'lifespan.startup.complete'})
+        await lifespan.send_input({'type': 'lifespan.shutdown'})
+        self.assertEqual(await lifespan.receive_output(), {'type': 'lifespan.shutdown.complete'})
+
+        self.assertTrue(await Chats.objects.filter(chat='before shutdown').aexists())
+        self.assertEqual(self.batcher.pending, [])
+
+
+class InboxTests(TestCase):
+    """
+    ConversationMember counters kept by chat/inbox.py
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('inbox_alice')
+        cls.bob = User.objects.create_user('inbox_bob')
+        cls.conversation, _ = Conversation.objects.get_or_create_private(cls.alice, cls.bob)
+
+    def send(self, sender, receiver, text='hi', conversation=None):
+        return send_message(conversation or self.conversation, sender, text, receiver=receiver)
+
+    def member(self, user, conversation=None):
+        return ConversationMember.objects.get(conversation=conversation or self.conversation, user=user)
+
+    def counters(self):
+        return {
+            member.user_id: (member.unread_count, member.last_read_message_id, member.last_message_id)
+            for member in ConversationMember.objects.filter(conversation=self.conversation)
+        }
+
+    def test_send_increments_unread_of_the_others(self):
+        self.send(self.alice, self.bob)
+        second = self.send(self.alice, self.bob)
+
+        self.assertEqual(self.counters(), {
+            self.alice.pk: (0, second.pk, second.pk),
+            self.bob.pk: (2, None, second.pk),
+        })
+
+        # Replying reads everything before the reply
+        reply = self.send(self.bob, self.alice)
+        self.assertEqual(self.counters(), {
+            self.alice.pk: (1, second.pk, reply.pk),
+            self.bob.pk: (0, reply.pk, reply.pk),
+        })
+
+    def test_batch(self):
+        messages = Chats.objects.bulk_create([
+            Chats(chat_conversation=self.conversation, sender=sender, receiver=receiver, chat='hi')
+            for sender, receiver in (
+                (self.alice, self.bob), (self.bob, self.alice), (self.alice, self.bob), (self.alice, self.bob),
+            )
+        ])
+        record_messages(messages)
+
+        self.assertEqual(self.counters(), {
+            self.alice.pk: (0, messages[3].pk, messages[3].pk),
+            self.bob.pk: (2, messages[1].pk, messages[3].pk),
+        })
+
+    def test_mark_read(self):
+        first = self.send(self.alice, self.bob)
+        second = self.send(self.alice, self.bob)
+
+        member = mark_read(self.bob, self.conversation.pk, first.pk)
+        self.assertEqual((member.unread_count, member.last_read_message_id), (1, first.pk))
+        self.assertEqual(
+            list(Chats.objects.order_by('id').values_list('is_read', flat=True)),
+            [True, False],
+        )
+
+        # Never moves back
+        mark_read(self.bob, self.conversation.pk, first.pk - 1)
+        self.assertEqual(self.member(self.bob).last_read_message_id, first.pk)
+
+        mark_read(self.bob, self.conversation.pk, second.pk)
+        self.assertEqual(self.member(self.bob).unread_count, 0)
+
+    def test_mark_read_clamped_to_the_conversation(self):
+        carol = User.objects.create_user('inbox_carol')
+        other, _ = Conversation.objects.get_or_create_private(self.bob, carol)
+
+        first = self.send(self.alice, self.bob)
+        elsewhere = self.send(carol, self.bob, conversation=other)
+
+        # An id from another conversation, or past the latest message:
+        # only this conversation's messages up to its latest are read
+        member = mark_read(self.bob, self.conversation.pk, elsewhere.pk)
+        self.assertEqual((member.unread_count, member.last_read_message_id), (0, first.pk))
+
+        later = self.send(self.alice, self.bob)
+        member = mark_read(self.bob, self.conversation.pk, 10 ** 9)
+        self.assertEqual((member.unread_count, member.last_read_message_id), (0, later.pk))
+        self.assertEqual(self.member(self.bob, other).unread_count, 1)
+
+    def test_mark_read_before_any_message(self):
+        member = mark_read(self.bob, self.conversation.pk, 10 ** 9)
+        self.assertEqual((member.unread_count, member.last_read_message_id), (0, None))
+
+    def test_backfill(self):
+        self.send(self.alice, self.bob)
+        read = self.send(self.alice, self.bob)
+        self.send(self.bob, self.alice)
+        self.send(self.alice, self.bob)
+        mark_read(self.bob, self.conversation.pk, read.pk)
+        expected = self.counters()
+
+        # Conversations from before the table: no member rows at all
+        ConversationMember.all_objects.all().delete()
+        call_command('backfill_conversation_members', stdout=StringIO())
+        self.assertEqual(self.counters(), expected)
+
+        # Drifted counters are recomputed, only for the given conversation
+        carol = User.objects.create_user('inbox_carol')
+        other, _ = Conversation.objects.get_or_create_private(self.bob, carol)
+        self.send(carol, self.bob, conversation=other)
+        ConversationMember.objects.update(unread_count=7)
 
-# Create your tests here.
+        call_command('backfill_conversation_members', conversation=[self.conversation.pk], stdout=StringIO())
+        self.assertEqual(self.counters(), expected)
+        self.assertEqual(self.member(self.bob, other).unread_count, 7)
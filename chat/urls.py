@@ -4,5 +4,9 @@ from chat import views
 app_name = 'chat'
 
 urlpatterns = [
-    path('', views.chat_index, name='chat_index')
-]
\ No newline at end of file
+    path('', views.chat_index, name='chat_index'),
+    path('start/<int:user_id>/', views.start_private_chat, name='start_private_chat'),
+    path('conversations/', views.conversations_api, name='conversations_api'),
+    path('<int:conversation_id>/messages/', views.messages_api, name='messages_api'),
+    path('<int:conversation_id>/read/', views.mark_read_api, name='mark_read_api'),
+]
@@ -1,14 +1,85 @@
-from django.shortcuts import render
+from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
+from django.http import JsonResponse, Http404
+from django.db import IntegrityError
+from homecontrol.replicas import replica_reads
+
 from .models import Conversation, Chats
-from django.db.models import Q
+from .history import conversation_list, message_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .inbox import mark_read
 
 @login_required
 def chat_index(request):
     context = {}
-    conversations = Chats.objects.filter(Q(sender=request.user) | Q(receiver=request.user)).select_related('user1','user2')
+    context['conversations'] = conversation_list(request.user)
+
+    # Conversation opened over the WebSocket (chat/consumers.py)
+    conversation_id = request.GET.get('c')
+    if conversation_id and conversation_id.isdigit() and Conversation.objects.filter(
+        pk=conversation_id, users=request.user
+    ).exists():
+        context['conversation_id'] = int(conversation_id)
+
     return render(request, 'chat_index.html', context=context)
 
 
+@login_required
+@require_POST
+def start_private_chat(request, user_id):
+    if user_id == request.user.pk:
+        raise Http404("Cannot start a chat with yourself.")
+
+    try:
+        conversation, created = Conversation.objects.get_or_create_private(request.user, user_id)
+    except IntegrityError:
+        # Only reachable when user_id does not exist (FK on the m2m row)
+        raise Http404("User not found.")
+
+    return redirect(f"{reverse('chat:chat_index')}?c={conversation.pk}")
+
+
+@login_required
+@replica_reads()
+def conversations_api(request):
+    return JsonResponse({'conversations': conversation_list(request.user)})
+
+
+@login_required
+@replica_reads()
+def messages_api(request, conversation_id):
+    if not Conversation.objects.filter(pk=conversation_id, users=request.user).exists():
+        raise Http404("Conversation not found.")
+
+    try:
+        before = int(request.GET['before']) if request.GET.get('before') else None
+        limit = int(request.GET.get('limit') or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'before and limit must be integers.'}, status=400)
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows, next_before = message_page(conversation_id, before=before, limit=limit)
+
+    return JsonResponse({
+        'messages': rows,
+        'next_before': next_before,
+    })
+
+
+@require_POST
+@login_required
+def mark_read_api(request, conversation_id):
+    try:
+        up_to = int(request.POST['up_to'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'up_to must be a message id.'}, status=400)
+
+    member = mark_read(request.user, conversation_id, up_to)
+    if member is None:
+        raise Http404("Conversation not found.")
 
- 
\ No newline at end of file
+    return JsonResponse({
+        'last_read_message_id': member.last_read_message_id,
+        'unread_count': member.unread_count,
+    })
@@ -1,20 +1,28 @@
 from django.contrib import admin
+from homecontrol.admin import SoftDeleteAdmin
 from .models import *
 
 
 @admin.register(ExpenseCategory)
-class ExpenseCategoryList(admin.ModelAdmin):
-    list_display = ['name','slug', 'user']
+class ExpenseCategoryList(SoftDeleteAdmin):
+    list_display = ['name','slug', 'user', 'is_deleted']
+    list_filter = ['is_deleted']
 
 
 
 @admin.register(Expense)
-class ExpenseTransactionsList(admin.ModelAdmin):
-    list_display = ['user', 'category', 'amount','payment_mode','expense_date']
+class ExpenseTransactionsList(SoftDeleteAdmin):
+    list_display = ['user', 'category', 'amount','payment_mode','expense_date', 'is_deleted']
+    list_filter = ['is_deleted']
 
 
 @admin.register(Debt)
-class DebtList(admin.ModelAdmin):
-    list_display = ['user', 'name', 'lender','debt_type','interest_rate','principal_amount']
+class DebtList(SoftDeleteAdmin):
+    list_display = ['user', 'name', 'lender','debt_type','interest_rate','principal_amount', 'is_deleted']
+    list_filter = ['is_deleted']
 
 
+@admin.register(ExpenseDailyRollup)
+class ExpenseDailyRollupList(admin.ModelAdmin):
+    list_display = ['user', 'date', 'category', 'payment_mode', 'total', 'count']
+
@@ -0,0 +1,222 @@
+"""
+Amortization schedules for Debt.
+
+All math runs on NumPy int64 arrays in integer paise (1/100 rupee), one row
+per debt, so whole portfolios are computed at once. Rates are integers too,
+in hundredths of a percent (Debt.interest_rate has two decimals), and every
+division rounds half up in integer arithmetic. Decimal only appears at the
+boundaries: inputs are quantized with ROUND_HALF_UP on the way in, the
+reducing-balance EMI (a power of the rate) is computed once per debt, and
+outputs are converted back to Decimal rupees on the way out. The last
+installment absorbs rounding residue so principal always sums exactly.
+
+Interest rates follow Debt.interest_rate: monthly rate in percent.
+"""
+import calendar
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+
+FLAT = 'flat'
+REDUCING = 'reducing'
+METHODS = (FLAT, REDUCING)
+
+PAISE = Decimal('0.01')
+# Rates are held in hundredths of a percent: rate 1.25 (%) -> 125 / RATE_SCALE
+RATE_SCALE = 10000
+
+
+# ----------------------------------------------------------------------
+# 🔹 HELPERS
+# ----------------------------------------------------------------------
+
+def _paise(value):
+    """
+    Decimal/number rupees -> int paise, ROUND_HALF_UP
+    """
+    value = Decimal(value or 0).quantize(PAISE, rounding=ROUND_HALF_UP)
+    return int(value * 100)
+
+
+def _rate(value):
+    """
+    Decimal monthly rate in percent -> int hundredths of a percent
+    """
+    value = Decimal(value or 0).quantize(PAISE, rounding=ROUND_HALF_UP)
+    return int(value * 100)
+
+
+def _divide(numerator, denominator):
+    """
+    numerator / denominator rounded half up, for non-negative int arrays
+    """
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def _emi(principal, rate, tenure):
+    """
+    Reducing-balance EMI in paise of one debt, from int paise / int rate
+    """
+    if not rate:
+        return _divide(principal, tenure)
+    r = Decimal(rate) / RATE_SCALE
+    growth = (1 + r) ** tenure
+    emi = Decimal(principal) * r * growth / (growth - 1)
+    return int(emi.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _rupees(paise):
+    return (Decimal(int(paise)) / 100).quantize(PAISE)
+
+
+def add_months(start, months):
+    month = start.month - 1 + months
+    year = start.year + month // 12
+    month = month % 12 + 1
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return start.replace(year=year, month=month, day=day)
+
+
+# ----------------------------------------------------------------------
+# 🔹 VECTORIZED ENGINE
+# ----------------------------------------------------------------------
+
+def build_schedules(principals, monthly_rates, tenures, method=FLAT,
+                    prepayments=None, prepayment_months=None):
+    """
+    Build schedules for many loans at once.
+
+    principals / prepayments are Decimal rupees, monthly_rates are percent,
+    tenures are months. A prepayment is applied on top of the installment of
+    `prepayment_months` (1-based) and shortens the loan.
+
+    Returns a dict of int64 arrays in paise shaped (n_debts, max_tenure):
+    'payment', 'interest', 'principal', 'balance', plus 'months' (n_debts,)
+    holding the number of installments actually paid.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown amortization method '{method}'.")
+
+    principal = np.array([_paise(p) for p in principals], dtype=np.int64)
+    rate = np.array([_rate(r) for r in monthly_rates], dtype=np.int64)
+    tenure = np.array(tenures, dtype=np.int64)
+
+    n_debts = principal.shape[0]
+    n_months = int(tenure.max()) if n_debts else 0
+
+    if prepayments is None:
+        prepay = np.zeros(n_debts, dtype=np.int64)
+        prepay_month = np.zeros(n_debts, dtype=np.int64)
+    else:
+        prepay = np.array([_paise(p) for p in prepayments], dtype=np.int64)
+        prepay_month = np.array(prepayment_months, dtype=np.int64)
+
+    safe_tenure = np.maximum(tenure, 1)
+
+    if method == FLAT:
+        # Same as Debt.monthly_interest: interest on the original principal
+        flat_interest = _divide(principal * rate, RATE_SCALE)
+        installment_principal = _divide(principal, safe_tenure)
+    else:
+        emi = np.array([
+            _emi(int(p), int(r), int(n)) for p, r, n in zip(principal, rate, safe_tenure)
+        ], dtype=np.int64)
+
+    shape = (n_debts, n_months)
+    payment = np.zeros(shape, dtype=np.int64)
+    interest = np.zeros(shape, dtype=np.int64)
+    paid_principal = np.zeros(shape, dtype=np.int64)
+    balances = np.zeros(shape, dtype=np.int64)
+
+    balance = principal.copy()
+    months = np.zeros(n_debts, dtype=np.int64)
+
+    for k in range(n_months):
+        month = k + 1
+        active = (balance > 0) & (month <= tenure)
+
+        if method == FLAT:
+            month_interest = flat_interest
+            month_principal = installment_principal
+        else:
+            month_interest = _divide(balance * rate, RATE_SCALE)
+            month_principal = emi - month_interest
+
+        # Last scheduled month clears any rounding residue
+        month_principal = np.where(month == tenure, balance, np.minimum(month_principal, balance))
+
+        extra = np.where(prepay_month == month, np.minimum(prepay, balance - month_principal), 0)
+
+        month_interest = np.where(active, month_interest, 0)
+        month_principal = np.where(active, month_principal + extra, 0)
+
+        balance = balance - month_principal
+        months += active
+
+        interest[:, k] = month_interest
+        paid_principal[:, k] = month_principal
+        payment[:, k] = month_interest + month_principal
+        balances[:, k] = np.where(active, balance, 0)
+
+    return {
+        'payment': payment,
+        'interest': interest,
+        'principal': paid_principal,
+        'balance': balances,
+        'months': months,
+    }
+
+
+def debt_schedules(debts, method=FLAT, prepayments=None, prepayment_months=None):
+    """
+    build_schedules() for a list of Debt instances
+    """
+    return build_schedules(
+        [d.principal_amount for d in debts],
+        [d.interest_rate for d in debts],
+        [d.tenure_months for d in debts],
+        method=method,
+        prepayments=prepayments,
+        prepayment_months=prepayment_months,
+    )
+
+
+# ----------------------------------------------------------------------
+# 🔹 SINGLE DEBT
+# ----------------------------------------------------------------------
+
+def debt_schedule(debt, method=FLAT, prepayment=None, prepayment_month=None):
+    """
+    Month-by-month schedule of one debt as Decimal rows, plus totals and
+    projected payoff date
+    """
+    if prepayment:
+        arrays = debt_schedules(
+            [debt], method=method,
+            prepayments=[prepayment], prepayment_months=[prepayment_month or 1],
+        )
+    else:
+        arrays = debt_schedules([debt], method=method)
+
+    months = int(arrays['months'][0])
+
+    rows = []
+    for k in range(months):
+        rows.append({
+            'month': k + 1,
+            'due_date': add_months(debt.start_date, k),
+            'payment': _rupees(arrays['payment'][0, k]),
+            'interest': _rupees(arrays['interest'][0, k]),
+            'principal': _rupees(arrays['principal'][0, k]),
+            'balance': _rupees(arrays['balance'][0, k]),
+        })
+
+    return {
+        'method': method,
+        'rows': rows,
+        'months': months,
+        'total_interest': _rupees(arrays['interest'][0].sum()),
+        'total_payment': _rupees(arrays['payment'][0].sum()),
+        'payoff_date': add_months(debt.start_date, months - 1) if months else None,
+    }
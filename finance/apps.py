@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class FinanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'finance'
\ No newline at end of file
+    name = 'finance'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import report_mail  # noqa: F401  (registers jobs)
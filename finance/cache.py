@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from homecontrol.replicas import primary_reads
+
+
+GLOBAL_VERSION_KEY = 'finance:version:global'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event, amount=1):
+    with _stats_lock:
+        _stats[event] += amount
+
+
+def cache_stats():
+    """
+    Hit / miss / invalidation counters of this process
+    """
+    with _stats_lock:
+        return {
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+            'invalidations': _stats['invalidations'],
+        }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# ----------------------------------------------------------------------
+# 🔹 VERSIONS
+# A write bumps the version, which orphans every key built from the old one.
+# Versions and entries live in the shared cache (CACHES), so a bump made
+# by one worker is seen by all of them. A bump sets a new timestamp once
+# the write's transaction has committed: a reader filling the cache before
+# that stores under the old version, and an evicted version key never
+# brings an old generation of entries back to life.
+# ----------------------------------------------------------------------
+
+def _user_version_key(user_id):
+    return f'finance:version:user:{user_id}'
+
+
+def _category_version_key(user_id):
+    return f'finance:version:categories:{user_id}'
+
+
+def _set_version(key):
+    # A fresh value, not incr(): two bumps racing still both move it
+    cache.set(key, time.time_ns(), None)
+    _count('invalidations')
+
+
+def _bump(key):
+    transaction.on_commit(lambda: _set_version(key))
+
+
+def bump_user_version(user_id):
+    if user_id:
+        _bump(_user_version_key(user_id))
+
+
+def bump_category_version(user_id):
+    """
+    For the user's own categories (finance/categories.py)
+    """
+    if user_id:
+        _bump(_category_version_key(user_id))
+
+
+def bump_global_version():
+    """
+    For superuser (global) categories, which show up for every user
+    """
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def _versions(keys):
+    versions = cache.get_many(keys)
+
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # add(): another worker may be setting the same key right now
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        versions.update(cache.get_many(missing))
+
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def get_version(user_id):
+    return _versions([_user_version_key(user_id), GLOBAL_VERSION_KEY])
+
+
+def get_category_version(user_id):
+    return _versions([_category_version_key(user_id), GLOBAL_VERSION_KEY])
+
+
+# ----------------------------------------------------------------------
+# 🔹 CACHED CONTEXTS
+# Values are built from the primary, also in @replica_reads views: the
+# replica may lag a write that already bumped the version, and a stale
+# value would then live under the new version until the next write. Hits
+# need no database at all; only uncached reads go to the replica.
+# ----------------------------------------------------------------------
+
+def _cache_key(name, user, key_parts):
+    parts = ':'.join(str(p) for p in key_parts)
+    return f'finance:{name}:{user.pk}:{get_version(user.pk)}:{parts}'
+
+
+def _timeout():
+    return getattr(settings, 'FINANCE_CACHE_TIMEOUT', 60 * 60)
+
+
+def _cached(key, builder):
+    value = cache.get(key)
+    if value is not None:
+        _count('hits')
+        return value
+
+    _count('misses')
+    with primary_reads():
+        value = builder()
+    cache.set(key, value, _timeout())
+    return value
+
+
+def cached_for_user(name, user, builder, *key_parts):
+    """
+    Return builder() cached under the user's current version.
+    `builder` must return picklable data (lists, not querysets).
+    """
+    return _cached(_cache_key(name, user, key_parts), builder)
+
+
+def cached_categories(user_id, builder):
+    """
+    Return builder() cached until a category of the user, or a global one,
+    is written. Expense writes don't invalidate it.
+    """
+    return _cached(f'finance:categories:{user_id}:{get_category_version(user_id)}', builder)
+
+
+async def acached_for_user(name, user, builder, *key_parts):
+    """
+    cached_for_user() for async views: `builder` returns an awaitable
+    """
+    key = await sync_to_async(_cache_key)(name, user, key_parts)
+
+    value = await cache.aget(key)
+    if value is not None:
+        _count('hits')
+        return value
+
+    _count('misses')
+    with primary_reads():
+        value = await builder()
+    await cache.aset(key, value, _timeout())
+    return value
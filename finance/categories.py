@@ -0,0 +1,80 @@
+"""
+Per-user category registry.
+
+    registry = category_registry(user)     # or a user id
+    registry.resolve('Food')               # (id, slug) by name or slug
+    registry.slug_of(expense.category_id)
+
+The categories a user can pick: the global (superuser) ones and the
+user's own, loaded with one query and cached (finance/cache.py) until a
+category of that user, or a global one, is written (finance/signals.py).
+The cache is shared by all workers and the version is bumped once the
+write commits, so every process sees a new or deleted category on its
+next lookup. Validating any number of expenses then costs no category
+queries.
+"""
+from django.db.models import Q
+
+from .cache import cached_categories
+from .models import ExpenseCategory
+
+
+class CategoryRegistry:
+
+    def __init__(self, user_id, rows):
+        """
+        rows: (id, name, slug, user_id, is_global)
+        """
+        self.user_id = user_id
+        self.slugs = {}
+        self.own_names = {}
+        self.global_names = {}
+        self.by_slug = {}
+
+        for pk, name, slug, owner_id, is_global in rows:
+            key = name.strip().lower()
+            self.slugs[pk] = slug
+            if owner_id == user_id:
+                self.own_names.setdefault(key, pk)
+            if is_global:
+                self.global_names.setdefault(key, pk)
+            if slug:
+                self.by_slug.setdefault(slug.lower(), pk)
+
+        # The user's own category wins over a global one of the same name
+        self.by_name = {**self.global_names, **self.own_names}
+
+    @classmethod
+    def load(cls, user_id):
+        rows = (
+            ExpenseCategory.objects
+            .filter(Q(user_id=user_id) | Q(user__is_superuser=True))
+            .order_by('name', 'pk')
+            .values_list('id', 'name', 'slug', 'user_id', 'user__is_superuser')
+        )
+        return cls(user_id, list(rows))
+
+    @property
+    def ids(self):
+        return list(self.slugs)
+
+    def __contains__(self, category_id):
+        return category_id in self.slugs
+
+    def slug_of(self, category_id):
+        return self.slugs.get(category_id)
+
+    def resolve(self, value):
+        """
+        (id, slug) of a category name or slug, None when unknown
+        """
+        key = (value or '').strip().lower()
+        pk = self.by_name.get(key) or self.by_slug.get(key)
+        if pk is None:
+            return None
+        return pk, self.slugs[pk]
+
+
+def category_registry(user):
+    user_id = getattr(user, 'pk', user)
+    return cached_categories(user_id, lambda: CategoryRegistry.load(user_id))
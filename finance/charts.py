@@ -0,0 +1,168 @@
+"""
+Data for the finance charts, shaped and downsampled on the server.
+
+    spend_series(user, start, end, DAY, max_points=60)
+    # {'labels': ['2026-01-01', ...], 'ends': [...], 'totals': [...], 'counts': [...], ...}
+
+    category_shares(user, start, end, top=8)
+    # {'labels': ['Rent', ..., 'Other'], 'totals': [...], 'shares': [...]}
+
+Both read ExpenseDailyRollup with one grouped query. A series never has
+more than `max_points` points: consecutive periods are summed into equal
+buckets, so five years of daily spend is still a small JSON document and
+the bucket totals add up to the range total. Amounts stay Decimal,
+quantized to two places like the reports (JSON strings, no float drift).
+"""
+import math
+from datetime import timedelta
+
+from django.db.models import F, Sum
+from django.utils.dateparse import parse_date
+from django.utils.timezone import now
+
+from .cache import cached_for_user
+from .models import ExpenseDailyRollup
+from .reports import GRANULARITIES, WEEK, MONTH, UNCATEGORIZED, ZERO, report_periods
+
+
+DAY = 'day'
+SERIES_GRANULARITIES = (DAY, WEEK, MONTH)
+
+DEFAULT_DAYS = 90
+# Ten years of days
+MAX_RANGE_DAYS = 3660
+DEFAULT_MAX_POINTS = 60
+MAX_POINTS = 500
+DEFAULT_TOP = 8
+OTHER = 'Other'
+
+
+def chart_params(params, today=None):
+    """
+    (start, end, granularity, max_points, top) from request parameters,
+    defaulting to daily points over the last DEFAULT_DAYS days.
+    Raises ValueError for unusable values.
+    """
+    today = today or now().date()
+
+    granularity = params.get('granularity') or DAY
+    if granularity not in SERIES_GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(SERIES_GRANULARITIES)}.")
+
+    try:
+        end = parse_date(params.get('to_date') or '') or today
+        start = parse_date(params.get('from_date') or '') or end - timedelta(days=DEFAULT_DAYS - 1)
+        max_points = int(params.get('points') or DEFAULT_MAX_POINTS)
+        top = int(params.get('top') or DEFAULT_TOP)
+    except ValueError:
+        raise ValueError("from_date / to_date must be dates (YYYY-MM-DD), points and top integers.")
+
+    if start > end:
+        raise ValueError("from_date must not be after to_date.")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"A chart covers at most {MAX_RANGE_DAYS} days.")
+    if not 1 <= max_points <= MAX_POINTS:
+        raise ValueError(f"points must be between 1 and {MAX_POINTS}.")
+    if top < 1:
+        raise ValueError("top must be at least 1.")
+
+    return start, end, granularity, max_points, top
+
+
+def _periods(start, end, granularity):
+    if granularity == DAY:
+        return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    return report_periods(start, end, granularity)
+
+
+def downsample(periods, values, max_points):
+    """
+    [(first period, last period, summed values)] with at most `max_points`
+    buckets of `size` consecutive periods each (the last one may be shorter)
+    """
+    size = max(1, math.ceil(len(periods) / max_points))
+
+    buckets = []
+    for i in range(0, len(periods), size):
+        chunk = periods[i:i + size]
+        buckets.append((chunk[0], chunk[-1], [sum(column) for column in zip(*(values[p] for p in chunk))]))
+    return buckets, size
+
+
+# ----------------------------------------------------------------------
+# 🔹 SERIES
+# ----------------------------------------------------------------------
+
+def build_spend_series(user, start, end, granularity, max_points):
+    rollups = ExpenseDailyRollup.objects.filter(user=user, date__range=[start, end])
+
+    if granularity == DAY:
+        rows = rollups.values(period=F('date'))
+    else:
+        rows = rollups.annotate(period=GRANULARITIES[granularity]('date')).values('period')
+    rows = rows.annotate(total=Sum('total'), count=Sum('count')).order_by()
+
+    periods = _periods(start, end, granularity)
+    values = {period: (ZERO, 0) for period in periods}
+    for row in rows:
+        # Two places: SQLite sums carry float noise
+        values[row['period']] = (row['total'].quantize(ZERO), row['count'])
+
+    buckets, size = downsample(periods, values, max_points)
+    return {
+        'start': start,
+        'end': end,
+        'granularity': granularity,
+        # Periods summed into each point
+        'bucket_size': size,
+        'labels': [first for first, _, _ in buckets],
+        'ends': [last for _, last, _ in buckets],
+        'totals': [total for _, _, (total, _) in buckets],
+        'counts': [count for _, _, (_, count) in buckets],
+    }
+
+
+def build_category_shares(user, start, end, top):
+    rows = (
+        ExpenseDailyRollup.objects
+        .filter(user=user, date__range=[start, end])
+        .values('category__name')
+        .annotate(total=Sum('total'))
+        .order_by()
+    )
+
+    totals = {}
+    for row in rows:
+        name = (row['category__name'] or UNCATEGORIZED).title()
+        totals[name] = totals.get(name, ZERO) + row['total'].quantize(ZERO)
+
+    ranked = sorted(totals.items(), key=lambda item: -item[1])
+    if len(ranked) > top:
+        ranked = ranked[:top - 1] + [(OTHER, sum((total for _, total in ranked[top - 1:]), ZERO))]
+
+    grand_total = sum((total for _, total in ranked), ZERO)
+    return {
+        'start': start,
+        'end': end,
+        'total': grand_total,
+        'labels': [name for name, _ in ranked],
+        'totals': [total for _, total in ranked],
+        # Percent of the range total
+        'shares': [(total * 100 / grand_total).quantize(ZERO) if grand_total else ZERO for _, total in ranked],
+    }
+
+
+def spend_series(user, start, end, granularity=DAY, max_points=DEFAULT_MAX_POINTS):
+    return cached_for_user(
+        'chart_series', user,
+        lambda: build_spend_series(user, start, end, granularity, max_points),
+        start.isoformat(), end.isoformat(), granularity, max_points
+    )
+
+
+def category_shares(user, start, end, top=DEFAULT_TOP):
+    return cached_for_user(
+        'chart_categories', user,
+        lambda: build_category_shares(user, start, end, top),
+        start.isoformat(), end.isoformat(), top
+    )
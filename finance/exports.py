@@ -0,0 +1,134 @@
+"""
+Streaming exports of expenses and debt payments.
+
+Rows come from values_list().iterator(chunk_size=...), so the database
+cursor is read in chunks and no model instances are built. CSV output is
+streamed with StreamingHttpResponse: under ASGI through an async iterator
+that reads EXPORT_CHUNK_SIZE lines per sync_to_async() call (Django would
+buffer a sync iterator whole before sending it). XLSX (needs openpyxl) is written by a
+write-only workbook to a temporary file and then streamed from disk.
+
+Text cells that a spreadsheet would run as a formula (=, +, -, @, tab, CR
+first) get a leading apostrophe in both formats; the importer removes it.
+"""
+import csv
+import tempfile
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse, FileResponse
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX export is optional
+    Workbook = None
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+CSV = 'csv'
+XLSX = 'xlsx'
+
+# Same headers as the CSV import, so an export can be imported back
+EXPENSE_COLUMNS = ['date', 'amount', 'category', 'payment_mode', 'debt', 'note']
+EXPENSE_FIELDS = ['expense_date', 'amount', 'category__name', 'payment_mode', 'debt__name', 'note']
+
+DEBT_PAYMENT_COLUMNS = ['date', 'amount', 'payment_mode', 'note']
+DEBT_PAYMENT_FIELDS = ['expense_date', 'amount', 'payment_mode', 'note']
+
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def xlsx_available():
+    return Workbook is not None
+
+
+def served_async(request):
+    return isinstance(request, ASGIRequest)
+
+
+def escape_cell(value):
+    """
+    Text a spreadsheet would read as a formula, made literal
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def unescape_cell(value):
+    if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def _escape_row(row):
+    return [escape_cell(value) for value in row]
+
+
+class _Echo:
+    """
+    File-like object whose write() hands the line back to csv.writer
+    """
+    def write(self, value):
+        return value
+
+
+def iter_rows(qs, fields):
+    return (
+        qs.order_by('expense_date', 'id')
+        .values_list(*fields)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(_escape_row(row))
+
+
+async def _acsv_lines(header, rows):
+    lines = _csv_lines(header, rows)
+    # thread_sensitive: every chunk reads the cursor on the same thread
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, EXPORT_CHUNK_SIZE)), thread_sensitive=True)
+    while chunk := await next_chunk():
+        yield chunk
+
+
+def csv_response(filename, header, rows, asynchronous=False):
+    lines = _acsv_lines(header, rows) if asynchronous else _csv_lines(header, rows)
+    response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(filename, header, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for row in rows:
+        sheet.append(_escape_row(row))
+
+    tmp = tempfile.TemporaryFile()
+    workbook.save(tmp)
+    tmp.seek(0)
+
+    return FileResponse(
+        tmp,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+
+def export_response(fmt, filename, header, qs, fields, asynchronous=False):
+    """
+    asynchronous: the request is served by ASGI (served_async())
+    """
+    rows = iter_rows(qs, fields)
+    if fmt == XLSX:
+        return xlsx_response(filename, header, rows)
+    return csv_response(filename, header, rows, asynchronous=asynchronous)
@@ -1,5 +1,7 @@
 from django import forms
-from .models import Expense, ExpenseCategory, Debt
+from .models import Expense, ExpenseCategory, Debt, SLUG_TAKEN
+from .importers import IMPORT_FORMATS, DEFAULT_CHUNK_SIZE
+from .categories import category_registry
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
 
@@ -29,11 +31,12 @@ class CategoryForm(forms.ModelForm):
         if not slug and name:
             slug = slugify(name)
 
-        # Ensure slug uniqueness
-        if ExpenseCategory.objects.filter(slug=slug).exclude(
-            pk=self.instance.pk
-        ).exists():
-            raise ValidationError("Category with this slug already exists.")
+        # Slugs the user can see are checked without a query; slugs of
+        # other users' categories are caught by the model's unique check
+        if self.user is not None and slug:
+            pk = category_registry(self.user).by_slug.get(slug.lower())
+            if pk is not None and pk != self.instance.pk:
+                raise ValidationError(SLUG_TAKEN)
 
         return slug
 
@@ -134,4 +137,31 @@ class ExpenseForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user')
         super().__init__(*args, **kwargs)
-        self.fields['category'].queryset = ExpenseCategory.objects.filter(user=user)
+        # Global categories and the user's own
+        self.fields['category'].queryset = ExpenseCategory.objects.filter(
+            pk__in=category_registry(user).ids
+        )
+
+
+
+class ExpenseImportForm(forms.Form):
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'})
+    )
+    file_format = forms.ChoiceField(
+        choices=IMPORT_FORMATS,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    default_category = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Used when a row has no category'
+        })
+    )
+    chunk_size = forms.IntegerField(
+        initial=DEFAULT_CHUNK_SIZE,
+        min_value=1,
+        max_value=10000,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
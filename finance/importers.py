@@ -0,0 +1,270 @@
+"""
+Bulk import of Expenses from CSV files and bank statements.
+
+Rows are streamed one at a time, validated against categories and debts that
+were preloaded into dicts, and written with bulk_create in chunks inside a
+single transaction. Memory use does not grow with the file size.
+"""
+import csv
+import io
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import transaction
+
+from search.index import index_instances, EXPENSE
+
+from .models import Expense, Debt, PAYMENT_CHOICES
+from .categories import category_registry
+from .exports import unescape_cell
+from .rollups import rebuild_rollups
+from .cache import bump_user_version
+
+
+CSV = 'csv'
+BANK = 'bank'
+IMPORT_FORMATS = (
+    (CSV, 'Expense CSV'),
+    (BANK, 'Bank Statement'),
+)
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+DATE_FORMATS = ('%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%d/%m/%y', '%d-%b-%Y', '%d %b %Y')
+
+# Normalized header -> field, for both formats
+COLUMN_ALIASES = {
+    'date': 'date', 'expensedate': 'date', 'txndate': 'date',
+    'transactiondate': 'date', 'valuedate': 'date',
+    'amount': 'amount', 'debit': 'amount', 'withdrawal': 'amount',
+    'withdrawalamt': 'amount', 'withdrawalamount': 'amount', 'debitamount': 'amount',
+    'category': 'category',
+    'paymentmode': 'payment_mode', 'mode': 'payment_mode',
+    'debt': 'debt',
+    'note': 'note', 'narration': 'note', 'description': 'note',
+    'particulars': 'note', 'remarks': 'note',
+}
+
+
+def _normalize_header(name):
+    return re.sub(r'[^a-z]', '', (name or '').lower())
+
+
+def _parse_date(value):
+    value = (value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{value}'.")
+
+
+def _parse_amount(value):
+    value = (value or '').replace(',', '').strip()
+    try:
+        amount = Decimal(value)
+        # NaN / Infinity parse, and NaN survives quantize()
+        if not amount.is_finite():
+            raise ValueError(f"Invalid amount '{value}'.")
+        amount = amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount '{value}'.")
+
+    if amount <= 0:
+        raise ValueError("Amount must be greater than zero.")
+    if amount >= Decimal('10000000000'):
+        raise ValueError("Amount is too large.")
+    return amount
+
+
+class ExpenseImporter:
+    """
+    importer = ExpenseImporter(user, chunk_size=500)
+    result = importer.run(file)
+    """
+
+    def __init__(self, user, fmt=CSV, chunk_size=DEFAULT_CHUNK_SIZE,
+                 default_category=None, default_payment_mode='bank',
+                 dry_run=False, max_errors=MAX_REPORTED_ERRORS):
+        self.user = user
+        self.fmt = fmt
+        self.chunk_size = max(int(chunk_size), 1)
+        self.default_payment_mode = default_payment_mode
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+
+        self.created = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+
+        self._load_lookups()
+        self.default_category = self._resolve_category(default_category) if default_category else None
+
+    # ------------------------------------------------------------------
+    # 🔹 LOOKUPS (one query each, for the whole import)
+    # ------------------------------------------------------------------
+    def _load_lookups(self):
+        self.categories = category_registry(self.user)
+
+        self.debts = {}
+        for pk, name in Debt.objects.filter(user=self.user).values_list('id', 'name'):
+            self.debts[str(pk)] = pk
+            self.debts.setdefault(name.strip().lower(), pk)
+
+        self.payment_modes = {}
+        for key, label in PAYMENT_CHOICES:
+            self.payment_modes[key] = key
+            self.payment_modes[label.lower()] = key
+
+    def _resolve_category(self, value):
+        category = self.categories.resolve(value)
+        if category is None:
+            raise ValueError(f"Unknown category '{value}'.")
+        return category
+
+    # ------------------------------------------------------------------
+    # 🔹 ROW VALIDATION
+    # ------------------------------------------------------------------
+    def build_expense(self, row):
+        """
+        Validated (unsaved) Expense for one row, None for rows to skip
+        (e.g. credits in a bank statement). Raises ValueError.
+        """
+        amount_raw = row.get('amount')
+        if self.fmt == BANK and not (amount_raw or '').strip():
+            return None
+
+        expense_date = _parse_date(row.get('date'))
+        amount = _parse_amount(amount_raw)
+
+        category_raw = (row.get('category') or '').strip()
+        if category_raw:
+            category_id, slug = self._resolve_category(category_raw)
+        elif self.default_category:
+            category_id, slug = self.default_category
+        else:
+            category_id, slug = None, None
+
+        mode_raw = (row.get('payment_mode') or '').strip().lower()
+        payment_mode = self.payment_modes.get(mode_raw or self.default_payment_mode)
+        if payment_mode is None:
+            raise ValueError(f"Invalid payment mode '{mode_raw}'.")
+
+        debt_id = None
+        debt_raw = (row.get('debt') or '').strip()
+        if debt_raw:
+            debt_id = self.debts.get(debt_raw.lower())
+            if debt_id is None:
+                raise ValueError(f"Unknown debt '{debt_raw}'.")
+
+        # Same rules as Expense.clean()
+        if slug == 'debt' and not debt_id:
+            raise ValueError("Debt must be selected for Debt category expenses.")
+        if slug != 'debt' and debt_id:
+            raise ValueError("Debt can only be selected for Debt category.")
+
+        return Expense(
+            user=self.user,
+            category_id=category_id,
+            debt_id=debt_id,
+            amount=amount,
+            payment_mode=payment_mode,
+            expense_date=expense_date,
+            note=(row.get('note') or '').strip(),
+        )
+
+    def _add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+
+    # ------------------------------------------------------------------
+    # 🔹 STREAMING
+    # ------------------------------------------------------------------
+    def rows(self, stream):
+        """
+        Yield (line_number, row) with headers mapped to Expense fields
+        """
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        columns = [COLUMN_ALIASES.get(_normalize_header(h)) for h in header]
+        if 'date' not in columns or 'amount' not in columns:
+            raise ValueError("File must have date and amount columns.")
+
+        for line, values in enumerate(reader, start=2):
+            if not any(v.strip() for v in values):
+                continue
+            row = {}
+            for column, value in zip(columns, values):
+                if column and column not in row:
+                    # Exports quote formula-like text
+                    row[column] = unescape_cell(value)
+            yield line, row
+
+    def run(self, stream):
+        """
+        Import a text stream (or binary upload) and return a summary dict
+        """
+        if not isinstance(stream, io.TextIOBase):
+            stream = io.TextIOWrapper(getattr(stream, 'file', stream), encoding='utf-8-sig', newline='')
+
+        first_date = last_date = None
+        batch = []
+
+        with transaction.atomic():
+            for line, row in self.rows(stream):
+                try:
+                    expense = self.build_expense(row)
+                except ValueError as e:
+                    self._add_error(line, str(e))
+                    continue
+
+                if expense is None:
+                    self.skipped += 1
+                    continue
+
+                batch.append(expense)
+                if first_date is None or expense.expense_date < first_date:
+                    first_date = expense.expense_date
+                if last_date is None or expense.expense_date > last_date:
+                    last_date = expense.expense_date
+
+                if len(batch) >= self.chunk_size:
+                    self._flush(batch)
+                    batch = []
+
+            if batch:
+                self._flush(batch)
+
+            # bulk_create skips the Expense signals
+            if self.created:
+                rebuild_rollups(user=self.user, start=first_date, end=last_date)
+                bump_user_version(self.user.pk)
+
+            if self.dry_run:
+                transaction.set_rollback(True)
+
+        return self.result()
+
+    def _flush(self, batch):
+        Expense.objects.bulk_create(batch)
+        # bulk_create skips the search signals (rows without a pk are left
+        # to reindex_search)
+        index_instances(EXPENSE, batch)
+        self.created += len(batch)
+
+    def result(self):
+        return {
+            'created': self.created,
+            'skipped': self.skipped,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'dry_run': self.dry_run,
+        }
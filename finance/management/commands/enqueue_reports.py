@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from finance.report_mail import enqueue_period_reports, PERIODS
+
+
+class Command(BaseCommand):
+    help = "Queue weekly / monthly report mails for all users (run from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('period', choices=PERIODS)
+
+    def handle(self, *args, **options):
+        queued = enqueue_period_reports(options['period'])
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} report jobs."))
@@ -0,0 +1,46 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.importers import ExpenseImporter, CSV, BANK, DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Import expenses for a user from a CSV file or bank statement"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import")
+        parser.add_argument('--user', required=True, help="Username the expenses belong to")
+        parser.add_argument('--format', choices=[CSV, BANK], default=CSV)
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--default-category', help="Category for rows without one")
+        parser.add_argument('--payment-mode', default='bank', help="Payment mode for rows without one")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only, write nothing")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        try:
+            importer = ExpenseImporter(
+                user,
+                fmt=options['format'],
+                chunk_size=options['chunk_size'],
+                default_category=options['default_category'],
+                default_payment_mode=options['payment_mode'],
+                dry_run=options['dry_run'],
+            )
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                result = importer.run(stream)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for line, error in result['errors']:
+            self.stderr.write(f"Line {line}: {error}")
+
+        prefix = "[dry run] " if result['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Imported {result['created']} expenses, "
+            f"skipped {result['skipped']}, {result['error_count']} errors."
+        ))
@@ -0,0 +1,44 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from finance.rollups import rebuild_rollups
+
+
+def _date_option(options, name):
+    value = options[name]
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        # Well formed but impossible, e.g. 2024-02-30
+        parsed = None
+    if parsed is None:
+        raise CommandError(f"--{name.replace('_', '-')} '{value}' is not a valid YYYY-MM-DD date.")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Rebuild ExpenseDailyRollup from the Expense table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild this username")
+        parser.add_argument('--from-date', help="YYYY-MM-DD, inclusive")
+        parser.add_argument('--to-date', help="YYYY-MM-DD, inclusive")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        start = _date_option(options, 'from_date')
+        end = _date_option(options, 'to_date')
+        if start and end and start > end:
+            raise CommandError("--from-date is after --to-date.")
+
+        written = rebuild_rollups(user=user, start=start, end=end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup rows."))
@@ -1,58 +1,101 @@
 from django.db import models
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from decimal import Decimal
 from django.contrib.auth.models import User
-from homecontrol.models import LogFolder
+from homecontrol.models import LogFolder, ChangeTracked, SoftDeleteManager, SoftDeleteQuerySet
 from django.core.exceptions import ValidationError
 from django.db.models import Q
-from django.db.models import Sum
+from django.db.models import Sum, Count, F, Value, Case, When, DecimalField, CharField
+from django.db.models.functions import Coalesce, Greatest, Round, Lower
 from decimal import Decimal, ROUND_HALF_UP
 
+NAME_TAKEN_GLOBAL = "This Global category already exists."
+NAME_RESERVED = "This category name is reserved by system and Already Exists."
+NAME_TAKEN_OWN = "This category already Created By you."
+SLUG_TAKEN = "Category with this slug already exists."
+
+
 class ExpenseCategory(LogFolder):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
-    slug = models.SlugField(unique=True, blank=True, null=True)
+    slug = models.SlugField(blank=True, null=True)
 
     class Meta:
         ordering = ['name']
+        constraints = [
+            # One live category per name (any case) per user
+            models.UniqueConstraint(
+                Lower('name'), 'user',
+                name='category_user_name_uniq',
+                condition=Q(is_deleted=False)
+            ),
+            # Live slugs only too: a deleted "Food" doesn't block a new one
+            models.UniqueConstraint(
+                fields=['slug'],
+                name='category_slug_uniq',
+                condition=Q(is_deleted=False),
+                violation_error_message=SLUG_TAKEN,
+            ),
+        ]
 
     def clean(self):
         if not self.user_id or not self.name:
             return
 
+        from .categories import category_registry
+
         name = self.name.strip().lower()
+        registry = category_registry(self.user_id)
 
-        qs = ExpenseCategory.objects.filter(name__iexact=name)
+        def taken(names):
+            pk = names.get(name)
+            return pk is not None and pk != self.pk
 
-        if self.pk:
-            qs = qs.exclude(pk=self.pk)
+        # The unique constraint is the real check; this is the message
+        taken_by_user = taken(registry.own_names)
 
         # 🔒 Superuser rules
         if self.user.is_superuser:
-            if qs.filter(user=self.user).exists():
-                raise ValidationError({
-                    'name': "This Global category already exists."
-                })
+            if taken_by_user:
+                raise ValidationError({'name': NAME_TAKEN_GLOBAL})
 
         # 🔒 Normal user rules
         else:
-            if qs.filter(user__is_superuser=True).exists():
-                raise ValidationError({
-                    'name': "This category name is reserved by system and Already Exists."
-                })
+            if taken(registry.global_names):
+                raise ValidationError({'name': NAME_RESERVED})
 
-            if qs.filter(user=self.user).exists():
-                raise ValidationError({
-                    'name': "This category already Created By you."
-                })
+            if taken_by_user:
+                raise ValidationError({'name': NAME_TAKEN_OWN})
 
         self.name = name
 
+    def _integrity_error(self, error):
+        """
+        ValidationError with the clean() messages for a unique violation
+        that got past clean() (a concurrent insert)
+        """
+        message = str(error)
+        if 'category_user_name_uniq' in message:
+            return ValidationError({
+                'name': NAME_TAKEN_GLOBAL if self.user.is_superuser else NAME_TAKEN_OWN
+            })
+        if 'slug' in message:
+            return ValidationError({'slug': SLUG_TAKEN})
+        return None
+
     def save(self, *args, **kwargs):
-        self.full_clean()  # safe now
-        super().save(*args, **kwargs)
+        # clean() gives the messages, the constraints decide
+        self.full_clean(validate_constraints=False)
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError as e:
+            validation_error = self._integrity_error(e)
+            if validation_error is None:
+                raise
+            raise validation_error from e
 
     def __str__(self):
         return self.name.title()
@@ -67,7 +110,48 @@ DEBT_TYPE_OPTIONS = (
 )
 
 
-class Debt(LogFolder):
+class DebtQuerySet(SoftDeleteQuerySet):
+
+    def with_payment_stats(self):
+        """
+        Annotate paid amount, paid EMI count, remaining amount and status
+        in a single query, so the Debt properties don't hit the DB per row.
+        """
+        money = DecimalField(max_digits=12, decimal_places=2)
+        debt_payments = Q(expense_debt__category__slug='debt', expense_debt__is_deleted=False)
+
+        monthly_interest = Round(
+            F('principal_amount') * Coalesce(F('interest_rate'), Value(Decimal('0.00'))) / Value(Decimal('100')),
+            2,
+            output_field=money
+        )
+        gross_amount = F('principal_amount') + monthly_interest * F('tenure_months')
+
+        return self.annotate(
+            paid_amount_total=Coalesce(
+                Sum('expense_debt__amount', filter=debt_payments),
+                Value(Decimal('0.00')),
+                output_field=money
+            ),
+            paid_emi_count=Count('expense_debt', filter=debt_payments),
+        ).annotate(
+            remaining_amount=Greatest(
+                gross_amount - F('amount_already_paid') - F('paid_amount_total'),
+                Value(Decimal('0.00')),
+                output_field=money
+            ),
+            status_tag=Case(
+                When(
+                    tenure_months__gt=F('emi_already_paid') + F('paid_emi_count'),
+                    then=Value('Active')
+                ),
+                default=Value('Closed'),
+                output_field=CharField()
+            ),
+        )
+
+
+class Debt(ChangeTracked, LogFolder):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
     name = models.CharField(max_length=100)
@@ -120,8 +204,19 @@ class Debt(LogFolder):
 
     is_active = models.BooleanField(default=True)
 
+    objects = SoftDeleteManager.from_queryset(DebtQuerySet)()
+    all_objects = DebtQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Live debts of a user (debt list / summaries)
+            models.Index(
+                fields=['user', '-created_at'],
+                name='debt_live_user_idx',
+                condition=Q(is_deleted=False)
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name}"
@@ -151,20 +246,34 @@ class Debt(LogFolder):
 
     # ------------------------------------------------------------------
     # 🔹 DERIVED / CALCULATED PROPERTIES (SOURCE OF TRUTH = Expense)
+    # Values annotated by Debt.objects.with_payment_stats() are used when
+    # present, otherwise each property falls back to its own query.
     # ------------------------------------------------------------------
 
+    @property
+    def expense_paid_emi(self):
+        """
+        Number of EMIs paid via app (Expense table)
+        """
+        annotated = getattr(self, 'paid_emi_count', None)
+        if annotated is not None:
+            return annotated
+
+        return self.expense_debt.filter(category__slug='debt').count()
 
     @property
     def expense_paid_amount(self):
         """
         Total amount paid via app (Expense table)
         """
-        total = (
-            self.expense_debt
-            .filter(category__slug='debt')
-            .aggregate(total=Sum('amount'))['total']
-            or Decimal('0.00')
-        )
+        total = getattr(self, 'paid_amount_total', None)
+        if total is None:
+            total = (
+                self.expense_debt
+                .filter(category__slug='debt')
+                .aggregate(total=Sum('amount'))['total']
+            )
+        total = Decimal(total or '0.00')
 
         return total.quantize(
             Decimal('0.01'),
@@ -173,8 +282,12 @@ class Debt(LogFolder):
     
     @property
     def debt_status_tag(self):
+        annotated = getattr(self, 'status_tag', None)
+        if annotated is not None:
+            return annotated
+
         opening_emi = self.emi_already_paid
-        expense_emi = self.expense_debt.filter(category__slug='debt').count()
+        expense_emi = self.expense_paid_emi
         total_paid_emi = opening_emi + expense_emi
         if total_paid_emi < self.tenure_months:
             tag = 'Active'
@@ -190,7 +303,7 @@ class Debt(LogFolder):
     @property
     def emi_left(self):
         opening_emi = self.emi_already_paid
-        expense_emi = self.expense_debt.filter(category__slug='debt').count()
+        expense_emi = self.expense_paid_emi
         total_paid_emi = opening_emi + expense_emi
         total_pending_emi = self.tenure_months - total_paid_emi
         return total_pending_emi
@@ -238,7 +351,10 @@ class Debt(LogFolder):
         """
         Gross amount minus paid amount
         """
-        remaining = self.gross_amount - self.net_paid
+        remaining = getattr(self, 'remaining_amount', None)
+        if remaining is None:
+            remaining = self.gross_amount - self.net_paid
+        remaining = Decimal(remaining)
 
         return max(
             remaining.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
@@ -261,7 +377,7 @@ EXPENSE_TYPE = (
     )
 
 
-class Expense(LogFolder):
+class Expense(ChangeTracked, LogFolder):
     user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
     category = models.ForeignKey(
         ExpenseCategory,
@@ -298,19 +414,133 @@ class Expense(LogFolder):
 
     class Meta:
         ordering = ['-expense_date', '-created_at']
+        indexes = [
+            # Serves the per-user date range filter + keyset pagination of
+            # live rows; partial, so tombstones never enter it (ignored on
+            # backends without partial indexes, e.g. MySQL)
+            models.Index(
+                fields=['user', '-expense_date', '-created_at'],
+                name='expense_live_user_date_idx',
+                condition=Q(is_deleted=False)
+            ),
+            # Latest change of a user's rows, deleted ones included
+            # (ETag / Last-Modified of the charts)
+            models.Index(fields=['user', 'updated_at'], name='expense_user_updated_idx'),
+        ]
+
+
+    def category_slug(self):
+        """
+        Slug of the category from the user's category registry (no query),
+        the row itself for a category outside it (e.g. set in the admin)
+        """
+        if self.category_id is None:
+            return None
+
+        from .categories import category_registry
+
+        registry = category_registry(self.user_id) if self.user_id else None
+        if registry is not None and self.category_id in registry:
+            return registry.slug_of(self.category_id)
+        return self.category.slug
+
+    def clean_fields(self, exclude=None):
+        # Foreign keys known to exist skip their validation query: a user
+        # instance loaded from the database, a category from the registry
+        exclude = set(exclude or ())
+        if self.user_id and Expense.user.is_cached(self) and not self.user._state.adding:
+            exclude.add('user')
+
+        if self.category_id is not None and self.user_id:
+            from .categories import category_registry
 
+            if self.category_id in category_registry(self.user_id):
+                exclude.add('category')
+        super().clean_fields(exclude=exclude)
 
     def clean(self):
-        if self.category and self.category.slug == 'debt' and not self.debt:
+        try:
+            slug = self.category_slug()
+        except ExpenseCategory.DoesNotExist:
+            # Reported by clean_fields()
+            return
+
+        if self.category_id and slug == 'debt' and not self.debt_id:
             raise ValidationError("Debt must be selected for Debt category expenses.")
 
-        if self.category and self.category.slug != 'debt' and self.debt:
+        if self.category_id and slug != 'debt' and self.debt_id:
             raise ValidationError("Debt can only be selected for Debt category.")
 
     def __str__(self):
         return f"{self.user} - {self.amount} on {self.expense_date}"
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this row contributed to ExpenseDailyRollup
+        instance._rollup_state = instance.rollup_state()
+        return instance
+
+    def rollup_state(self):
+        """
+        (user_id, expense_date, category_id, payment_mode, amount) of a live row,
+        None for soft deleted or partially loaded (.only / .defer) rows
+        """
+        data = self.__dict__
+        if data.get('is_deleted'):
+            return None
+
+        try:
+            return (
+                data['user_id'], data['expense_date'], data['category_id'],
+                data['payment_mode'], data['amount'],
+            )
+        except KeyError:
+            return None
+
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
 
+
+
+class ExpenseDailyRollup(models.Model):
+    """
+    Materialized per-day totals of Expense, kept in sync by finance.signals
+    and rebuilt with `manage.py rebuild_expense_rollup`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    category = models.ForeignKey(
+        ExpenseCategory,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    payment_mode = models.CharField(
+        max_length=20,
+        choices=PAYMENT_CHOICES
+    )
+
+    total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'date', 'category', 'payment_mode'],
+                name='expense_rollup_unique_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'], name='expense_rollup_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.total} on {self.date}"
+
@@ -0,0 +1,63 @@
+import base64
+from datetime import date, datetime
+
+from django.db.models import Q
+
+
+EXPENSE_PAGE_SIZE = 50
+
+
+def encode_expense_cursor(expense):
+    """
+    Opaque cursor pointing just after `expense` in
+    (-expense_date, -created_at, -id) order
+    """
+    raw = f"{expense.expense_date.isoformat()}|{expense.created_at.isoformat()}|{expense.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_expense_cursor(cursor):
+    """
+    Returns (expense_date, created_at, id) or None for a missing/broken cursor
+    """
+    if not cursor:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        expense_date, created_at, pk = raw.split('|')
+        return (
+            date.fromisoformat(expense_date),
+            datetime.fromisoformat(created_at),
+            int(pk),
+        )
+    except (ValueError, UnicodeError):
+        return None
+
+
+def expense_keyset_page(qs, cursor=None, size=EXPENSE_PAGE_SIZE):
+    """
+    Keyset pagination on (-expense_date, -created_at, -id).
+
+    Returns (rows, next_cursor). Cost is one indexed range scan of `size + 1`
+    rows no matter how deep the page is.
+    """
+    qs = qs.order_by('-expense_date', '-created_at', '-id')
+
+    position = decode_expense_cursor(cursor)
+    if position:
+        expense_date, created_at, pk = position
+        qs = qs.filter(
+            Q(expense_date__lt=expense_date) |
+            Q(expense_date=expense_date, created_at__lt=created_at) |
+            Q(expense_date=expense_date, created_at=created_at, id__lt=pk)
+        )
+
+    rows = list(qs[:size + 1])
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_expense_cursor(rows[-1])
+
+    return rows, next_cursor
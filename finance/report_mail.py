@@ -0,0 +1,164 @@
+"""
+Weekly / monthly summary mails, run by the job queue (homecontrol/jobs.py).
+
+`manage.py enqueue_reports weekly` puts one job per user in the queue,
+`manage.py run_workers` builds and sends them. Everything is computed from
+aggregate queries (ExpenseDailyRollup, Debt.with_payment_stats) so a report
+costs a handful of queries whatever the user's history size.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import send_mail
+from django.db.models import Sum
+from django.template.loader import render_to_string
+from django.utils.timezone import now
+
+from homecontrol.jobs import job, enqueue_once
+from .models import Debt, ExpenseDailyRollup
+
+
+WEEKLY = 'weekly'
+MONTHLY = 'monthly'
+PERIODS = (WEEKLY, MONTHLY)
+
+
+def report_period(period, today=None):
+    """
+    (start, end) of the last complete week / month
+    """
+    today = today or now().date()
+
+    if period == WEEKLY:
+        end = today - timedelta(days=today.weekday() + 1)
+        return end - timedelta(days=6), end
+
+    if period == MONTHLY:
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end
+
+    raise ValueError(f"Unknown report period '{period}'.")
+
+
+def expense_summary(user, start, end):
+    rollups = ExpenseDailyRollup.objects.filter(user=user, date__range=[start, end])
+
+    totals = rollups.aggregate(total=Sum('total'), count=Sum('count'))
+
+    by_category = list(
+        rollups.values('category__name')
+        .annotate(total=Sum('total'))
+        .order_by('-total')
+    )
+    by_payment_mode = list(
+        rollups.values('payment_mode')
+        .annotate(total=Sum('total'))
+        .order_by('-total')
+    )
+
+    days = (end - start).days + 1
+    previous = ExpenseDailyRollup.objects.filter(
+        user=user,
+        date__range=[start - timedelta(days=days), start - timedelta(days=1)]
+    ).aggregate(total=Sum('total'))['total']
+
+    return {
+        'total': totals['total'] or 0,
+        'count': totals['count'] or 0,
+        'previous_total': previous or 0,
+        'by_category': by_category,
+        'by_payment_mode': by_payment_mode,
+    }
+
+
+def debt_summary(user):
+    debts = list(
+        Debt.objects.with_payment_stats()
+        .filter(user=user)
+    )
+    return {
+        'debts': debts,
+        'total_paid': sum(d.net_paid for d in debts),
+        'total_remaining': sum(d.net_remaining for d in debts),
+    }
+
+
+def _send(user, subject, template, context):
+    body = render_to_string(template, context)
+    send_mail(
+        subject,
+        body,
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+    )
+
+
+# ----------------------------------------------------------------------
+# 🔹 JOBS
+# ----------------------------------------------------------------------
+
+@job('finance.expense_summary')
+def send_expense_summary(user_id, period, start=None, end=None):
+    """
+    start / end (ISO dates) are fixed when the job is queued, so a retry
+    or a backlog drained after midnight still reports the same period.
+    Jobs queued without them report the period as of today.
+    """
+    user = User.objects.get(pk=user_id)
+    if start and end:
+        start, end = date.fromisoformat(start), date.fromisoformat(end)
+    else:
+        start, end = report_period(period)
+
+    context = {
+        'user': user,
+        'period': period,
+        'start': start,
+        'end': end,
+        **expense_summary(user, start, end),
+    }
+    _send(user, f"Your {period} expense report ({start} - {end})",
+          'emails/expense_summary.txt', context)
+
+
+@job('finance.debt_summary')
+def send_debt_summary(user_id, period):
+    user = User.objects.get(pk=user_id)
+
+    context = {
+        'user': user,
+        'period': period,
+        **debt_summary(user),
+    }
+    _send(user, f"Your {period} debt summary", 'emails/debt_summary.txt', context)
+
+
+def enqueue_period_reports(period):
+    """
+    Queue expense and debt summaries for every active user with an email.
+    Jobs are keyed on (job, user, period start): running it again for the
+    same period queues nothing new. Returns the number of jobs queued.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown report period '{period}'.")
+
+    user_ids = (
+        User.objects.filter(is_active=True)
+        .exclude(email='')
+        .values_list('id', flat=True)
+    )
+
+    start, end = report_period(period)
+
+    queued = 0
+    for user_id in user_ids.iterator():
+        payload = {'user_id': user_id, 'period': period}
+        jobs = (
+            ('finance.expense_summary', {**payload, 'start': start.isoformat(), 'end': end.isoformat()}),
+            ('finance.debt_summary', payload),
+        )
+        for name, job_payload in jobs:
+            _, created = enqueue_once(name, f'{name}:{user_id}:{period}:{start.isoformat()}', job_payload)
+            queued += created
+    return queued
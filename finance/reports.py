@@ -0,0 +1,224 @@
+"""
+Spend reports over any date range.
+
+    report = expense_report(user, date(2021, 1, 1), date(2025, 12, 31), MONTH)
+    report['by_category']['rows'][0]    # {'period': date, 'cells': [...], 'total': ...}
+
+A report has three pivots of the same periods: period x category,
+period x payment mode and period x debt payments / normal spend. All three
+come from one grouped query over ExpenseDailyRollup (one row per user, day,
+category and payment mode), so a five year monthly report reads at most a
+few thousand pre-aggregated rows however many expenses the user has.
+Reports are cached under the user's finance cache version.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import DateTimeField, Sum
+from django.db.models.functions import TruncWeek, TruncMonth, TruncYear
+from django.utils.dateparse import parse_date
+from django.utils.timezone import now
+
+from .cache import cached_for_user
+from .models import ExpenseDailyRollup, PAYMENT_CHOICES
+
+
+class _SQLiteDateTrunc:
+    """
+    Trunc* of a DateField with SQLite's own date() modifiers: Django's
+    generic SQLite truncation is a Python function called for every row
+    """
+    sqlite_modifiers = ()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        if isinstance(self.lhs.output_field, DateTimeField):
+            return self.as_sql(compiler, connection, **extra_context)
+
+        sql, params = compiler.compile(self.lhs)
+        modifiers = ', '.join(f"'{modifier}'" for modifier in self.sqlite_modifiers)
+        return f'DATE({sql}, {modifiers})', params
+
+
+class _TruncWeek(_SQLiteDateTrunc, TruncWeek):
+    # Monday on or before the date
+    sqlite_modifiers = ('-6 days', 'weekday 1')
+
+
+class _TruncMonth(_SQLiteDateTrunc, TruncMonth):
+    sqlite_modifiers = ('start of month',)
+
+
+class _TruncYear(_SQLiteDateTrunc, TruncYear):
+    sqlite_modifiers = ('start of year',)
+
+
+WEEK = 'week'
+MONTH = 'month'
+YEAR = 'year'
+
+GRANULARITIES = {
+    WEEK: _TruncWeek,
+    MONTH: _TruncMonth,
+    YEAR: _TruncYear,
+}
+
+PIVOTS = ('by_category', 'by_payment_mode', 'by_debt')
+
+# Weekly over ten years: keeps a single report (and its table) bounded
+MAX_PERIODS = 520
+DEFAULT_MONTHS = 12
+
+DEBT_SLUG = 'debt'
+DEBT_COLUMNS = ['Normal spend', 'Debt payments']
+UNCATEGORIZED = 'Uncategorized'
+ZERO = Decimal('0.00')
+
+
+# ----------------------------------------------------------------------
+# 🔹 PERIODS
+# ----------------------------------------------------------------------
+
+def period_start(day, granularity):
+    """
+    First day of the week (Monday) / month / year holding `day`,
+    the same date Trunc* gives in SQL
+    """
+    if granularity == WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == MONTH:
+        return day.replace(day=1)
+    if granularity == YEAR:
+        return day.replace(month=1, day=1)
+    raise ValueError(f"Unknown granularity '{granularity}'.")
+
+
+def _next_period(day, granularity):
+    if granularity == WEEK:
+        return day + timedelta(days=7)
+    if granularity == MONTH:
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return date(day.year + 1, 1, 1)
+
+
+def report_periods(start, end, granularity):
+    """
+    [period start] covering start..end, empty periods included
+    """
+    periods = []
+    day = period_start(start, granularity)
+    while day <= end:
+        periods.append(day)
+        day = _next_period(day, granularity)
+    return periods
+
+
+def report_range(params, today=None):
+    """
+    (start, end, granularity) from request parameters, defaulting to the
+    last DEFAULT_MONTHS months up to today. Raises ValueError for an
+    unusable range.
+    """
+    today = today or now().date()
+
+    granularity = params.get('granularity') or MONTH
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}.")
+
+    try:
+        end = parse_date(params.get('to_date') or '') or today
+        start = parse_date(params.get('from_date') or '')
+    except ValueError:
+        raise ValueError("from_date and to_date must be valid dates (YYYY-MM-DD).")
+
+    if start is None:
+        months = end.year * 12 + end.month - 1 - (DEFAULT_MONTHS - 1)
+        start = date(months // 12, months % 12 + 1, 1)
+    if start > end:
+        raise ValueError("from_date must not be after to_date.")
+    if len(report_periods(start, end, granularity)) > MAX_PERIODS:
+        raise ValueError(f"A report covers at most {MAX_PERIODS} periods, use a larger granularity.")
+
+    return start, end, granularity
+
+
+# ----------------------------------------------------------------------
+# 🔹 PIVOTS
+# ----------------------------------------------------------------------
+
+def _pivot(periods, columns, cells):
+    """
+    {'columns', 'rows', 'totals', 'total'} of {(period, column): amount}.
+    Columns are ordered by their total, largest first.
+    """
+    column_totals = defaultdict(Decimal)
+    for (_, column), amount in cells.items():
+        column_totals[column] += amount
+
+    columns = sorted(columns, key=lambda column: -column_totals[column])
+
+    rows = []
+    for period in periods:
+        values = [cells.get((period, column), ZERO) for column in columns]
+        rows.append({'period': period, 'cells': values, 'total': sum(values, ZERO)})
+
+    totals = [column_totals[column] for column in columns]
+    return {
+        'columns': columns,
+        'rows': rows,
+        'totals': totals,
+        'total': sum(totals, ZERO),
+    }
+
+
+def build_expense_report(user, start, end, granularity):
+    trunc = GRANULARITIES[granularity]
+
+    buckets = (
+        ExpenseDailyRollup.objects
+        .filter(user=user, date__range=[start, end])
+        .annotate(period=trunc('date'))
+        .values('period', 'category__name', 'category__slug', 'payment_mode')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by()
+    )
+
+    payment_modes = dict(PAYMENT_CHOICES)
+    by_category, by_payment_mode, by_debt = defaultdict(Decimal), defaultdict(Decimal), defaultdict(Decimal)
+    count = 0
+
+    for row in buckets:
+        # Two places: SQLite sums carry float noise, and the table needs no floatformat
+        period, total = row['period'], row['total'].quantize(ZERO)
+        category = (row['category__name'] or UNCATEGORIZED).title()
+        payment_mode = payment_modes.get(row['payment_mode'], row['payment_mode'])
+        kind = DEBT_COLUMNS[row['category__slug'] == DEBT_SLUG]
+
+        by_category[(period, category)] += total
+        by_payment_mode[(period, payment_mode)] += total
+        by_debt[(period, kind)] += total
+        count += row['count']
+
+    periods = report_periods(start, end, granularity)
+    return {
+        'start': start,
+        'end': end,
+        'granularity': granularity,
+        'periods': periods,
+        'count': count,
+        'by_category': _pivot(periods, {column for _, column in by_category}, by_category),
+        'by_payment_mode': _pivot(periods, {column for _, column in by_payment_mode}, by_payment_mode),
+        'by_debt': _pivot(periods, DEBT_COLUMNS, by_debt),
+    }
+
+
+def expense_report(user, start, end, granularity=MONTH):
+    """
+    The report of start..end, cached until the user's expenses or
+    categories change
+    """
+    return cached_for_user(
+        'report', user,
+        lambda: build_expense_report(user, start, end, granularity),
+        start.isoformat(), end.isoformat(), granularity
+    )
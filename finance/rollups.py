@@ -0,0 +1,191 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Expense, ExpenseDailyRollup
+
+
+ROLLUP_BATCH_SIZE = 1000
+
+
+# ----------------------------------------------------------------------
+# 🔹 INCREMENTAL MAINTENANCE
+# ----------------------------------------------------------------------
+
+def apply_rollup_delta(state, sign):
+    """
+    Add (sign=1) or remove (sign=-1) one expense from its rollup bucket.
+    `state` is the tuple returned by Expense.rollup_state().
+    """
+    if state is None:
+        return
+
+    user_id, day, category_id, payment_mode, amount = state
+    amount = Decimal(amount) * sign
+
+    bucket = ExpenseDailyRollup.objects.filter(
+        user_id=user_id,
+        date=day,
+        category_id=category_id,
+        payment_mode=payment_mode,
+    )
+
+    with transaction.atomic():
+        # Update a single row: deleting a category can leave several
+        # uncategorized rows for the same day (FK is SET_NULL)
+        pk = bucket.values_list('pk', flat=True).first()
+
+        if pk is None and sign > 0:
+            try:
+                with transaction.atomic():
+                    ExpenseDailyRollup.objects.create(
+                        user_id=user_id,
+                        date=day,
+                        category_id=category_id,
+                        payment_mode=payment_mode,
+                        total=amount,
+                        count=1,
+                    )
+                return
+            except IntegrityError:
+                # Created concurrently by another request
+                pk = bucket.values_list('pk', flat=True).first()
+
+        if pk is None:
+            return
+
+        ExpenseDailyRollup.objects.filter(pk=pk).update(
+            total=F('total') + amount,
+            count=F('count') + sign,
+        )
+
+        if sign < 0:
+            ExpenseDailyRollup.objects.filter(pk=pk, count__lte=0).delete()
+
+
+def remember_rollup_state(expense):
+    """
+    Called before save: make sure we know which bucket the row is leaving.
+    Rows loaded by from_db() already carry it, others are read once.
+    """
+    if hasattr(expense, '_rollup_state'):
+        return
+
+    expense._rollup_state = None
+    if expense._state.adding or expense.pk is None:
+        return
+
+    row = (
+        Expense.all_objects
+        .filter(pk=expense.pk)
+        .values_list('user_id', 'expense_date', 'category_id', 'payment_mode', 'amount', 'is_deleted')
+        .first()
+    )
+    if row is not None and not row[-1]:
+        expense._rollup_state = row[:-1]
+
+
+def sync_expense_rollup(expense, created=False, deleted=False):
+    """
+    Move an expense's contribution from its previous bucket to its current one
+    """
+    previous = None if created else getattr(expense, '_rollup_state', None)
+    current = None if deleted else expense.rollup_state()
+
+    if previous != current:
+        apply_rollup_delta(previous, -1)
+        apply_rollup_delta(current, 1)
+
+    expense._rollup_state = current
+
+
+# ----------------------------------------------------------------------
+# 🔹 FULL REBUILD
+# ----------------------------------------------------------------------
+
+def rebuild_rollups(user=None, start=None, end=None):
+    """
+    Recompute rollup rows from Expense. Optionally limited to one user and/or
+    a date range. Returns the number of rollup rows written.
+    """
+    expenses = Expense.objects.all()
+    rollups = ExpenseDailyRollup.objects.all()
+
+    if user is not None:
+        expenses = expenses.filter(user=user)
+        rollups = rollups.filter(user=user)
+    if start is not None:
+        expenses = expenses.filter(expense_date__gte=start)
+        rollups = rollups.filter(date__gte=start)
+    if end is not None:
+        expenses = expenses.filter(expense_date__lte=end)
+        rollups = rollups.filter(date__lte=end)
+
+    buckets = (
+        expenses
+        .order_by()
+        .values('user_id', 'expense_date', 'category_id', 'payment_mode')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+
+        batch = []
+        for row in buckets.iterator(chunk_size=ROLLUP_BATCH_SIZE):
+            batch.append(ExpenseDailyRollup(
+                user_id=row['user_id'],
+                date=row['expense_date'],
+                category_id=row['category_id'],
+                payment_mode=row['payment_mode'],
+                total=row['total'],
+                count=row['count'],
+            ))
+            if len(batch) >= ROLLUP_BATCH_SIZE:
+                ExpenseDailyRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+
+        if batch:
+            ExpenseDailyRollup.objects.bulk_create(batch)
+            written += len(batch)
+
+    return written
+
+
+# ----------------------------------------------------------------------
+# 🔹 READERS
+# ----------------------------------------------------------------------
+
+def dashboard_totals(user, today):
+    """
+    Month total, today total and total entry count from one rollup query
+    """
+    this_month = Q(date__year=today.year, date__month=today.month)
+
+    totals = ExpenseDailyRollup.objects.filter(user=user).aggregate(
+        month_total=Sum('total', filter=this_month),
+        today_total=Sum('total', filter=Q(date=today)),
+        expense_count=Sum('count'),
+    )
+
+    return {
+        'month_total': totals['month_total'] or 0,
+        'today_total': totals['today_total'] or 0,
+        'expense_count': totals['expense_count'] or 0,
+    }
+
+
+def category_summary(user, start, end):
+    """
+    Per-category totals between two dates, largest first
+    """
+    return list(
+        ExpenseDailyRollup.objects
+        .filter(user=user, date__range=[start, end])
+        .values('category__name')
+        .annotate(total=Sum('total'))
+        .order_by('-total')
+    )
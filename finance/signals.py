@@ -0,0 +1,104 @@
+from django.db.models import Min, Max
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from homecontrol.signals import soft_delete_changed
+
+from .models import Expense, Debt, ExpenseCategory
+from .rollups import remember_rollup_state, sync_expense_rollup, rebuild_rollups
+from .cache import bump_user_version, bump_global_version, bump_category_version
+
+
+# ----------------------------------------------------------------------
+# 🔹 EXPENSE ROLLUP
+# ----------------------------------------------------------------------
+
+@receiver(pre_save, sender=Expense)
+def expense_pre_save_rollup(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    remember_rollup_state(instance)
+
+
+@receiver(post_save, sender=Expense)
+def expense_post_save_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    sync_expense_rollup(instance, created=created)
+
+
+@receiver(post_delete, sender=Expense)
+def expense_post_delete_rollup(sender, instance, **kwargs):
+    sync_expense_rollup(instance, deleted=True)
+
+
+def _affected_users(model, pks):
+    """
+    {user_id: (first date, last date)} of the given rows
+    """
+    date_field = 'expense_date' if model is Expense else 'start_date'
+    users = {}
+    # Chunked: stay below the bound parameter limit of SQLite
+    for start in range(0, len(pks), 500):
+        rows = (
+            model.all_objects
+            .filter(pk__in=pks[start:start + 500])
+            .order_by()
+            .values('user_id')
+            .annotate(first=Min(date_field), last=Max(date_field))
+        )
+        for row in rows:
+            first, last = users.get(row['user_id'], (row['first'], row['last']))
+            users[row['user_id']] = (min(first, row['first']), max(last, row['last']))
+    return users
+
+
+@receiver(soft_delete_changed, sender=Expense)
+def expenses_soft_deleted(sender, pks, **kwargs):
+    # Bulk UPDATE: recompute the touched days instead of per-row deltas
+    for user_id, (first, last) in _affected_users(Expense, pks).items():
+        rebuild_rollups(user=user_id, start=first, end=last)
+        bump_user_version(user_id)
+
+
+@receiver(soft_delete_changed, sender=Debt)
+def debts_soft_deleted(sender, pks, **kwargs):
+    for user_id in _affected_users(Debt, pks):
+        bump_user_version(user_id)
+
+
+# ----------------------------------------------------------------------
+# 🔹 DASHBOARD CACHE INVALIDATION
+# ----------------------------------------------------------------------
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=Debt)
+@receiver(post_delete, sender=Debt)
+def finance_row_changed(sender, instance, **kwargs):
+    bump_user_version(instance.user_id)
+
+
+def _bump_category_owner(user_id, is_superuser):
+    if is_superuser:
+        bump_global_version()
+    else:
+        bump_user_version(user_id)
+        bump_category_version(user_id)
+
+
+@receiver(post_save, sender=ExpenseCategory)
+@receiver(post_delete, sender=ExpenseCategory)
+def category_changed(sender, instance, **kwargs):
+    _bump_category_owner(instance.user_id, instance.user.is_superuser)
+
+
+@receiver(soft_delete_changed, sender=ExpenseCategory)
+def categories_soft_deleted(sender, pks, **kwargs):
+    owners = set(
+        ExpenseCategory.all_objects
+        .filter(pk__in=pks)
+        .values_list('user_id', 'user__is_superuser')
+    )
+    for user_id, is_superuser in owners:
+        _bump_category_owner(user_id, is_superuser)
@@ -1,3 +1,670 @@
-from django.test import TestCase
+import base64
+import csv
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from functools import partial
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command, CommandError
+from django.db.models import Count, Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from homecontrol.models import Job
+from homecontrol.replicas import ReplicaRouter, REPLICA_DB, replica_reads
+
+from .amortization import build_schedules, debt_schedule, FLAT, REDUCING
+from .cache import cache_stats, cached_for_user, reset_cache_stats
+from .exports import escape_cell
+from .forms import CategoryForm
+from .importers import ExpenseImporter, BANK
+from .models import Debt, Expense, ExpenseCategory, ExpenseDailyRollup, SLUG_TAKEN
+from .pagination import encode_expense_cursor, expense_keyset_page
+from .report_mail import enqueue_period_reports, report_period, MONTHLY, WEEKLY
+
+
+MODULE = 'finance'
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every finance view in QUERY_BUDGETS requested with a few rows of each
+    kind, so an N+1 shows up as a budget overrun (BudgetTestRunner raises
+    QueryBudgetExceeded from the middleware).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        admin = User.objects.create_superuser('budget_admin', password='x')
+        cls.user = User.objects.create_user('budget_user', password='x')
+
+        debt_category = ExpenseCategory.objects.create(user=admin, name='debt', slug='debt')
+        categories = [
+            ExpenseCategory.objects.create(user=cls.user, name=name, slug=f'budget-{name}')
+            for name in ('food', 'fuel', 'rent')
+        ]
+
+        cls.debts = [
+            Debt.objects.create(
+                user=cls.user, name=f'Loan {i}', debt_type='LOAN',
+                principal_amount=Decimal('10000.00'), interest_rate=Decimal('1.00'),
+                tenure_months=12, emi_amount=Decimal('900.00'),
+                start_date=date.today() - timedelta(days=90),
+            )
+            for i in range(3)
+        ]
+
+        today = date.today()
+        for day in range(6):
+            for category in categories:
+                Expense.objects.create(
+                    user=cls.user, category=category, amount=Decimal('10.00') + day,
+                    payment_mode='cash', expense_date=today - timedelta(days=day),
+                )
+            for debt in cls.debts:
+                Expense.objects.create(
+                    user=cls.user, category=debt_category, debt=debt, amount=Decimal('900.00'),
+                    payment_mode='upi', expense_date=today - timedelta(days=30 * day),
+                )
+
+    budgeted_views = (
+        'finance:finance_dashboard',
+        'finance:exp_list',
+        'finance:debt_list',
+        'finance:debt_info',
+        'finance:report',
+        'finance:report_api',
+        'finance:chart_spend',
+        'finance:chart_categories',
+    )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def url(self, view_name):
+        kwargs = {'module': MODULE}
+        if view_name == 'finance:debt_info':
+            kwargs['pk'] = self.debts[0].pk
+        return reverse(view_name, kwargs=kwargs)
+
+    def test_budgeted_views(self):
+        for view_name in self.budgeted_views:
+            with self.subTest(view=view_name):
+                response = self.client.get(self.url(view_name))
+                self.assertEqual(response.status_code, 200)
+
+
+class ReplicaCacheTests(TransactionTestCase):
+    """
+    With a replica configured, @replica_reads views still fill and hit the
+    finance cache: misses are built from the primary. Not a TestCase: its
+    transaction keeps every read on the primary.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('replica_user', password='x')
+        reset_cache_stats()
+        # Claims a replica without one: a read routed there would fail
+        patcher = mock.patch('homecontrol.replicas.replica_configured', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_replica_reads_are_routed(self):
+        with replica_reads():
+            self.assertEqual(ReplicaRouter().db_for_read(Expense), REPLICA_DB)
+
+    def test_cache_hit_with_replica(self):
+        def build():
+            return Expense.objects.filter(user=self.user).count()
+
+        with replica_reads():
+            first = cached_for_user('replica_test', self.user, build)
+            second = cached_for_user('replica_test', self.user, build)
+
+        self.assertEqual((first, second), (0, 0))
+        self.assertEqual(cache_stats()['misses'], 1)
+        self.assertEqual(cache_stats()['hits'], 1)
+
+
+class RollupTests(TestCase):
+    """
+    ExpenseDailyRollup kept in step with Expense by the signals, compared
+    after every change with the totals computed from Expense itself
+    """
+
+    def setUp(self):
+        # User ids come back after each test's rollback: drop what earlier
+        # tests cached for them (the category registry)
+        cache.clear()
+        self.user = User.objects.create_user('rollup_user')
+        self.other = User.objects.create_user('rollup_other')
+        self.food = ExpenseCategory.objects.create(user=self.user, name='food', slug='rollup-food')
+        self.fuel = ExpenseCategory.objects.create(user=self.user, name='fuel', slug='rollup-fuel')
+        self.today = date.today()
+        self.expense = self.add(Decimal('100.00'))
+        self.add(Decimal('20.50'))
+
+    def add(self, amount, **fields):
+        fields = {'user': self.user, 'category': self.food, 'expense_date': self.today, **fields}
+        return Expense.objects.create(amount=amount, payment_mode='cash', **fields)
+
+    def rollup(self):
+        return {
+            (row.user_id, row.date, row.category_id, row.payment_mode): (row.total, row.count)
+            for row in ExpenseDailyRollup.objects.all()
+        }
+
+    def expected(self):
+        rows = (
+            Expense.objects.order_by()
+            .values_list('user_id', 'expense_date', 'category_id', 'payment_mode')
+            .annotate(total=Sum('amount'), count=Count('id'))
+        )
+        return {row[:4]: row[4:] for row in rows}
+
+    def assertRollupInSync(self):
+        self.assertEqual(self.rollup(), self.expected())
+
+    def test_create(self):
+        self.assertEqual(
+            self.rollup(),
+            {(self.user.pk, self.today, self.food.pk, 'cash'): (Decimal('120.50'), 2)},
+        )
+
+    def test_changes_move_the_amount(self):
+        changes = [
+            ('amount', Decimal('75.25')),
+            ('expense_date', self.today - timedelta(days=3)),
+            ('category', self.fuel),
+            ('payment_mode', 'upi'),
+            ('user', self.other),
+        ]
+        for field, value in changes:
+            with self.subTest(field=field):
+                setattr(self.expense, field, value)
+                self.expense.save()
+                self.assertRollupInSync()
+
+    def test_delete(self):
+        self.expense.delete()
+        self.assertRollupInSync()
+
+    def test_soft_delete_and_restore(self):
+        self.expense.soft_delete()
+        self.assertRollupInSync()
+        self.expense.restore()
+        self.assertRollupInSync()
+
+    def test_bulk_soft_delete_and_restore(self):
+        Expense.objects.filter(user=self.user).soft_delete()
+        self.assertEqual(self.rollup(), {})
+        Expense.all_objects.filter(user=self.user).restore()
+        self.assertRollupInSync()
+
+    def test_rebuild(self):
+        self.add(Decimal('5.00'), user=self.other, category=None)
+        ExpenseDailyRollup.objects.update(total=0)
+        ExpenseDailyRollup.objects.filter(user=self.other).delete()
+
+        call_command('rebuild_expense_rollup', stdout=StringIO())
+        self.assertRollupInSync()
+
+    def test_rebuild_limited_to_user_and_dates(self):
+        earlier = self.today - timedelta(days=10)
+        self.add(Decimal('30.00'), expense_date=earlier)
+        ExpenseDailyRollup.objects.update(total=0)
+
+        call_command(
+            'rebuild_expense_rollup', user=self.user.username,
+            from_date=str(earlier), to_date=str(earlier), stdout=StringIO(),
+        )
+
+        rollup = self.rollup()
+        self.assertEqual(rollup[(self.user.pk, earlier, self.food.pk, 'cash')], (Decimal('30.00'), 1))
+        self.assertEqual(rollup[(self.user.pk, self.today, self.food.pk, 'cash')], (Decimal('0.00'), 2))
+
+    def test_rebuild_rejects_bad_dates(self):
+        for options in (
+            {'from_date': 'yesterday'},
+            {'from_date': '2024-13-01'},
+            {'to_date': '2024-02-30'},
+            {'from_date': '2024-03-02', 'to_date': '2024-03-01'},
+        ):
+            with self.subTest(**options), self.assertRaises(CommandError):
+                call_command('rebuild_expense_rollup', stdout=StringIO(), **options)
+
+
+def decimal_schedule(principal, rate, tenure, method, prepayment=Decimal('0'), prepayment_month=0):
+    """
+    The amortization rules written out in Decimal rupees, one loan at a time
+    """
+    def paise(value):
+        return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    r = rate / 100
+    if method == FLAT:
+        flat_interest = paise(principal * r)
+        installment = paise(principal / tenure)
+    elif r:
+        growth = (1 + r) ** tenure
+        emi = paise(principal * r * growth / (growth - 1))
+    else:
+        emi = paise(principal / tenure)
+
+    rows = []
+    balance = principal
+    for month in range(1, tenure + 1):
+        if balance <= 0:
+            break
+        if method == FLAT:
+            interest, paid = flat_interest, installment
+        else:
+            interest = paise(balance * r)
+            paid = emi - interest
+        paid = balance if month == tenure else min(paid, balance)
+        if month == prepayment_month:
+            paid += min(prepayment, balance - paid)
+        balance -= paid
+        rows.append((interest + paid, interest, paid, balance))
+    return rows
+
+
+class AmortizationTests(SimpleTestCase):
+    """
+    The int64 paise engine against the same rules in Decimal
+    """
+    loans = [
+        # principal, monthly rate %, tenure
+        (Decimal('100000.00'), Decimal('1.00'), 12),
+        (Decimal('250000.00'), Decimal('0.75'), 60),
+        (Decimal('999999.99'), Decimal('1.33'), 37),
+        (Decimal('5000.01'), Decimal('2.50'), 7),
+        (Decimal('12345.67'), None, 10),
+        (Decimal('2500000.00'), Decimal('0.65'), 240),
+    ]
+
+    def schedules(self, method, prepayments=None, prepayment_months=None):
+        arrays = build_schedules(
+            [loan[0] for loan in self.loans],
+            [loan[1] for loan in self.loans],
+            [loan[2] for loan in self.loans],
+            method=method, prepayments=prepayments, prepayment_months=prepayment_months,
+        )
+        for i in range(len(self.loans)):
+            months = int(arrays['months'][i])
+            yield i, [
+                tuple(Decimal(int(arrays[key][i, k])) / 100 for key in ('payment', 'interest', 'principal', 'balance'))
+                for k in range(months)
+            ]
+
+    def test_matches_decimal(self):
+        for method in (FLAT, REDUCING):
+            for i, rows in self.schedules(method):
+                principal, rate, tenure = self.loans[i]
+                with self.subTest(method=method, loan=i):
+                    expected = decimal_schedule(principal, rate or Decimal('0'), tenure, method)
+                    self.assertEqual(rows, expected)
+                    self.assertEqual(sum(row[2] for row in rows), principal)
+
+    def test_prepayment_matches_decimal(self):
+        prepayments = [Decimal('20000.00')] * len(self.loans)
+        prepayment_months = [3] * len(self.loans)
+        for method in (FLAT, REDUCING):
+            for i, rows in self.schedules(method, prepayments, prepayment_months):
+                principal, rate, tenure = self.loans[i]
+                with self.subTest(method=method, loan=i):
+                    expected = decimal_schedule(
+                        principal, rate or Decimal('0'), tenure, method, Decimal('20000.00'), 3,
+                    )
+                    self.assertEqual(rows, expected)
+                    self.assertEqual(sum(row[2] for row in rows), principal)
+
+    def test_prepayment_shortens_the_loan(self):
+        debt = Debt(
+            principal_amount=Decimal('100000.00'), interest_rate=Decimal('1.00'),
+            tenure_months=24, emi_amount=Decimal('4707.35'), start_date=date(2024, 1, 31),
+        )
+        plain = debt_schedule(debt, method=REDUCING)
+        prepaid = debt_schedule(debt, method=REDUCING, prepayment=Decimal('30000'), prepayment_month=2)
+
+        self.assertEqual(plain['months'], 24)
+        self.assertLess(prepaid['months'], plain['months'])
+        self.assertLess(prepaid['total_interest'], plain['total_interest'])
+        self.assertEqual(prepaid['rows'][-1]['balance'], Decimal('0.00'))
+        self.assertEqual(prepaid['rows'][1]['due_date'], date(2024, 2, 29))
+
+
+class DebtPrepaymentTests(TestCase):
+    """
+    debt_info's ?prepay / ?prepay_month: bad values fall back to the plain
+    schedule with a message, never a 500
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('prepay_user')
+        cls.debt = Debt.objects.create(
+            user=cls.user, name='Car', debt_type='LOAN',
+            principal_amount=Decimal('100000.00'), interest_rate=Decimal('1.00'),
+            tenure_months=24, emi_amount=Decimal('4707.35'), start_date=date(2024, 1, 1),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('finance:debt_info', kwargs={'module': MODULE, 'pk': self.debt.pk})
+
+    def test_prepayment_applied(self):
+        response = self.client.get(self.url, {'method': REDUCING, 'prepay': '30000', 'prepay_month': '2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['prepay'], Decimal('30000'))
+        self.assertLess(response.context['schedule']['months'], 24)
+
+    def test_invalid_prepayment_ignored(self):
+        for params in (
+            {'prepay': 'NaN'},
+            {'prepay': 'Infinity'},
+            {'prepay': 'lots'},
+            {'prepay': '1000', 'prepay_month': '0'},
+            {'prepay': '1000', 'prepay_month': 'soon'},
+        ):
+            with self.subTest(**params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['prepay'], '')
+                self.assertEqual(response.context['schedule']['months'], 24)
+                self.assertIn('Invalid prepayment amount or month.', [str(m) for m in response.context['messages']])
+
+
+class ImporterTests(TestCase):
+    """
+    ExpenseImporter on in-memory CSV files
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('import_user')
+        # Cache versions are bumped on commit, which a TestCase never reaches
+        with self.captureOnCommitCallbacks(execute=True):
+            self.food = ExpenseCategory.objects.create(user=self.user, name='Food', slug='import-food')
+
+    def run_import(self, lines, **options):
+        importer = ExpenseImporter(self.user, **options)
+        return importer.run(StringIO('\n'.join(lines) + '\n'))
+
+    def test_error_rows(self):
+        result = self.run_import([
+            'date,amount,category,payment mode,note',
+            '2024-03-01,120.50,Food,cash,lunch',
+            '2024-02-30,10,Food,cash,impossible date',
+            'yesterday,10,Food,cash,no date',
+            '2024-03-02,NaN,Food,cash,',
+            '2024-03-02,Infinity,Food,cash,',
+            '2024-03-02,-5,Food,cash,',
+            '2024-03-02,10,Toys,cash,',
+            '2024-03-02,10,Food,cheque,',
+            '02/03/2024,"1,000.00",import-food,UPI,rent',
+        ])
+
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['error_count'], 7)
+        self.assertEqual([line for line, message in result['errors']], [3, 4, 5, 6, 7, 8, 9])
+        self.assertIn("Unknown category 'Toys'.", dict(result['errors']).values())
+        self.assertEqual(
+            sorted(Expense.objects.filter(user=self.user).values_list('amount', 'payment_mode')),
+            [(Decimal('120.50'), 'cash'), (Decimal('1000.00'), 'upi')],
+        )
+
+    def test_errors_reported_up_to_max(self):
+        result = self.run_import(['date,amount'] + ['bad,1'] * 5, max_errors=2)
+        self.assertEqual(result['error_count'], 5)
+        self.assertEqual(len(result['errors']), 2)
+
+    def test_chunked_across_batches(self):
+        lines = ['date,amount,note'] + [f'2024-03-{day:02},{day}.00,row {day}' for day in range(1, 8)]
+
+        with mock.patch.object(Expense.objects, 'bulk_create', wraps=Expense.objects.bulk_create) as bulk_create:
+            result = self.run_import(lines, chunk_size=3)
+
+        self.assertEqual([len(call.args[0]) for call in bulk_create.call_args_list], [3, 3, 1])
+        self.assertEqual(result['created'], 7)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 7)
+
+    def test_rollup_rebuilt(self):
+        Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('5.00'),
+            payment_mode='cash', expense_date=date(2024, 3, 1),
+        )
+        self.run_import([
+            'date,amount,category,mode',
+            '2024-03-01,10.00,Food,cash',
+            '2024-03-01,2.25,Food,cash',
+            '2024-03-05,7.00,,upi',
+        ], chunk_size=2)
+
+        rollups = {
+            (row.date, row.category_id, row.payment_mode): (row.total, row.count)
+            for row in ExpenseDailyRollup.objects.filter(user=self.user)
+        }
+        self.assertEqual(rollups, {
+            (date(2024, 3, 1), self.food.pk, 'cash'): (Decimal('17.25'), 3),
+            (date(2024, 3, 5), None, 'upi'): (Decimal('7.00'), 1),
+        })
+
+    def test_bank_statement_skips_credits(self):
+        result = self.run_import([
+            'Txn Date,Narration,Withdrawal Amt,Deposit Amt',
+            '01/03/2024,ATM,500.00,',
+            '02/03/2024,Salary,,90000.00',
+        ], fmt=BANK)
+        self.assertEqual((result['created'], result['skipped']), (1, 1))
+
+    def test_dry_run_writes_nothing(self):
+        result = self.run_import(['date,amount', '2024-03-01,10'], dry_run=True)
+        self.assertEqual(result['created'], 1)
+        self.assertFalse(Expense.objects.filter(user=self.user).exists())
+        self.assertFalse(ExpenseDailyRollup.objects.filter(user=self.user).exists())
+
+
+class ExpenseCursorTests(TestCase):
+    """
+    Keyset pages of expense_list on (-expense_date, -created_at, -id)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cursor_user')
+        today = date.today()
+        for day in range(3):
+            for n in range(4):
+                Expense.objects.create(
+                    user=cls.user, amount=Decimal(n + 1), payment_mode='cash',
+                    expense_date=today - timedelta(days=day),
+                )
+        # Ties on expense_date and created_at: only the id orders them
+        Expense.objects.filter(expense_date=today).update(created_at=Expense.objects.first().created_at)
+
+    def ordered_ids(self):
+        return list(
+            Expense.objects.filter(user=self.user)
+            .order_by('-expense_date', '-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def walk(self, size):
+        pages, cursors, cursor = [], [None], None
+        while True:
+            rows, cursor = expense_keyset_page(Expense.objects.filter(user=self.user), cursor=cursor, size=size)
+            pages.append([row.pk for row in rows])
+            if cursor is None:
+                return pages, cursors
+            cursors.append(cursor)
+
+    def test_forward_covers_every_row_once(self):
+        for size in (1, 3, 5, 12, 50):
+            with self.subTest(size=size):
+                pages, _ = self.walk(size)
+                self.assertEqual([pk for page in pages for pk in page], self.ordered_ids())
+                self.assertTrue(all(len(page) == size for page in pages[:-1]))
+
+    def test_back_to_an_earlier_cursor(self):
+        pages, cursors = self.walk(5)
+        # Cursors are stateless: going back replays the same pages
+        for cursor, page in reversed(list(zip(cursors, pages))):
+            rows, _ = expense_keyset_page(Expense.objects.filter(user=self.user), cursor=cursor, size=5)
+            self.assertEqual([row.pk for row in rows], page)
+
+    def test_view_pages(self):
+        self.client.force_login(self.user)
+        url = reverse('finance:exp_list', kwargs={'module': MODULE})
+        params = {'from_date': date.today() - timedelta(days=30), 'to_date': date.today()}
+
+        with mock.patch('finance.views.expense_keyset_page', partial(expense_keyset_page, size=5)):
+            first = self.client.get(url, params)
+            second = self.client.get(url, {**params, 'cursor': first.context['next_cursor']})
+
+        ids = self.ordered_ids()
+        self.assertEqual([e.pk for e in first.context['expenses']], ids[:5])
+        self.assertEqual([e.pk for e in second.context['expenses']], ids[5:10])
+
+    def test_tampered_cursors_start_over(self):
+        self.client.force_login(self.user)
+        url = reverse('finance:exp_list', kwargs={'module': MODULE})
+        params = {'from_date': date.today() - timedelta(days=30), 'to_date': date.today()}
+        expense = Expense.objects.first()
+
+        def encoded(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode()
+
+        for cursor in (
+            'not-a-cursor',
+            '!!!',
+            encoded('2024-02-30|2024-02-01T00:00:00+00:00|1'),
+            encoded('2024-01-01|yesterday|1'),
+            encoded('2024-01-01|2024-01-01T00:00:00+00:00|x'),
+            encoded('2024-01-01|2024-01-01T00:00:00+00:00'),
+            encoded(f'{base64.urlsafe_b64decode(encode_expense_cursor(expense)).decode()}|extra'),
+            base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {**params, 'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([e.pk for e in response.context['expenses']], self.ordered_ids())
+
+
+class ReportQueueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('report_a', 'report_b'):
+            User.objects.create_user(name, email=f'{name}@example.com')
+        User.objects.create_user('report_no_email')
+
+    def test_queued_once_per_user_and_period(self):
+        self.assertEqual(enqueue_period_reports(WEEKLY), 4)
+        self.assertEqual(enqueue_period_reports(WEEKLY), 0)
+        # Already run jobs still count
+        Job.objects.update(status='done')
+        self.assertEqual(enqueue_period_reports(WEEKLY), 0)
+
+        self.assertEqual(enqueue_period_reports(MONTHLY), 4)
+        self.assertEqual(Job.objects.count(), 8)
+
+        start, end = report_period(WEEKLY)
+        payloads = Job.objects.filter(name='finance.expense_summary', payload__period=WEEKLY).values_list('payload', flat=True)
+        self.assertEqual({(p['start'], p['end']) for p in payloads}, {(start.isoformat(), end.isoformat())})
+
+
+class ExportEscapingTests(TestCase):
+    """
+    CSV / XLSX exports never hand a spreadsheet a formula
+    """
+    notes = [
+        '=HYPERLINK("http://example.com","x")',
+        '+1+1',
+        '-2+3',
+        '@SUM(A1)',
+        'lunch = 2 plates',
+        "'quoted",
+    ]
+
+    def test_escape_cell(self):
+        self.assertEqual(
+            [escape_cell(note) for note in self.notes],
+            ["'" + note for note in self.notes[:4]] + self.notes[4:],
+        )
+        self.assertEqual(escape_cell('\t=1'), "'\t=1")
+        self.assertEqual(escape_cell(Decimal('-5.00')), Decimal('-5.00'))
+        self.assertIsNone(escape_cell(None))
+
+    def test_csv_export_round_trip(self):
+        user = User.objects.create_user('export_user')
+        for note in self.notes:
+            Expense.objects.create(
+                user=user, amount=Decimal('1.00'), payment_mode='cash', expense_date=date(2024, 3, 1), note=note,
+            )
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('finance:exp_export', kwargs={'module': MODULE}))
+        content = b''.join(response.streaming_content).decode()
+
+        exported = [row[-1] for row in csv.reader(StringIO(content))][1:]
+        self.assertEqual(exported, [escape_cell(note) for note in self.notes])
+
+        # The importer takes the quotes off again
+        ExpenseImporter(user).run(StringIO(content))
+        self.assertEqual(
+            sorted(Expense.objects.filter(user=user).values_list('note', flat=True)),
+            sorted(self.notes * 2),
+        )
+
+
+class CategorySoftDeleteTests(TestCase):
+    """
+    Name and slug are unique among live categories only
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('category_user')
+
+    def create(self, data):
+        form = CategoryForm(data, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        category = form.save(commit=False)
+        category.user = self.user
+        # The registry's cache version moves on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        return category
+
+    def test_delete_recreate_restore(self):
+        food = self.create({'name': 'Food', 'slug': ''})
+        with self.captureOnCommitCallbacks(execute=True):
+            food.soft_delete()
+
+        again = self.create({'name': 'Food', 'slug': ''})
+        self.assertEqual((again.slug, food.slug), ('food', 'food'))
+
+        # Restoring would make two live "food"s
+        with self.assertRaises(ValidationError):
+            food.restore()
+        self.assertTrue(ExpenseCategory.all_objects.get(pk=food.pk).is_deleted)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            again.soft_delete()
+        food.restore()
+        self.assertFalse(ExpenseCategory.all_objects.get(pk=food.pk).is_deleted)
+
+    def test_live_slug_still_unique(self):
+        self.create({'name': 'Food', 'slug': 'meals'})
+        form = CategoryForm({'name': 'Dining', 'slug': 'meals'}, user=self.user)
+        self.assertEqual(form.errors['slug'], [SLUG_TAKEN])
+
+        other = User.objects.create_user('category_other')
+        with self.assertRaises(ValidationError) as caught:
+            ExpenseCategory.objects.create(user=other, name='Dining', slug='meals')
+        self.assertEqual(caught.exception.message_dict, {'slug': [SLUG_TAKEN]})
@@ -5,6 +5,13 @@ app_name = 'finance'
 
 urlpatterns = [
     path('<module>', views.expense_dashboard, name='finance_dashboard'),
+    path('cache/stats/', views.finance_cache_stats, name='cache_stats'),
+    path('<module>/charts/spend/', views.chart_spend, name='chart_spend'),
+    path('<module>/charts/categories/', views.chart_categories, name='chart_categories'),
+
+    # Reports
+    path('<module>/reports/', views.expense_report, name='report'),
+    path('<module>/reports/data/', views.expense_report_api, name='report_api'),
 
     # Expenses Category
     path('<module>/categories/add/', views.category_create, name='category_add'),
@@ -17,11 +24,14 @@ urlpatterns = [
     path('<module>/debts/lists/', views.debt_list, name='debt_list'),
     path('<module>/debts/<int:pk>/edit/', views.debt_edit, name='debt_edit'),
     path('<module>/debts/<int:pk>/delete/', views.debt_delete, name='debt_delete'),
+    path('<module>/debts/<int:pk>/export/', views.debt_payments_export, name='debt_export'),
 
 
     # Expenses Transactions
     path('<module>/transactions/lists', views.expense_list, name='exp_list'),
     path('<module>/transactions/add/', views.expense_create, name='exp_add'),
+    path('<module>/transactions/import/', views.expense_import, name='exp_import'),
+    path('<module>/transactions/export/', views.expense_export, name='exp_export'),
     path('<module>/transactions/<int:pk>/edit/', views.expense_update, name='exp_edit'),
     path('<module>/transactions/<int:pk>/delete/', views.expense_delete, name='exp_delete'),
 
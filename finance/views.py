@@ -1,58 +1,215 @@
 from django.shortcuts import render
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse, Http404
+from django.views.decorators.http import require_safe
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import Expense, ExpenseCategory, Debt
-from .forms import ExpenseForm, CategoryForm, DebtForm
-from django.db.models import Sum
+from .forms import ExpenseForm, CategoryForm, DebtForm, ExpenseImportForm
+from .importers import ExpenseImporter
+from .exports import (
+    export_response, xlsx_available, served_async, XLSX,
+    EXPENSE_COLUMNS, EXPENSE_FIELDS, DEBT_PAYMENT_COLUMNS, DEBT_PAYMENT_FIELDS,
+)
+from .pagination import expense_keyset_page
+from .rollups import dashboard_totals, category_summary
+from .cache import acached_for_user, cache_stats
+from .amortization import debt_schedule, FLAT, METHODS
+from .reports import expense_report as build_report, report_range, GRANULARITIES, PIVOTS
+from .charts import chart_params, spend_series, category_shares
+from django.db.models import Sum, Count
+from django.conf import settings
 from django.utils.timezone import now
+from django.utils.dateparse import parse_date
 from django.db.models import Q
 from django.core.exceptions import ValidationError
 from django.contrib import messages
 from homecontrol.utils import _add_validation_messages, _add_form_error_messages
+from homecontrol.replicas import replica_reads
+from homecontrol.concurrency import run_concurrently
+from homecontrol.conditional import conditional_get, make_etag, table_state
+from asgiref.sync import sync_to_async
 from datetime import date
+from decimal import Decimal, InvalidOperation
 import calendar
 
 
+def _recent_expenses(user):
+    return list(
+        Expense.objects.filter(user=user)
+        .select_related('category')
+        .order_by('-expense_date', '-id')[:5]
+    )
+
+
+async def _dashboard_data(user, today):
+    # Totals come from the daily rollup, so the cost depends on the
+    # number of days a user has expenses on, not on the number of rows.
+    # The three reads are independent: run them at the same time.
+    totals, summary, recent_expenses = await run_concurrently(
+        (dashboard_totals, user, today),
+        (
+            category_summary, user,
+            today.replace(day=1),
+            today.replace(day=calendar.monthrange(today.year, today.month)[1]),
+        ),
+        (_recent_expenses, user),
+    )
+
+    return {
+        'month_total': totals['month_total'],
+        'today_total': totals['today_total'],
+        'expense_count': totals['expense_count'],
+        'category_summary': summary,
+        'recent_expenses': recent_expenses,
+    }
+
+
 @login_required(login_url='homecontrol:login')
-def expense_dashboard(request, module):
+@replica_reads()
+async def expense_dashboard(request, module):
+    user = await request.auser()
     today = now().date()
 
-    qs = Expense.objects.filter(user=request.user)
+    context = await acached_for_user(
+        'dashboard', user,
+        lambda: _dashboard_data(user, today),
+        today.isoformat()
+    )
+    context = {**context, 'module': module}
+
+    # Context processors (user, messages) read the session: not on the event loop
+    return await sync_to_async(render)(request, 'expense_dashboard.html', context)
+
 
-    month_total = qs.filter(
-        expense_date__year=today.year,
-        expense_date__month=today.month
-    ).aggregate(total=Sum('amount'))['total'] or 0
+# Reports
+@login_required(login_url='homecontrol:login')
+@replica_reads()
+def expense_report(request, module):
+    context = {}
 
-    today_total = qs.filter(expense_date=today).aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    try:
+        start, end, granularity = report_range(request.GET)
+    except ValueError as e:
+        messages.error(request, str(e))
+        start, end, granularity = report_range({})
 
-    expense_count = qs.count()
+    pivot = request.GET.get('pivot')
+    if pivot not in PIVOTS:
+        pivot = PIVOTS[0]
 
-    # Category summary
-    category_summary = (
-        qs.filter(
-            expense_date__year=today.year,
-            expense_date__month=today.month
-        )
-        .values('category__name')
-        .annotate(total=Sum('amount'))
-        .order_by('-total')
+    report = build_report(request.user, start, end, granularity)
+
+    context['module'] = module
+    context['report'] = report
+    context['pivot'] = report[pivot]
+    context['pivot_name'] = pivot
+    context['pivots'] = PIVOTS
+    context['granularities'] = list(GRANULARITIES)
+
+    return render(request, 'reports/expense_report.html', context)
+
+
+@login_required(login_url='homecontrol:login')
+@replica_reads()
+def expense_report_api(request, module):
+    try:
+        start, end, granularity = report_range(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    report = build_report(request.user, start, end, granularity)
+
+    # ?pivot=by_category returns only that pivot
+    pivot = request.GET.get('pivot')
+    if pivot:
+        if pivot not in PIVOTS:
+            return JsonResponse({'error': f"pivot must be one of {', '.join(PIVOTS)}."}, status=400)
+        report = {key: value for key, value in report.items() if key not in PIVOTS or key == pivot}
+
+    return JsonResponse(report)
+
+
+# Conditional GET (homecontrol/conditional.py)
+def _finance_validators(request, querysets, *parts):
+    # Database state only: a per-process cache version would differ
+    # between workers
+    last_modified, counts = table_state(request.user, *querysets)
+    etag = make_etag(request.user.pk, last_modified, *counts, *parts)
+    return etag, last_modified
+
+
+def _chart_validators(request, module):
+    user = request.user
+    querysets = (
+        Expense.all_objects.filter(user=user),
+        # Category names label the series
+        ExpenseCategory.all_objects.filter(Q(user=user) | Q(user__is_superuser=True)),
     )
+    # Default ranges end today
+    return _finance_validators(request, querysets, now().date())
 
-    # Recent expenses
-    recent_expenses = qs.order_by('-expense_date', '-id')[:5]
-    context = {
-        'month_total': month_total,
-        'today_total': today_total,
-        'expense_count': expense_count,
-        'category_summary': category_summary,
-        'recent_expenses': recent_expenses,
-        'module' : module
-    }
 
-    return render(request, 'expense_dashboard.html', context)
+def _expense_list_validators(request, module):
+    user = request.user
+    querysets = (
+        Expense.all_objects.filter(user=user),
+        ExpenseCategory.all_objects.filter(Q(user=user) | Q(user__is_superuser=True)),
+        Debt.all_objects.filter(user=user),
+    )
+    # The default range is this month, and the filter form has a CSRF token
+    return _finance_validators(
+        request, querysets,
+        date.today(), request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    )
+
+
+def _category_list_validators(request, module):
+    user = request.user
+    # Expense / debt writes don't change this page
+    querysets = (ExpenseCategory.all_objects.filter(Q(user=user) | Q(user__is_superuser=True)),)
+    return _finance_validators(request, querysets)
+
+
+def _debt_list_validators(request, module):
+    user = request.user
+    # Payments (expenses) change the paid / remaining amounts
+    querysets = (
+        Debt.all_objects.filter(user=user),
+        Expense.all_objects.filter(user=user),
+    )
+    return _finance_validators(request, querysets)
+
+
+# Charts
+@login_required(login_url='homecontrol:login')
+@replica_reads()
+@require_safe
+@conditional_get(_chart_validators)
+def chart_spend(request, module):
+    try:
+        start, end, granularity, max_points, _ = chart_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(spend_series(request.user, start, end, granularity, max_points))
+
+
+@login_required(login_url='homecontrol:login')
+@replica_reads()
+@require_safe
+@conditional_get(_chart_validators)
+def chart_categories(request, module):
+    try:
+        start, end, _, _, top = chart_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(category_shares(request.user, start, end, top))
+
+
+@user_passes_test(lambda u: u.is_superuser, login_url='homecontrol:login')
+def finance_cache_stats(request):
+    return JsonResponse(cache_stats())
 
 
 
@@ -67,7 +224,7 @@ def category_create(request, module):
         return redirect('finance:category_list', module = module)
     
     context = {}
-    form = CategoryForm(request.POST or None)
+    form = CategoryForm(request.POST or None, user=request.user)
     if form.is_valid():
         category = form.save(commit=False)
         category.user = request.user
@@ -76,8 +233,8 @@ def category_create(request, module):
             return redirect('finance:category_list', module=module)
         
         except ValidationError as e:
-            form.add_error('name', e.message_dict.get('name'))
-            print(e)
+            for field, errors in e.message_dict.items():
+                form.add_error(field if field in form.fields else None, errors)
 
     context['form'] = form
     context['module'] = module
@@ -86,11 +243,11 @@ def category_create(request, module):
 
 
 @login_required(login_url='homecontrol:login')
+@conditional_get(_category_list_validators)
 def category_list(request, module):
     
     context = {}
-    data = ExpenseCategory.objects.filter(Q(user=request.user) | Q(user__is_superuser=True)
-    ).filter(is_deleted = False)
+    data = ExpenseCategory.objects.filter(Q(user=request.user) | Q(user__is_superuser=True))
     context['data'] = data
     context['module'] = module
 
@@ -128,43 +285,95 @@ def debt_add(request, module):
         }
     )
 
+def _user_debt(user, pk):
+    return Debt.objects.with_payment_stats().filter(pk=pk, user=user).first()
+
+
+def _debt_payments(user, pk):
+    return list(Expense.objects.filter(debt__id=pk, user=user))
+
+
 @login_required
-def debt_info(request, module, pk):
+@replica_reads()
+async def debt_info(request, module, pk):
     context = {}
+    user = await request.auser()
 
-    debt = get_object_or_404(Debt, pk=pk, user=request.user)
-
-    debt_payments = Expense.objects.filter(debt__id = pk).filter(user = request.user)
+    # The payments don't depend on the debt row: fetch both at once
+    debt, debt_payments = await run_concurrently(
+        (_user_debt, user, pk),
+        (_debt_payments, user, pk),
+    )
+    if debt is None:
+        raise Http404("No Debt matches the given query.")
+
+    # Amortization schedule, optional "what if I prepay X in month N"
+    method = request.GET.get('method', FLAT)
+    if method not in METHODS:
+        method = FLAT
+
+    try:
+        prepayment = Decimal(request.GET.get('prepay') or 0)
+        prepayment_month = int(request.GET.get('prepay_month') or 1)
+        # NaN / Infinity parse as Decimals
+        if not prepayment.is_finite() or prepayment_month < 1:
+            raise ValueError
+    except (InvalidOperation, ValueError):
+        prepayment, prepayment_month = Decimal('0'), 1
+        messages.error(request, "Invalid prepayment amount or month.")
+
+    schedule = debt_schedule(
+        debt, method=method,
+        prepayment=prepayment if prepayment > 0 else None,
+        prepayment_month=prepayment_month,
+    )
 
     context['debt'] = debt
     context['debt_payments'] = debt_payments
+    context['schedule'] = schedule
+    context['prepay'] = prepayment if prepayment > 0 else ''
+    context['prepay_month'] = prepayment_month
     context['module'] = module
 
-    return render(request, 'debt/debt_info.html', context)
+    return await sync_to_async(render)(request, 'debt/debt_info.html', context)
 
-def debt_list(request, module):
-    debts = Debt.objects.filter(user=request.user).filter(is_deleted=False)
+def _debt_summary(user):
+    # One query: payment stats are annotated on every row
+    debts = list(
+        Debt.objects.with_payment_stats()
+        .filter(user=user)
+    )
 
     total_debt = sum(d.principal_amount for d in debts)
     total_interest = sum(d.total_interest for d in debts)
     gross_amount = total_debt + total_interest
 
+    total_paid = sum(d.net_paid for d in debts)
+    total_remaining = sum(d.net_remaining for d in debts)
 
-    # total Paid
-    total_paid = Expense.objects.filter(user=request.user).filter(category__name__iexact = 'Debt').aggregate(total_amount_paid = Sum('amount'))
-    print(total_paid)
-    # total_debt = sum(d.principal_amount for d in debts)
-
-
-    return render(request, 'debt/debt_list.html', {
+    return {
         'debts': debts,
         'total_debt': total_debt,
         'total_interest': total_interest,
         'gross_amount': gross_amount,
-        'total_paid': 0,
-        'total_remaining': 0,
-        'module': module,
-    })
+        'total_paid': total_paid,
+        'total_remaining': total_remaining,
+    }
+
+
+@login_required
+@replica_reads()
+@conditional_get(_debt_list_validators)
+async def debt_list(request, module):
+    user = await request.auser()
+
+    context = await acached_for_user(
+        'debt_summary', user,
+        lambda: sync_to_async(_debt_summary)(user)
+    )
+    context = {**context, 'module': module}
+
+    return await sync_to_async(render)(request, 'debt/debt_list.html', context)
 
 @login_required
 def debt_edit(request, module, pk):
@@ -198,17 +407,17 @@ def debt_delete(request, module, pk):
 
     debt = get_object_or_404(Debt, pk=pk, user=request.user)
 
-    if debt.expenses.exists():
+    if debt.expense_debt.exists():
         messages.error(
             request,
             "Debt cannot be deleted because EMI expenses are linked."
         )
-        return redirect('finance:debt_info', pk=debt.pk)
+        return redirect('finance:debt_info', module=module, pk=debt.pk)
 
     if request.method == "POST":
-        debt.delete()
+        debt.soft_delete()
         messages.success(request, "Debt deleted successfully.")
-        return redirect('finance:debt_list')
+        return redirect('finance:debt_list', module=module)
     
     context['debt'] = debt
     context['module'] = module
@@ -219,7 +428,20 @@ def debt_delete(request, module, pk):
 
 # Transactions
 
+def _date_param(params, name, default=None):
+    """
+    Date of a YYYY-MM-DD parameter, `default` when missing or invalid
+    """
+    try:
+        return parse_date(params.get(name) or '') or default
+    except ValueError:
+        # Well formed but not a date, e.g. 2024-02-30
+        return default
+
+
 @login_required(login_url='homecontrol:login')
+@replica_reads()
+@conditional_get(_expense_list_validators)
 def expense_list(request, module):
     context = {}
     expenses = Expense.objects.filter(user=request.user)
@@ -228,31 +450,35 @@ def expense_list(request, module):
     current_date = date.today()
     current_month_days = calendar.monthrange(current_date.year, current_date.month)[1]
 
-    # from_date = current_date.replace(current_date.year, current_date.month, 1)
-    # to_date = current_date.replace(current_date.year, current_date.month, current_month_days)
-  
     from_date = current_date.replace(day=1)
     to_date = current_date.replace(day=current_month_days)
-    
 
 
-    if request.method == 'POST':
-        from_date = request.POST.get('from_date')
-        to_date = request.POST.get('to_date')
-        expenses = expenses.filter(expense_date__lte = to_date).filter(expense_date__gte = from_date)
+    # Filter comes from the form (POST) or from the pagination links (GET)
+    params = request.POST if request.method == 'POST' else request.GET
+    from_date = _date_param(params, 'from_date', from_date)
+    to_date = _date_param(params, 'to_date', to_date)
 
-    else:
-        expenses = expenses.filter(expense_date__range = [from_date, to_date])
+    expenses = expenses.filter(expense_date__range = [from_date, to_date])
 
 
+    # Totals in one aggregate query, rows are paginated by keyset
+    totals = expenses.aggregate(total=Sum('amount'), count=Count('id'))
 
-    total = sum(e.amount for e in expenses)
+    cursor = request.GET.get('cursor') if request.method == 'GET' else None
+    rows, next_cursor = expense_keyset_page(
+        expenses.select_related('category', 'debt'),
+        cursor=cursor,
+    )
 
     context['module'] = module
-    context['expenses'] = expenses
-    context['total'] = total
+    context['expenses'] = rows
+    context['total'] = totals['total'] or 0
+    context['expense_count'] = totals['count']
     context['from_date'] = from_date
     context['to_date'] = to_date
+    context['cursor'] = cursor
+    context['next_cursor'] = next_cursor
 
 
     return render(request, 'expenses/expense_list.html', context)
@@ -304,9 +530,89 @@ def expense_delete(request, module, pk):
     context = {}
 
     expense = get_object_or_404(Expense, pk=pk, user=request.user)
-    expense.delete()
+    expense.soft_delete()
 
     context['module'] = module
 
     return redirect('finance:exp_list', module = module)
 
+
+@login_required(login_url='homecontrol:login')
+def expense_import(request, module):
+    context = {}
+
+    form = ExpenseImportForm(request.POST or None, request.FILES or None)
+    if form.is_valid():
+        try:
+            importer = ExpenseImporter(
+                request.user,
+                fmt=form.cleaned_data['file_format'],
+                chunk_size=form.cleaned_data['chunk_size'],
+                default_category=form.cleaned_data['default_category'] or None,
+            )
+            result = importer.run(form.cleaned_data['file'])
+        except (ValueError, UnicodeDecodeError) as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, f"{result['created']} expenses imported.")
+            if result['error_count']:
+                messages.warning(request, f"{result['error_count']} rows could not be imported.")
+            context['result'] = result
+
+    elif form.errors:
+        _add_form_error_messages(request, form)
+
+    context['module'] = module
+    context['form'] = form
+
+    return render(request, 'expenses/expense_import.html', context)
+
+
+def _export_format(request):
+    fmt = request.GET.get('format', 'csv')
+    if fmt == XLSX and not xlsx_available():
+        raise Http404("XLSX export needs openpyxl.")
+    return fmt
+
+
+@login_required(login_url='homecontrol:login')
+def expense_export(request, module):
+    fmt = _export_format(request)
+
+    expenses = Expense.objects.filter(user=request.user)
+
+    from_date = _date_param(request.GET, 'from_date')
+    to_date = _date_param(request.GET, 'to_date')
+    if from_date:
+        expenses = expenses.filter(expense_date__gte=from_date)
+    if to_date:
+        expenses = expenses.filter(expense_date__lte=to_date)
+
+    filename = f"expenses_{from_date or 'start'}_{to_date or 'today'}"
+
+    return export_response(
+        fmt, filename, EXPENSE_COLUMNS, expenses, EXPENSE_FIELDS,
+        asynchronous=served_async(request)
+    )
+
+
+@login_required(login_url='homecontrol:login')
+def debt_payments_export(request, module, pk):
+    fmt = _export_format(request)
+
+    debt = get_object_or_404(Debt, pk=pk, user=request.user)
+    payments = Expense.objects.filter(debt=debt, user=request.user)
+
+    from_date = _date_param(request.GET, 'from_date')
+    to_date = _date_param(request.GET, 'to_date')
+    if from_date:
+        payments = payments.filter(expense_date__gte=from_date)
+    if to_date:
+        payments = payments.filter(expense_date__lte=to_date)
+
+    filename = f"debt_{debt.pk}_payments"
+
+    return export_response(
+        fmt, filename, DEBT_PAYMENT_COLUMNS, payments, DEBT_PAYMENT_FIELDS,
+        asynchronous=served_async(request)
+    )
@@ -1,8 +1,64 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import IntegrityError
+from .models import Job, ChangeLog
 
 
 
 
 admin.site.site_header = "KS Overall Control Panel"
 admin.site.site_title = "KS Overall Admin"
-admin.site.index_title = "System Administration"
\ No newline at end of file
+admin.site.index_title = "System Administration"
+
+
+class SoftDeleteAdmin(admin.ModelAdmin):
+    """
+    Shows soft deleted rows too, with bulk soft delete / restore actions
+    """
+    actions = ['soft_delete_selected', 'restore_selected']
+
+    def get_queryset(self, request):
+        qs = self.model.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            qs = qs.order_by(*ordering)
+        return qs
+
+    @admin.action(description="Soft delete selected rows")
+    def soft_delete_selected(self, request, queryset):
+        count = queryset.soft_delete()
+        self.message_user(request, f"{count} rows soft deleted.")
+
+    @admin.action(description="Restore selected rows")
+    def restore_selected(self, request, queryset):
+        try:
+            count = queryset.restore()
+        except IntegrityError:
+            # A row clashes with a live one (a unique constraint over live
+            # rows only): restore the others one by one and name it
+            count, conflicts = 0, []
+            for obj in queryset.filter(is_deleted=True):
+                try:
+                    count += self.model.all_objects.filter(pk=obj.pk).restore()
+                except IntegrityError:
+                    conflicts.append(str(obj))
+            self.message_user(
+                request,
+                f"Not restored, a live row has the same unique values: {', '.join(conflicts)}.",
+                level=messages.ERROR,
+            )
+        self.message_user(request, f"{count} rows restored.")
+
+
+@admin.register(Job)
+class JobList(admin.ModelAdmin):
+    list_display = ['name', 'status', 'run_at', 'attempts', 'locked_by', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['key']
+
+
+
+@admin.register(ChangeLog)
+class ChangeLogList(admin.ModelAdmin):
+    list_display = ['model', 'object_id', 'action', 'user', 'changed_at']
+    list_filter = ['model', 'action']
+    search_fields = ['=object_id']
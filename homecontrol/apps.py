@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class HomecontrolConfig(AppConfig):
     name = 'homecontrol'
+
+    def ready(self):
+        from . import changelog, checks  # noqa: F401
@@ -0,0 +1,81 @@
+"""
+Request-scoped "current user" for the created_by / updated_by audit fields.
+
+CurrentUserMiddleware stores the request's user in a ContextVar, which follows
+the request into sync_to_async threads under ASGI and is isolated per
+thread under WSGI. Outside a request (commands, workers) use:
+
+    with acting_as(user):
+        ...
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
+_current_user = ContextVar('current_user', default=None)
+
+
+class _RequestUser:
+    """
+    request.user, resolved when first needed. The lazy request.user itself
+    can't go in the ContextVar: asgiref compares context values with ==
+    on the event loop around async views, which would load it there.
+    """
+    def __init__(self, request):
+        self.request = request
+
+    def get(self):
+        return getattr(self.request, 'user', None)
+
+
+def get_current_user():
+    user = _current_user.get()
+    if isinstance(user, _RequestUser):
+        return user.get()
+    return user
+
+
+def current_user_id():
+    """
+    pk of the authenticated current user, None otherwise (no query: the
+    request's user is already loaded by the time anything is saved)
+    """
+    user = get_current_user()
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+@contextmanager
+def acting_as(user):
+    token = _current_user.set(user)
+    try:
+        yield user
+    finally:
+        _current_user.reset(token)
+
+
+class CurrentUserMiddleware:
+    """
+    Must come after AuthenticationMiddleware
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with acting_as(_RequestUser(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with acting_as(_RequestUser(request)):
+            return await self.get_response(request)
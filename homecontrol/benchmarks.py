@@ -0,0 +1,218 @@
+"""
+Benchmark of every finance and chat URL.
+
+    manage.py benchmark --sizes small medium --save perf_baseline.json
+    manage.py benchmark --sizes small medium --compare perf_baseline.json
+
+The command runs on test databases created like the test runner does. For
+each data size the perf_ data is seeded (homecontrol/perfdata.py) and
+every URL of finance/urls.py and chat/urls.py is requested as perf_0000:
+once right after the user's finance cache version is bumped (cold), then
+`repeat` more times (warm). A result has the status, the query counts and
+the median / p95 latency of the warm runs.
+
+Against a saved baseline, any extra query is a regression, and so is a
+median that grew by more than `tolerance` and `min_ms`.
+"""
+import json
+import os
+import statistics
+import time
+from collections import Counter
+from contextlib import ExitStack
+from importlib import import_module
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+
+from chat.models import ConversationMember
+from finance.cache import bump_user_version
+from finance.models import Expense, Debt
+
+from .metrics import fingerprint, query_budget
+from .perfdata import USER_PREFIX
+
+
+URLCONFS = ['finance.urls', 'chat.urls']
+BENCHMARK_USER = f'{USER_PREFIX}0000'
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_MS = 2.0
+
+# Views that change data on a GET are not requested
+SKIP = {
+    'finance:exp_delete': "soft deletes the expense on GET",
+}
+
+# POST only views: the data to send
+POST_DATA = {
+    'chat:mark_read_api': lambda fixture: {'up_to': fixture['last_message']},
+    'chat:start_private_chat': lambda fixture: {},
+}
+
+
+def load_fixture(username=BENCHMARK_USER):
+    """
+    The user the URLs are requested as, and the objects its URLs point at
+    """
+    user = User.objects.filter(username=username).first()
+    debt = Debt.objects.filter(user=user).order_by('pk').first()
+    expense = Expense.objects.filter(user=user).order_by('-expense_date', '-pk').first()
+    member = ConversationMember.objects.filter(user=user).order_by('conversation_id').first()
+    if None in (user, debt, expense, member):
+        raise ValueError(f"No benchmark data for '{username}', run seed_perf_data first.")
+
+    peer = (
+        ConversationMember.objects
+        .filter(conversation_id=member.conversation_id)
+        .exclude(user=user)
+        .values_list('user_id', flat=True)
+        .first()
+    )
+    return {
+        'user': user,
+        'module': 'finance',
+        'debt': debt.pk,
+        'expense': expense.pk,
+        'conversation': member.conversation_id,
+        'peer': peer,
+        'last_message': member.last_message_id,
+    }
+
+
+def _kwargs(name, parameters, fixture):
+    values = {
+        'module': fixture['module'],
+        'conversation_id': fixture['conversation'],
+        'user_id': fixture['peer'],
+        'pk': fixture['expense'] if name.startswith('finance:exp_') else fixture['debt'],
+    }
+    return {parameter: values[parameter] for parameter in parameters}
+
+
+def benchmark_urls(fixture):
+    """
+    [(view name, url, method, data)] of every benchmarked URL
+    """
+    urls = []
+    for urlconf in URLCONFS:
+        module = import_module(urlconf)
+        for pattern in module.urlpatterns:
+            name = f'{module.app_name}:{pattern.name}'
+            if name in SKIP:
+                continue
+            url = reverse(name, kwargs=_kwargs(name, pattern.pattern.converters, fixture))
+            if name in POST_DATA:
+                urls.append((name, url, 'post', POST_DATA[name](fixture)))
+            else:
+                urls.append((name, url, 'get', None))
+    return urls
+
+
+def _request(client, method, url, data):
+    """
+    (status, milliseconds, [sql]) of one request, streamed bodies included
+    """
+    with ExitStack() as stack:
+        captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+        started = time.perf_counter()
+        response = getattr(client, method)(url, data)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = (time.perf_counter() - started) * 1000
+
+    return response.status_code, elapsed, [query['sql'] for capture in captured for query in capture]
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def run_benchmark(fixture, repeat=DEFAULT_REPEAT, only=None):
+    """
+    {view name: result} for the benchmarked URLs (names containing `only`)
+    """
+    client = Client(raise_request_exception=False)
+    client.force_login(fixture['user'])
+
+    results = {}
+    for name, url, method, data in benchmark_urls(fixture):
+        if only and only not in name:
+            continue
+
+        bump_user_version(fixture['user'].pk)
+        status, cold_ms, cold_queries = _request(client, method, url, data)
+
+        timings, queries = [], cold_queries
+        for _ in range(repeat):
+            status, elapsed, queries = _request(client, method, url, data)
+            timings.append(elapsed)
+
+        fingerprints = Counter(fingerprint(sql) for sql in cold_queries)
+        results[name] = {
+            'url': url,
+            'method': method.upper(),
+            'status': status,
+            'queries_cold': len(cold_queries),
+            'queries': len(queries),
+            'duplicates': sum(count - 1 for count in fingerprints.values() if count > 1),
+            'cold_ms': round(cold_ms, 2),
+            'median_ms': round(statistics.median(timings), 2) if timings else None,
+            'p95_ms': round(_percentile(timings, 95), 2) if timings else None,
+            'budget': query_budget(name),
+        }
+    return results
+
+
+# ----------------------------------------------------------------------
+# 🔹 BASELINE
+# ----------------------------------------------------------------------
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
+
+
+def save_baseline(path, sizes, repeat):
+    """
+    Write {size: results}, keeping the sizes of an existing file not re-run
+    """
+    baseline = load_baseline(path) if os.path.exists(path) else {'sizes': {}}
+    baseline['sizes'].update(sizes)
+    baseline['repeat'] = repeat
+    baseline['saved_at'] = now().isoformat()
+
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump(baseline, stream, indent=2, sort_keys=True)
+
+
+def compare(sizes, baseline, tolerance=DEFAULT_TOLERANCE, min_ms=DEFAULT_MIN_MS):
+    """
+    [(size, view name, reason)] of results worse than the baseline
+    """
+    regressions = []
+    for size, results in sizes.items():
+        previous_results = baseline['sizes'].get(size, {})
+        for name, result in results.items():
+            previous = previous_results.get(name)
+            if previous is None:
+                continue
+
+            # A fixed error is not a regression
+            if result['status'] != previous['status'] and result['status'] >= 400:
+                regressions.append((size, name, f"status {previous['status']} -> {result['status']}"))
+            for key in ('queries_cold', 'queries'):
+                if result[key] > previous[key]:
+                    regressions.append((size, name, f"{key} {previous[key]} -> {result[key]}"))
+
+            before, after = previous['median_ms'], result['median_ms']
+            if before is not None and after is not None:
+                if after > before * (1 + tolerance) and after - before > min_ms:
+                    regressions.append((size, name, f"median {before:.1f}ms -> {after:.1f}ms"))
+    return regressions
@@ -0,0 +1,157 @@
+"""
+Asynchronous, batched ChangeLog writer.
+
+post_save / post_delete of ChangeTracked models diff the row against the
+values it was loaded with and, once the transaction commits, hand the
+entry to a background thread. The thread writes with one bulk_create per
+CHANGELOG_BATCH_SIZE entries or CHANGELOG_FLUSH_INTERVAL seconds, so the
+request path never waits on a log write. Entries still buffered when the
+process exits are flushed by atexit; a hard kill loses at most one batch.
+
+bulk_create / bulk_update / queryset update() are not logged, except the
+soft delete / restore UPDATE (soft_delete_changed).
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from .audit import current_user_id
+from .models import ChangeTracked, ChangeLog
+from .signals import soft_delete_changed
+
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping that changes on every save
+IGNORED_FIELDS = {'updated_at', 'updated_by_id'}
+
+
+class ChangeLogWriter:
+
+    def __init__(self, batch_size=None, interval=None):
+        self.batch_size = batch_size or getattr(settings, 'CHANGELOG_BATCH_SIZE', 200)
+        self.interval = interval or getattr(settings, 'CHANGELOG_FLUSH_INTERVAL', 2.0)
+        self.pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, entry):
+        with self._lock:
+            self.pending.append(entry)
+            full = len(self.pending) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='changelog-writer', daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                entries, self.pending = self.pending, []
+            if not entries:
+                return 0
+            try:
+                close_old_connections()
+                ChangeLog.objects.bulk_create(entries, batch_size=self.batch_size)
+            except Exception:
+                logger.exception("Could not write %s change log entries", len(entries))
+                return 0
+            return len(entries)
+
+
+_writer = None
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        _writer = ChangeLogWriter()
+        atexit.register(_writer.flush)
+    return _writer
+
+
+def enabled():
+    return getattr(settings, 'CHANGELOG_ENABLED', False)
+
+
+def _log(instance_or_model, object_id, action, changes):
+    entry = ChangeLog(
+        model=instance_or_model._meta.label_lower,
+        object_id=object_id,
+        action=action,
+        changes=changes,
+        user_id=current_user_id(),
+        changed_at=now(),
+    )
+    transaction.on_commit(lambda: get_writer().add(entry))
+
+
+def _diff(instance, update_fields=None):
+    before = getattr(instance, '_loaded_values', {})
+    current = instance.__dict__
+    names = before.keys()
+    if update_fields is not None:
+        fields = {instance._meta.get_field(name).attname for name in update_fields}
+        names = [name for name in names if name in fields]
+
+    return {
+        name: [before[name], current[name]]
+        for name in names
+        if name not in IGNORED_FIELDS and name in current and before[name] != current[name]
+    }
+
+
+@receiver(post_save)
+def log_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not isinstance(instance, ChangeTracked) or not enabled():
+        return
+
+    if created:
+        changes = {
+            field.attname: [None, getattr(instance, field.attname)]
+            for field in instance._meta.concrete_fields
+            if field.attname not in IGNORED_FIELDS and not field.primary_key
+        }
+        action = 'create'
+    else:
+        changes = _diff(instance, update_fields)
+        if not changes:
+            return
+        action = 'update'
+
+    _log(sender, instance.pk, action, changes)
+
+    # The next save diffs against what is stored now
+    instance._loaded_values = {
+        field.attname: instance.__dict__[field.attname]
+        for field in instance._meta.concrete_fields
+        if field.attname in instance.__dict__
+    }
+
+
+@receiver(post_delete)
+def log_delete(sender, instance, **kwargs):
+    if isinstance(instance, ChangeTracked) and enabled():
+        _log(sender, instance.pk, 'delete', {})
+
+
+@receiver(soft_delete_changed)
+def log_soft_delete(sender, pks, deleted, **kwargs):
+    if issubclass(sender, ChangeTracked) and enabled():
+        for pk in pks:
+            _log(sender, pk, 'update', {'is_deleted': [not deleted, deleted]})
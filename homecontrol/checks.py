@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core import checks
+
+from Overall.database import describe
+
+
+@checks.register(checks.Tags.database, deploy=True)
+def database_profile(app_configs, **kwargs):
+    """
+    The active database profile, with `manage.py check --deploy`
+    """
+    return [
+        checks.Info(f"Database '{alias}': {describe(config)}", id='homecontrol.I001')
+        for alias, config in settings.DATABASES.items()
+    ]
+
+
+@checks.register(checks.Tags.database)
+def sqlite_transaction_mode(app_configs, **kwargs):
+    messages = []
+    for alias, config in settings.DATABASES.items():
+        options = config.get('OPTIONS', {})
+        if (
+            config['ENGINE'].endswith('sqlite3')
+            and not options.get('uri')
+            and options.get('transaction_mode', '').upper() != 'IMMEDIATE'
+        ):
+            messages.append(checks.Warning(
+                f"Database '{alias}' is SQLite without transaction_mode IMMEDIATE.",
+                hint="Concurrent writers from several workers can fail with 'database is locked'. "
+                     "Use Overall.database.database_config().",
+                id='homecontrol.W001',
+            ))
+    return messages
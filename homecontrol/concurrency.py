@@ -0,0 +1,63 @@
+"""
+Independent queries of an async view, run at the same time.
+
+    totals, summary, recent = await run_concurrently(
+        (dashboard_totals, user, today),
+        (category_summary, user, start, end),
+        (recent_expenses, user),
+    )
+
+Each call runs in a pool thread (sync_to_async, thread_sensitive=False)
+with that thread's own database connection, so the wall clock time is
+about the slowest call rather than the sum. Context variables (replica
+routing, current user, query metrics) are copied into the threads.
+
+The calls run one after another on the request's connection instead:
+- inside a transaction, as other connections would not see its
+  uncommitted rows (TestCase, ATOMIC_REQUESTS);
+- on SQLite, where the queries run in this process on one local file:
+  a connection per pool thread costs more than the overlap saves.
+  Threads pay off when the queries wait on a database server.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+
+def _in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+def _server_databases():
+    # vendor comes from the backend class, no connection is opened
+    return all(connections[alias].vendor != 'sqlite' for alias in connections)
+
+
+def _concurrent():
+    return (
+        getattr(settings, 'CONCURRENT_QUERIES', True)
+        and _server_databases()
+        and not _in_transaction()
+    )
+
+
+def _run(func, args):
+    try:
+        return func(*args)
+    finally:
+        # Pool threads never see request_finished; apply CONN_MAX_AGE here
+        close_old_connections()
+
+
+async def run_concurrently(*calls):
+    """
+    [result] of (func, *args) calls, in order
+    """
+    if not await sync_to_async(_concurrent)():
+        return [await sync_to_async(func)(*args) for func, *args in calls]
+
+    return await asyncio.gather(*(
+        sync_to_async(_run, thread_sensitive=False)(func, args) for func, *args in calls
+    ))
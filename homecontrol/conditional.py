@@ -0,0 +1,122 @@
+"""
+Conditional GET for views whose freshness is cheap to check.
+
+    def _validators(request, module):
+        last_modified, counts = table_state(request.user, Expense.all_objects.filter(user=request.user))
+        return make_etag(request.user.pk, last_modified, *counts), last_modified
+
+    @conditional_get(_validators)
+    def expense_chart(request, module): ...
+
+The validators run before the view. When the browser's If-None-Match /
+If-Modified-Since still match, the response is a 304 and the view (and its
+aggregates) never runs. Validators are built from the database only
+(latest updated_at and row counts), so every worker process agrees on them
+whatever cache it has. Otherwise the view's response gets the ETag and
+Last-Modified headers. Responses are private and revalidated every time
+(Cache-Control: private, no-cache), so a change shows on the next request.
+
+Only GET / HEAD are conditional, and a request with flash messages waiting
+to be shown always renders. ETAG_SALT is part of every ETag: change it
+(RELEASE) on a deploy so pages kept by browsers pick up new templates.
+"""
+import functools
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import F, Func, IntegerField, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """
+    Quoted ETag of the parts (anything with a stable str())
+    """
+    raw = ':'.join(str(part) for part in (getattr(settings, 'ETAG_SALT', ''), *parts))
+    return quote_etag(hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest())
+
+
+def table_state(user, *querysets):
+    """
+    (latest updated_at or None, [row count per queryset]) of the querysets'
+    rows (LogFolder models, all_objects). The counts catch what updated_at
+    misses: hard deletes, and the SET_NULL updates they cascade to.
+    One query, a latest-row and a count subquery per queryset.
+    """
+    columns = []
+    for qs in querysets:
+        columns.append(Subquery(qs.order_by('-updated_at').values('updated_at')[:1]))
+        columns.append(Subquery(
+            qs.order_by().annotate(rows=Func(F('pk'), function='COUNT', output_field=IntegerField())).values('rows')
+        ))
+
+    row = User.objects.filter(pk=user.pk).values_list(*columns).first() or (None, 0) * len(querysets)
+    latest = max((value for value in row[::2] if value is not None), default=None)
+    return latest, list(row[1::2])
+
+
+def _has_messages(request):
+    # len() loads the stored messages without marking them as shown
+    storage = getattr(request, '_messages', None)
+    return bool(storage is not None and len(storage))
+
+
+def _check(request, validators, args, kwargs):
+    """
+    (etag, last_modified timestamp, 304 response or None)
+    """
+    if request.method not in ('GET', 'HEAD') or _has_messages(request):
+        return None, None, None
+
+    etag, last_modified = validators(request, *args, **kwargs)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    return etag, timestamp, response
+
+
+def _set_headers(response, etag, timestamp):
+    if response.status_code not in (200, 304):
+        return response
+
+    if etag and not response.has_header('ETag'):
+        response.headers['ETag'] = etag
+    if timestamp and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(timestamp)
+    if etag or timestamp:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class conditional_get:
+    """
+    Decorator (sync and async views). `validators(request, *args, **kwargs)`
+    returns (etag or None, last modified datetime or None).
+    """
+    def __init__(self, validators):
+        self.validators = validators
+
+    def __call__(self, func):
+        validators = self.validators
+
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(request, *args, **kwargs):
+                if hasattr(request, 'auser'):
+                    # Validators read request.user: reuse the user auser()
+                    # loaded (login_required) instead of a second query
+                    request.user = await request.auser()
+                etag, timestamp, response = await sync_to_async(_check)(request, validators, args, kwargs)
+                if response is None:
+                    response = await func(request, *args, **kwargs)
+                return _set_headers(response, etag, timestamp)
+        else:
+            @functools.wraps(func)
+            def wrapper(request, *args, **kwargs):
+                etag, timestamp, response = _check(request, validators, args, kwargs)
+                if response is None:
+                    response = func(request, *args, **kwargs)
+                return _set_headers(response, etag, timestamp)
+        return wrapper
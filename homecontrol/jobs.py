@@ -0,0 +1,213 @@
+"""
+Lightweight DB-backed job queue.
+
+    @job('finance.expense_summary')
+    def send_expense_summary(user_id, period): ...
+
+    enqueue('finance.expense_summary', {'user_id': 1, 'period': 'weekly'})
+
+enqueue_once() takes a key and queues nothing when a job with that key was
+queued before, so running a scheduler twice does not send mails twice.
+
+Jobs are executed by `manage.py run_workers`. Claiming uses
+SELECT ... FOR UPDATE SKIP LOCKED where the backend supports it; on SQLite
+(which locks the whole database for writes anyway) a conditional UPDATE on
+status = 'pending' makes sure every job is claimed by exactly one worker.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.db import connection, transaction, DatabaseError, close_old_connections
+from django.db.models import F
+from django.utils.timezone import now
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+STALE_AFTER = timedelta(minutes=30)
+
+JOB_REGISTRY = {}
+
+
+class UnknownJob(Exception):
+    pass
+
+
+def job(name):
+    """
+    Register a function as the handler of jobs called `name`
+    """
+    def register(func):
+        JOB_REGISTRY[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=3):
+    if name not in JOB_REGISTRY:
+        raise UnknownJob(f"No job registered as '{name}'.")
+
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=run_at or now(),
+        max_attempts=max_attempts,
+    )
+
+
+def enqueue_once(name, key, payload=None, run_at=None, max_attempts=3):
+    """
+    (job, created): the job queued under `key`, whatever its status
+    """
+    if name not in JOB_REGISTRY:
+        raise UnknownJob(f"No job registered as '{name}'.")
+
+    # all_objects: the key is unique over soft deleted rows too
+    return Job.all_objects.get_or_create(key=key, defaults={
+        'name': name,
+        'payload': payload or {},
+        'run_at': run_at or now(),
+        'max_attempts': max_attempts,
+    })
+
+
+def backoff_delay(attempts):
+    seconds = BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(seconds, BACKOFF_MAX_SECONDS))
+
+
+def worker_name(index=0):
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+# ----------------------------------------------------------------------
+# 🔹 CLAIMING
+# ----------------------------------------------------------------------
+
+def claim_jobs(worker, limit=10):
+    """
+    Atomically move up to `limit` due jobs to running and return them
+    """
+    token = f"{worker}:{uuid.uuid4().hex[:8]}"
+    claimed_at = now()
+
+    with transaction.atomic():
+        due = Job.objects.filter(status=PENDING, run_at__lte=claimed_at).order_by('run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+
+        ids = list(due.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+
+        # status=PENDING guard: a row another worker took in the meantime
+        # is simply not updated here
+        Job.objects.filter(pk__in=ids, status=PENDING).update(
+            status=RUNNING,
+            locked_by=token,
+            locked_at=claimed_at,
+            attempts=F('attempts') + 1,
+        )
+
+    return list(Job.objects.filter(locked_by=token, status=RUNNING).order_by('run_at', 'id'))
+
+
+def release_stale_jobs(older_than=STALE_AFTER):
+    """
+    Put jobs of crashed workers back in the queue
+    """
+    return Job.objects.filter(
+        status=RUNNING,
+        locked_at__lt=now() - older_than,
+    ).update(status=PENDING, locked_by='', locked_at=None)
+
+
+# ----------------------------------------------------------------------
+# 🔹 EXECUTION
+# ----------------------------------------------------------------------
+
+def run_job(job_row):
+    handler = JOB_REGISTRY.get(job_row.name)
+
+    try:
+        if handler is None:
+            raise UnknownJob(f"No job registered as '{job_row.name}'.")
+        handler(**job_row.payload)
+
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) failed, attempt %s", job_row.pk, job_row.name, job_row.attempts)
+
+        if job_row.attempts < job_row.max_attempts:
+            Job.objects.filter(pk=job_row.pk).update(
+                status=PENDING,
+                run_at=now() + backoff_delay(job_row.attempts),
+                locked_by='',
+                locked_at=None,
+                last_error=error,
+            )
+        else:
+            Job.objects.filter(pk=job_row.pk).update(
+                status=FAILED,
+                finished_at=now(),
+                last_error=error,
+            )
+        return False
+
+    Job.objects.filter(pk=job_row.pk).update(
+        status=DONE,
+        finished_at=now(),
+        last_error='',
+    )
+    return True
+
+
+def run_pending(worker, batch_size=10):
+    """
+    Claim and run one batch. Returns the number of jobs executed.
+    """
+    jobs = claim_jobs(worker, limit=batch_size)
+    for job_row in jobs:
+        run_job(job_row)
+    return len(jobs)
+
+
+def work(worker, stop_event=None, poll_interval=5, batch_size=10, once=False):
+    """
+    Worker loop: run batches until the queue is empty (`once`) or
+    `stop_event` is set
+    """
+    release_stale_jobs()
+
+    while stop_event is None or not stop_event.is_set():
+        try:
+            executed = run_pending(worker, batch_size=batch_size)
+        except DatabaseError:
+            # e.g. "database is locked" on SQLite: back off, keep the worker alive
+            logger.exception("Worker %s could not claim jobs", worker)
+            close_old_connections()
+            executed = 0
+
+        if executed:
+            continue
+        if once:
+            break
+
+        if stop_event is not None:
+            stop_event.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
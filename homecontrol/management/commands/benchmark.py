@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from homecontrol.benchmarks import (
+    run_benchmark, load_fixture, load_baseline, save_baseline, compare,
+    DEFAULT_REPEAT, DEFAULT_TOLERANCE, DEFAULT_MIN_MS,
+)
+from homecontrol.perfdata import PerfSeeder, SIZES, test_databases
+
+
+class Command(BaseCommand):
+    help = (
+        "Time and count the queries of every finance and chat URL at several data sizes, "
+        "on test databases created for the run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['small'])
+        parser.add_argument('--keepdb', action='store_true', help="Keep the test databases between runs")
+        parser.add_argument('--no-seed', action='store_true',
+                            help="Benchmark the perf_ data a previous --keepdb run left in the test database")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed of the data")
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Warm requests per URL")
+        parser.add_argument('--only', help="Only view names containing this, e.g. finance:debt")
+        parser.add_argument('--save', metavar='PATH', help="Store the results as the baseline")
+        parser.add_argument('--compare', metavar='PATH', help="Fail on regressions against this baseline")
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help="Allowed relative growth of the median latency")
+        parser.add_argument('--min-ms', type=float, default=DEFAULT_MIN_MS,
+                            help="Ignore latency growth below this many milliseconds")
+
+    def handle(self, *args, **options):
+        if options['no_seed'] and len(options['sizes']) > 1:
+            raise CommandError("--no-seed benchmarks the current data, give a single --sizes label.")
+        if options['no_seed'] and not options['keepdb']:
+            raise CommandError("--no-seed needs --keepdb: the test databases start empty.")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        try:
+            baseline = load_baseline(options['compare']) if options['compare'] else None
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read baseline: {e}")
+
+        sizes = {}
+        setup_test_environment()
+        try:
+            with test_databases(keepdb=options['keepdb']):
+                self.run_sizes(sizes, options)
+        finally:
+            teardown_test_environment()
+
+        if options['save']:
+            save_baseline(options['save'], sizes, options['repeat'])
+            self.stdout.write(f"Baseline saved to {options['save']}")
+
+        if baseline is not None:
+            regressions = compare(sizes, baseline, options['tolerance'], options['min_ms'])
+            for size, name, reason in regressions:
+                self.stderr.write(f"REGRESSION [{size}] {name}: {reason}")
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against {options['compare']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
+
+    def run_sizes(self, sizes, options):
+        for size in options['sizes']:
+            if not options['no_seed']:
+                PerfSeeder(size, seed=options['seed'], stdout=self.stdout).run()
+            try:
+                fixture = load_fixture()
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            sizes[size] = run_benchmark(fixture, repeat=options['repeat'], only=options['only'])
+            self.write_results(size, sizes[size])
+
+    def write_results(self, size, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{size}"))
+        self.stdout.write(
+            f"{'view':<30} {'status':>6} {'cold q':>7} {'q':>4} {'dup':>4} "
+            f"{'cold ms':>8} {'median':>8} {'p95':>8}"
+        )
+        for name, result in results.items():
+            over = result['budget'] is not None and result['queries_cold'] > result['budget']
+            line = (
+                f"{name:<30} {result['status']:>6} {result['queries_cold']:>7} {result['queries']:>4} "
+                f"{result['duplicates']:>4} {result['cold_ms']:>8.1f} {result['median_ms']:>8.1f} "
+                f"{result['p95_ms']:>8.1f}"
+            )
+            if over:
+                line += f"  over budget ({result['budget']})"
+            self.stdout.write(self.style.WARNING(line) if over else line)
@@ -0,0 +1,65 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+
+
+def _worker_main(index, stop_event, options):
+    # Spawned process: Django has to be set up again
+    import django
+    django.setup()
+
+    from homecontrol.jobs import work, worker_name
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(
+        worker_name(index),
+        stop_event=stop_event,
+        poll_interval=options['poll_interval'],
+        batch_size=options['batch_size'],
+        once=options['once'],
+    )
+
+
+class Command(BaseCommand):
+    help = "Run background job workers (see homecontrol/jobs.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--poll-interval', type=float, default=5)
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            from homecontrol.jobs import work, worker_name
+            work(
+                worker_name(),
+                poll_interval=options['poll_interval'],
+                batch_size=options['batch_size'],
+                once=options['once'],
+            )
+            return
+
+        context = multiprocessing.get_context('spawn')
+        stop_event = context.Event()
+
+        def stop(signum, frame):
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        processes = [
+            context.Process(target=_worker_main, args=(i, stop_event, options), daemon=True)
+            for i in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+
+        self.stdout.write(f"Started {len(processes)} workers.")
+
+        for process in processes:
+            process.join()
+
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
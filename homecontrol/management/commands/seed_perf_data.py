@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from homecontrol.perfdata import PerfSeeder, SIZES, clear_perf_data, check_scratch_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Replace the perf_ users with synthetic finance and chat data. "
+        "Only on a scratch database: set PERF_DATA_ALLOWED=1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=list(SIZES), default='small')
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, same seed same data")
+        parser.add_argument('--users', type=int, help="Override the number of users of the size")
+        parser.add_argument('--years', type=int, help="Override the years of expenses of the size")
+        parser.add_argument('--clear', action='store_true', help="Only remove the perf_ users")
+
+    def handle(self, *args, **options):
+        try:
+            check_scratch_database()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['clear']:
+            removed = clear_perf_data()
+            self.stdout.write(self.style.SUCCESS(f"Removed {removed} perf users."))
+            return
+
+        started = time.monotonic()
+        try:
+            seeder = PerfSeeder(
+                options['size'], seed=options['seed'], stdout=self.stdout,
+                users=options['users'], years=options['years'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        counts = seeder.run()
+        summary = ', '.join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded '{options['size']}': {summary} in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from homecontrol.replicas import sync_sqlite_replica, replica_sqlite_path
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database to the local 'replica' file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, help="Keep copying every N seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            pages = sync_sqlite_replica()
+            self.stdout.write(
+                f"Replica {replica_sqlite_path()} synced: {pages} pages "
+                f"in {time.monotonic() - started:.2f}s"
+            )
+
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,352 @@
+"""
+Per-view DB cost and latency.
+
+QueryMetricsMiddleware records, for every request, the number of queries,
+total SQL time, duplicated queries (same SQL fingerprint run more than
+once, the N+1 signature) and template render time.
+Each response carries them in a Server-Timing header (visible in the browser dev tools) and the
+per-view totals of this process are served at /metrics in the Prometheus
+text format.
+
+QUERY_BUDGETS = {'finance:exp_list': 6, ...} caps the queries of a view.
+Going over logs a warning, or raises QueryBudgetExceeded when
+QUERY_BUDGETS_RAISE is on, which BudgetTestRunner does for every test run.
+
+Render time is measured by the TimedTemplates backend, set as the template
+BACKEND in TEMPLATES; it times the templates it hands out, nothing is patched.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template import engines
+from django.template.backends.django import DjangoTemplates, Template
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+logger = logging.getLogger(__name__)
+
+_collector = ContextVar('query_metrics', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TOP_DUPLICATES = 5
+
+_IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)')
+_LITERAL_RE = re.compile(r"'[^']*'|\b\d+\b")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """
+    SQL with literals and IN lists collapsed: the same query shape with
+    different parameters has the same fingerprint
+    """
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _LITERAL_RE.sub('?', sql)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+        self.fingerprints = Counter()
+        self._render_depth = 0
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, seconds):
+        with self._lock:
+            self.queries += 1
+            self.sql_seconds += seconds
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        """
+        {fingerprint: times run} of queries run more than once
+        """
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+    def duplicate_count(self):
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+
+# ----------------------------------------------------------------------
+# 🔹 COLLECTING
+# ----------------------------------------------------------------------
+
+def _execute_wrapper(execute, sql, params, many, context):
+    metrics = _collector.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Connections are per thread; sync_to_async threads included
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        metrics = _collector.get()
+        if metrics is None:
+            return super().render(context, request)
+
+        # render_to_string() from inside a template: time the outer one
+        metrics._render_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics._render_depth -= 1
+            if not metrics._render_depth:
+                metrics.render_seconds += time.perf_counter() - started
+
+
+class TimedTemplates(DjangoTemplates):
+    """
+    The Django template backend, with render time added to the request's
+    metrics. {% include %} / {% extends %} render inside the outer template,
+    so they are part of its time.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def render_timed():
+    return any(isinstance(engine, TimedTemplates) for engine in engines.all())
+
+
+# ----------------------------------------------------------------------
+# 🔹 PER VIEW TOTALS (this process)
+# ----------------------------------------------------------------------
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter()
+            self.queries = Counter()
+            self.duplicate_queries = Counter()
+            self.sql_seconds = defaultdict(float)
+            self.render_seconds = defaultdict(float)
+            self.duration_sum = defaultdict(float)
+            self.duration_buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+            self.budget_exceeded = Counter()
+            self.top_duplicates = defaultdict(Counter)
+
+    def record(self, view, method, status, metrics, duration, over_budget):
+        with self._lock:
+            self.requests[(view, method, str(status))] += 1
+            self.queries[view] += metrics.queries
+            self.duplicate_queries[view] += metrics.duplicate_count()
+            self.sql_seconds[view] += metrics.sql_seconds
+            self.render_seconds[view] += metrics.render_seconds
+            self.duration_sum[view] += duration
+            buckets = self.duration_buckets[view]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[i] += 1
+            if over_budget:
+                self.budget_exceeded[view] += 1
+
+            top = self.top_duplicates[view]
+            top.update(metrics.duplicates())
+            # Keep the label set bounded
+            for sql, _ in top.most_common()[TOP_DUPLICATES:]:
+                del top[sql]
+
+
+registry = MetricsRegistry()
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def prometheus_text():
+    from finance.cache import cache_stats
+
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            lines.append(f'{name}{_labels(**labels)} {value}')
+
+    with registry._lock:
+        requests_by_view = Counter()
+        for (view, method, status), count in registry.requests.items():
+            requests_by_view[view] += count
+
+        metric('ks_http_requests_total', 'counter', 'Requests by view, method and status.', [
+            ({'view': view, 'method': method, 'status': status}, count)
+            for (view, method, status), count in sorted(registry.requests.items())
+        ])
+        metric('ks_db_queries_total', 'counter', 'SQL queries run by view.', [
+            ({'view': view}, count) for view, count in sorted(registry.queries.items())
+        ])
+        metric('ks_db_duplicate_queries_total', 'counter', 'Repeated queries (same fingerprint) by view.', [
+            ({'view': view}, count) for view, count in sorted(registry.duplicate_queries.items())
+        ])
+        metric('ks_db_query_seconds_total', 'counter', 'Time spent in SQL by view.', [
+            ({'view': view}, round(seconds, 6)) for view, seconds in sorted(registry.sql_seconds.items())
+        ])
+        if render_timed():
+            metric('ks_template_render_seconds_total', 'counter', 'Time spent rendering templates by view.', [
+                ({'view': view}, round(seconds, 6)) for view, seconds in sorted(registry.render_seconds.items())
+            ])
+        metric('ks_query_budget_exceeded_total', 'counter', 'Requests over their QUERY_BUDGETS entry.', [
+            ({'view': view}, count) for view, count in sorted(registry.budget_exceeded.items())
+        ])
+
+        lines.append('# HELP ks_http_request_duration_seconds Request latency by view.')
+        lines.append('# TYPE ks_http_request_duration_seconds histogram')
+        for view in sorted(registry.duration_buckets):
+            for bound, count in zip(DURATION_BUCKETS, registry.duration_buckets[view]):
+                lines.append(f'ks_http_request_duration_seconds_bucket{_labels(view=view, le=bound)} {count}')
+            lines.append(f'ks_http_request_duration_seconds_bucket{_labels(view=view, le="+Inf")} {requests_by_view[view]}')
+            lines.append(f'ks_http_request_duration_seconds_sum{_labels(view=view)} {round(registry.duration_sum[view], 6)}')
+            lines.append(f'ks_http_request_duration_seconds_count{_labels(view=view)} {requests_by_view[view]}')
+
+        metric('ks_db_duplicate_query_runs', 'gauge', 'Most repeated query fingerprints by view.', [
+            ({'view': view, 'fingerprint': hashlib.sha1(sql.encode()).hexdigest()[:12], 'sql': sql[:120]}, count)
+            for view, top in sorted(registry.top_duplicates.items())
+            for sql, count in top.most_common()
+        ])
+
+    stats = cache_stats()
+    metric('ks_finance_cache_events_total', 'counter', 'Finance cache hits, misses and invalidations.', [
+        ({'event': event}, count) for event, count in sorted(stats.items())
+    ])
+
+    return '\n'.join(lines) + '\n'
+
+
+# ----------------------------------------------------------------------
+# 🔹 MIDDLEWARE
+# ----------------------------------------------------------------------
+
+def query_budget(view):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view)
+
+
+class QueryMetricsMiddleware:
+    """
+    First in MIDDLEWARE, so session / auth queries are counted too
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            instrument_connection(None, connection)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics, token, started = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _collector.reset(token)
+        return self._finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics, token, started = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _collector.reset(token)
+        return self._finish(request, response, metrics, started)
+
+    def _start(self):
+        metrics = RequestMetrics()
+        return metrics, _collector.set(metrics), time.perf_counter()
+
+    def _finish(self, request, response, metrics, started):
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+
+        budget = query_budget(view)
+        over_budget = budget is not None and metrics.queries > budget
+        registry.record(view, request.method, response.status_code, metrics, duration, over_budget)
+
+        timings = [
+            f'db;dur={metrics.sql_seconds * 1000:.1f};desc="{metrics.queries} queries"',
+            f'dupq;desc="{metrics.duplicate_count()} duplicated"',
+        ]
+        if render_timed():
+            timings.append(f'render;dur={metrics.render_seconds * 1000:.1f}')
+        timings.append(f'total;dur={duration * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+
+        if over_budget:
+            duplicates = '; '.join(f'{count}x {sql[:200]}' for sql, count in metrics.duplicates().items())
+            message = (
+                f"{view} ran {metrics.queries} queries, budget is {budget}"
+                + (f". Duplicated: {duplicates}" if duplicates else "")
+            )
+            if getattr(settings, 'QUERY_BUDGETS_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+
+class BudgetTestRunner(DiscoverRunner):
+    """
+    Test runner that turns query budget overruns into test failures
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGETS_RAISE = True
+        # A private cache: the shared one (files / Redis) outlives the test
+        # database, and its entries would match the new rows' ids
+        self._test_cache = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+        })
+        self._test_cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_cache.disable()
+        super().teardown_test_environment(**kwargs)
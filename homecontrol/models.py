@@ -1,5 +1,75 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.timezone import now
+
+from .audit import current_user_id
+from .signals import soft_delete_changed
+
+
+def stamp_audit_fields(objs, user_id, created=False):
+    for obj in objs:
+        if created and obj.created_by_id is None:
+            obj.created_by_id = user_id
+        obj.updated_by_id = user_id
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        user_id = current_user_id()
+        if user_id is not None:
+            objs = list(objs)
+            stamp_audit_fields(objs, user_id, created=True)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        user_id = current_user_id()
+        if user_id is not None:
+            objs = list(objs)
+            stamp_audit_fields(objs, user_id)
+            fields = [*fields, 'updated_by']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def soft_delete(self):
+        """
+        Mark the rows deleted with one UPDATE. Returns the number of rows.
+        """
+        return self._set_deleted(True)
+
+    def restore(self):
+        return self._set_deleted(False)
+
+    def _set_deleted(self, deleted):
+        rows = self.filter(is_deleted=not deleted)
+
+        with transaction.atomic(using=self.db):
+            # update() sends no model signals: tell rollups / caches / the
+            # search index which rows changed, if anyone listens
+            pks = None
+            if soft_delete_changed.has_listeners(self.model):
+                pks = list(rows.values_list('pk', flat=True))
+                if not pks:
+                    return 0
+
+            changes = {'is_deleted': deleted, 'updated_at': now()}
+            user_id = current_user_id()
+            if user_id is not None:
+                changes['updated_by_id'] = user_id
+            count = rows.update(**changes)
+
+            if pks:
+                soft_delete_changed.send(sender=self.model, pks=pks, deleted=deleted, using=self.db)
+
+        return count
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """
+    Live rows only
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
 
 
 class LogFolder(models.Model):
@@ -19,9 +89,118 @@ class LogFolder(models.Model):
 
     is_deleted = models.BooleanField(default=False)
 
+    # objects hides soft deleted rows (and so do reverse relations, which
+    # use the default manager); all_objects sees everything
+    objects = SoftDeleteManager()
+    all_objects = SoftDeleteQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        user_id = current_user_id()
+        if user_id is not None:
+            stamp_audit_fields([self], user_id, created=self._state.adding)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'updated_by'}
+        super().save(*args, **kwargs)
+
+    def soft_delete(self):
+        """
+        Soft delete one row through save(), so the usual signals run
+        """
+        self.is_deleted = True
+        self.save(update_fields=['is_deleted', 'updated_at'])
+
+    def restore(self):
+        self.is_deleted = False
+        self.save(update_fields=['is_deleted', 'updated_at'])
+
+
+
+
+class ChangeTracked(models.Model):
+    """
+    Rows loaded from the database remember their values, so saves can be
+    diffed into ChangeLog (homecontrol/changelog.py) without a query
+    """
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
+CHANGE_ACTIONS = (
+    ('create', 'Create'),
+    ('update', 'Update'),
+    ('delete', 'Delete'),
+)
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only field diffs of ChangeTracked models, written in batches
+    """
+    model = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=10, choices=CHANGE_ACTIONS)
+    # {field: [old, new]}
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # When the change was committed, not when the batch was written
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['model', 'object_id'], name='changelog_object_idx'),
+        ]
 
+    def __str__(self):
+        return f'{self.action} {self.model}:{self.object_id} at {self.changed_at}'
 
 
+
+
+JOB_STATUS_OPTIONS = (
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+)
+
+
+class Job(LogFolder):
+    """
+    Row in the DB-backed job queue, see homecontrol/jobs.py
+    """
+    name = models.CharField(max_length=100, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    # Set by enqueue_once(): at most one job per key, ever
+    key = models.CharField(max_length=200, null=True, blank=True, unique=True)
+
+    status = models.CharField(max_length=10, choices=JOB_STATUS_OPTIONS, default='pending')
+    run_at = models.DateTimeField()
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            # Claim query: status = pending AND run_at <= now ORDER BY run_at
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
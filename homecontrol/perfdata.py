@@ -0,0 +1,384 @@
+"""
+Synthetic data for benchmarks.
+
+    PERF_DATA_ALLOWED=1 DB_NAME=perf.sqlite3 manage.py seed_perf_data --size medium
+
+creates `perf_` users with a few years of expenses, debts paid by monthly
+EMIs and private conversations full of messages, all with bulk_create.
+Rollups, finance cache versions, inbox counters and the search index are
+brought up to date afterwards, the way the bulk writers of the apps do it.
+
+Seeding clears the previous perf_ users first, with raw deletes that skip
+signals, so it only runs against a test database (`manage.py benchmark`
+builds one, see test_databases()) or a scratch database the settings mark
+with PERF_DATA_ALLOWED. Perf users own their categories: nothing shows up
+in the global (superuser) categories real users see, except the 'debt'
+category the debt views need, created under perf_admin when missing.
+"""
+import datetime
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import setup_databases, teardown_databases
+from django.utils.timezone import localdate
+
+from chat.inbox import record_messages
+from chat.models import Conversation, ConversationMember, Chats, private_hash
+from finance.cache import bump_user_version, bump_category_version
+from finance.models import Expense, ExpenseCategory, ExpenseDailyRollup, Debt, PAYMENT_CHOICES
+from finance.rollups import rebuild_rollups
+from search.index import reindex, remove_instances, EXPENSE, CHAT
+
+
+USER_PREFIX = 'perf_'
+ADMIN_USERNAME = 'perf_admin'
+BATCH_SIZE = 2000
+
+SIZES = {
+    'small': {'users': 3, 'years': 1, 'expenses_per_day': 2, 'debts': 2, 'conversations': 2, 'messages': 100},
+    'medium': {'users': 10, 'years': 2, 'expenses_per_day': 4, 'debts': 4, 'conversations': 5, 'messages': 500},
+    'large': {'users': 25, 'years': 3, 'expenses_per_day': 6, 'debts': 6, 'conversations': 10, 'messages': 2000},
+}
+
+# name: (share of expenses, min amount, max amount)
+CATEGORIES = {
+    'groceries': (30, 50, 2500),
+    'food': (25, 40, 1200),
+    'fuel': (12, 200, 3000),
+    'shopping': (10, 300, 8000),
+    'bills': (8, 200, 4000),
+    'travel': (6, 500, 15000),
+    'health': (5, 100, 6000),
+    'rent': (4, 8000, 25000),
+}
+DEBT_CATEGORY = 'debt'
+
+PAYMENT_MODES = [key for key, label in PAYMENT_CHOICES]
+PAYMENT_WEIGHTS = [25, 50, 15, 10]
+
+NOTE_WORDS = (
+    'petrol pump weekly groceries milk vegetables dinner lunch office cab '
+    'electricity mobile recharge pharmacy doctor movie tickets gift online '
+    'order bakery coffee train flight hotel insurance school fees repair'
+).split()
+
+MESSAGE_WORDS = (
+    'hi hello ok sure thanks tomorrow today evening call me later meeting '
+    'lunch dinner payment sent received bill split train home reached '
+    'see you soon weekend plan done great'
+).split()
+
+
+_test_databases = ContextVar('perf_test_databases', default=False)
+
+
+# ----------------------------------------------------------------------
+# 🔹 WHERE PERF DATA MAY GO
+# ----------------------------------------------------------------------
+
+@contextmanager
+def test_databases(keepdb=False):
+    """
+    Test databases created the way the test runner does, for the duration
+    of the block; perf data may be written to them
+    """
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+    token = _test_databases.set(True)
+    try:
+        yield
+    finally:
+        _test_databases.reset(token)
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+
+
+def check_scratch_database():
+    """
+    Raise ValueError unless perf data may be written to the database
+    """
+    if _test_databases.get() or getattr(settings, 'PERF_DATA_ALLOWED', False):
+        return
+    raise ValueError(
+        "Perf data is only written to test databases (manage.py benchmark) or to a "
+        "scratch database with PERF_DATA_ALLOWED=1 in the environment."
+    )
+
+
+def _batched(objects, size=BATCH_SIZE):
+    for start in range(0, len(objects), size):
+        yield objects[start:start + size]
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, 28))
+
+
+# ----------------------------------------------------------------------
+# 🔹 CLEARING
+# ----------------------------------------------------------------------
+
+def clear_perf_data():
+    """
+    Remove every perf_ user and what they own. Returns the number of users.
+    perf_admin stays, with the 'debt' category it may own: other users'
+    expenses can point at it.
+    """
+    check_scratch_database()
+
+    user_ids = list(
+        User.objects.filter(username__startswith=USER_PREFIX)
+        .exclude(username=ADMIN_USERNAME)
+        .values_list('pk', flat=True)
+    )
+    if not user_ids:
+        return 0
+
+    conversation_ids = list(
+        Conversation.all_objects.filter(users__in=user_ids).values_list('pk', flat=True).distinct()
+    )
+    chats = Chats.all_objects.filter(chat_conversation_id__in=conversation_ids)
+    expenses = Expense.all_objects.filter(user_id__in=user_ids)
+
+    # Search postings are not tied to the rows by a foreign key
+    remove_instances(CHAT, list(chats.values_list('pk', flat=True)))
+    remove_instances(EXPENSE, list(expenses.values_list('pk', flat=True)))
+
+    with transaction.atomic():
+        # Raw deletes: the per row signals (rollups, change log, search)
+        # would make this minutes long and the rows are going away anyway
+        members = ConversationMember.all_objects.filter(conversation_id__in=conversation_ids)
+        members._raw_delete(members.db)
+        chats._raw_delete(chats.db)
+        expenses._raw_delete(expenses.db)
+        rollups = ExpenseDailyRollup.objects.filter(user_id__in=user_ids)
+        rollups._raw_delete(rollups.db)
+        debts = Debt.all_objects.filter(user_id__in=user_ids)
+        debts._raw_delete(debts.db)
+
+        Conversation.all_objects.filter(pk__in=conversation_ids).delete()
+        ExpenseCategory.all_objects.filter(user_id__in=user_ids).delete()
+        User.objects.filter(pk__in=user_ids).delete()
+
+    return len(user_ids)
+
+
+# ----------------------------------------------------------------------
+# 🔹 SEEDING
+# ----------------------------------------------------------------------
+
+class PerfSeeder:
+
+    def __init__(self, size='small', seed=0, stdout=None, **overrides):
+        if size not in SIZES:
+            raise ValueError(f"Size must be one of {', '.join(SIZES)}, not '{size}'.")
+        self.volume = {**SIZES[size], **{key: value for key, value in overrides.items() if value is not None}}
+        self.random = random.Random(seed)
+        self.stdout = stdout
+        self.today = localdate()
+        self.counts = {}
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def run(self):
+        check_scratch_database()
+
+        removed = clear_perf_data()
+        if removed:
+            self.log(f"Removed {removed} previous perf users")
+
+        users = self.create_users()
+        categories = self.create_categories(users)
+        debts = self.create_debts(users)
+        self.create_expenses(users, categories, debts)
+        self.create_conversations(users)
+
+        for user in users:
+            rebuild_rollups(user=user)
+            bump_user_version(user.pk)
+        self.counts['search'] = sum(reindex().values())
+        return self.counts
+
+    # ------------------------------------------------------------------
+    def create_users(self):
+        # Unusable passwords: benchmarks log in with force_login()
+        password = make_password(None)
+        users = [
+            User(username=f'{USER_PREFIX}{i:04d}', email=f'{USER_PREFIX}{i:04d}@example.com', password=password)
+            for i in range(self.volume['users'])
+        ]
+        User.objects.bulk_create(users)
+
+        users = list(
+            User.objects.filter(username__startswith=USER_PREFIX)
+            .exclude(username=ADMIN_USERNAME)
+            .order_by('username')
+        )
+        self.admin, _ = User.objects.get_or_create(
+            username=ADMIN_USERNAME,
+            defaults={'password': password, 'is_superuser': True, 'is_staff': True},
+        )
+        self.counts['users'] = len(users)
+        self.log(f"Created {len(users)} users")
+        return users
+
+    def create_categories(self, users):
+        """
+        {user id: {name: pk}} of the users' own categories. Debt payments
+        use the global 'debt' category, created under perf_admin when missing.
+        """
+        ExpenseCategory.objects.bulk_create([
+            ExpenseCategory(user=user, name=name, slug=f'{USER_PREFIX}{user.pk}_{name}')
+            for user in users for name in CATEGORIES
+        ], batch_size=BATCH_SIZE)
+
+        debt = ExpenseCategory.all_objects.filter(slug=DEBT_CATEGORY).first()
+        if debt is None:
+            debt = ExpenseCategory.objects.create(user=self.admin, name=DEBT_CATEGORY, slug=DEBT_CATEGORY)
+
+        categories = {user.pk: {DEBT_CATEGORY: debt.pk} for user in users}
+        rows = ExpenseCategory.objects.filter(user__in=users).values_list('user_id', 'name', 'pk')
+        for user_id, name, pk in rows:
+            categories[user_id][name] = pk
+
+        # bulk_create skips the signals that refresh the category registries
+        for user in users:
+            bump_category_version(user.pk)
+        return categories
+
+    def create_debts(self, users):
+        start_range = self.volume['years'] * 365
+        debts = []
+        for user in users:
+            for i in range(self.volume['debts']):
+                principal = Decimal(self.random.randrange(20_000, 500_000, 1000))
+                tenure = self.random.choice([12, 24, 36, 48, 60])
+                rate = Decimal(self.random.choice(['0.00', '0.75', '1.00', '1.25']))
+                emi = ((principal + principal * rate / 100 * tenure) / tenure).quantize(Decimal('0.01'))
+                debts.append(Debt(
+                    user=user, created_by=user,
+                    name=f'Loan {i + 1}',
+                    debt_type=self.random.choice(['LOAN', 'EMI', 'BORROW']),
+                    principal_amount=principal,
+                    interest_rate=rate,
+                    tenure_months=tenure,
+                    emi_amount=emi,
+                    start_date=self.today - datetime.timedelta(days=self.random.randrange(30, start_range + 30)),
+                ))
+        Debt.objects.bulk_create(debts, batch_size=BATCH_SIZE)
+
+        debts = list(Debt.objects.filter(user__in=users).order_by('pk'))
+        self.counts['debts'] = len(debts)
+        return debts
+
+    def create_expenses(self, users, categories, debts):
+        names = list(CATEGORIES)
+        weights = [CATEGORIES[name][0] for name in names]
+        days = self.volume['years'] * 365
+        per_day = self.volume['expenses_per_day']
+        total = 0
+
+        for user in users:
+            expenses = []
+            for offset in range(days):
+                day = self.today - datetime.timedelta(days=offset)
+                for _ in range(self.random.randint(0, per_day * 2)):
+                    name = self.random.choices(names, weights)[0]
+                    low, high = CATEGORIES[name][1:]
+                    expenses.append(Expense(
+                        user=user, created_by=user,
+                        category_id=categories[user.pk][name],
+                        amount=Decimal(self.random.randint(low * 100, high * 100)) / 100,
+                        payment_mode=self.random.choices(PAYMENT_MODES, PAYMENT_WEIGHTS)[0],
+                        expense_date=day,
+                        note=' '.join(self.random.sample(NOTE_WORDS, self.random.randint(1, 4))),
+                    ))
+
+            # Monthly EMIs of the user's debts, up to today
+            for debt in debts:
+                if debt.user_id != user.pk:
+                    continue
+                for month in range(debt.tenure_months):
+                    day = _add_months(debt.start_date, month + 1)
+                    if day > self.today:
+                        break
+                    expenses.append(Expense(
+                        user=user, created_by=user,
+                        category_id=categories[user.pk][DEBT_CATEGORY], debt=debt,
+                        amount=debt.emi_amount, payment_mode='bank',
+                        expense_date=day, note=f'{debt.name} EMI {month + 1}',
+                    ))
+
+            with transaction.atomic():
+                for batch in _batched(expenses):
+                    Expense.objects.bulk_create(batch)
+            total += len(expenses)
+
+        self.counts['expenses'] = total
+        self.log(f"Created {total} expenses")
+
+    def create_conversations(self, users):
+        pairs = set()
+        for user in users:
+            others = [other for other in users if other.pk != user.pk]
+            for other in self.random.sample(others, min(self.volume['conversations'], len(others))):
+                pairs.add(tuple(sorted([user.pk, other.pk])))
+        pairs = sorted(pairs)
+
+        Conversation.objects.bulk_create([
+            Conversation(is_group=False, unique_hash=private_hash(low, high)) for low, high in pairs
+        ])
+        conversations = dict(
+            Conversation.objects
+            .filter(unique_hash__in=[private_hash(low, high) for low, high in pairs])
+            .values_list('unique_hash', 'pk')
+        )
+
+        # bulk_create skips m2m_changed, so memberships are written here too
+        Through = Conversation.users.through
+        through_rows, members = [], []
+        for low, high in pairs:
+            conversation_id = conversations[private_hash(low, high)]
+            for user_id in (low, high):
+                through_rows.append(Through(conversation_id=conversation_id, user_id=user_id))
+                members.append(ConversationMember(conversation_id=conversation_id, user_id=user_id))
+        Through.objects.bulk_create(through_rows, batch_size=BATCH_SIZE)
+        ConversationMember.objects.bulk_create(members, batch_size=BATCH_SIZE)
+
+        total = 0
+        for low, high in pairs:
+            conversation_id = conversations[private_hash(low, high)]
+            messages = []
+            for _ in range(self.volume['messages']):
+                sender, receiver = (low, high) if self.random.random() < 0.5 else (high, low)
+                messages.append(Chats(
+                    chat_conversation_id=conversation_id,
+                    sender_id=sender, receiver_id=receiver,
+                    created_by_id=sender, updated_by_id=sender,
+                    chat=' '.join(self.random.sample(MESSAGE_WORDS, self.random.randint(1, 8))),
+                ))
+
+            with transaction.atomic():
+                for batch in _batched(messages):
+                    Chats.objects.bulk_create(batch)
+                if not connection.features.can_return_rows_from_bulk_insert:
+                    # Inbox counters need the ids
+                    messages = list(
+                        Chats.objects.filter(chat_conversation_id=conversation_id)
+                        .only('pk', 'chat_conversation_id', 'sender_id')
+                    )
+                record_messages(messages)
+            total += len(messages)
+
+        self.counts['conversations'] = len(pairs)
+        self.counts['messages'] = total
+        self.log(f"Created {len(pairs)} conversations with {total} messages")
@@ -0,0 +1,208 @@
+"""
+Read-replica routing.
+
+Reads of REPLICA_APPS models go to the 'replica' database only inside
+
+    @replica_reads()
+    def expense_dashboard(request, module): ...
+
+    with replica_reads():
+        ...
+
+(primary_reads() turns it off again, e.g. to fill a cache) and only when the replica is configured (DB_REPLICA_* variables, see
+Overall/database.py). Everything else, all writes and anything inside a
+transaction stay on 'default'.
+
+Read-your-writes: a write routed through ReplicaRouter pins the rest of
+the request to the primary, and ReplicaPinMiddleware sets a short-lived
+cookie so the user's next requests (which may land on another worker)
+also read from the primary until the replica has caught up.
+"""
+import functools
+import os
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+
+DEFAULT_DB = 'default'
+REPLICA_DB = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+# Per request dict {'pinned': bool, 'wrote': bool}; a dict so that writes in
+# sync_to_async threads (copied contexts) are seen by the middleware
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+def replica_apps():
+    return getattr(settings, 'REPLICA_APPS', ('finance', 'chat'))
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 15)
+
+
+def replica_configured():
+    return REPLICA_DB in settings.DATABASES
+
+
+def is_pinned():
+    state = _request_state.get()
+    return bool(state and state['pinned'])
+
+
+def reads_from_replica():
+    """
+    True when reads of REPLICA_APPS models go to the replica right now
+    """
+    return (
+        _replica_reads.get()
+        and replica_configured()
+        and not is_pinned()
+        # A transaction on the primary must see its own rows
+        and not connections[DEFAULT_DB].in_atomic_block
+    )
+
+
+class replica_reads:
+    """
+    Context manager / decorator (sync and async views) allowing replica reads
+    """
+    allowed = True
+
+    def __enter__(self):
+        self._token = _replica_reads.set(self.allowed)
+        return self
+
+    def __exit__(self, *exc):
+        _replica_reads.reset(self._token)
+
+    def __call__(self, func):
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.__class__():
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.__class__():
+                    return func(*args, **kwargs)
+        return wrapper
+
+
+class primary_reads(replica_reads):
+    """
+    Reads inside go to the primary, even within replica_reads()
+    """
+    allowed = False
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in replica_apps() and reads_from_replica():
+            return REPLICA_DB
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and model._meta.app_label in replica_apps():
+            state['pinned'] = state['wrote'] = True
+        return DEFAULT_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB, REPLICA_DB}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, never migrated on its own
+        return db != REPLICA_DB
+
+
+class ReplicaPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    cookie_name = 'replica_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            pinned_until = 0
+        state = {'pinned': pinned_until > time.time(), 'wrote': False}
+        return state, _request_state.set(state)
+
+    def _finish(self, state, token, response):
+        _request_state.reset(token)
+        if state['wrote']:
+            seconds = pin_seconds()
+            response.set_cookie(
+                self.cookie_name, str(time.time() + seconds),
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state, token = self._start(request)
+        response = self.get_response(request)
+        return self._finish(state, token, response)
+
+    async def __acall__(self, request):
+        state, token = self._start(request)
+        response = await self.get_response(request)
+        return self._finish(state, token, response)
+
+
+def replica_sqlite_path():
+    name = str(settings.DATABASES[REPLICA_DB]['NAME'])
+    if name.startswith('file:'):
+        name = name[len('file:'):].split('?', 1)[0]
+    return name
+
+
+def sync_sqlite_replica():
+    """
+    Copy the primary SQLite file to the replica path with the online backup
+    API (consistent snapshot, writers keep going) and swap it in atomically.
+    Returns the number of pages copied.
+    """
+    if not replica_configured():
+        raise ImproperlyConfigured("No 'replica' database configured (DB_REPLICA_NAME).")
+    primary = settings.DATABASES[DEFAULT_DB]
+    if not primary['ENGINE'].endswith('sqlite3'):
+        raise ImproperlyConfigured("Server databases replicate on their own; sync_replica is for SQLite.")
+
+    target = replica_sqlite_path()
+    tmp = f'{target}.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    source = sqlite3.connect(str(primary['NAME']), timeout=primary['OPTIONS'].get('timeout', 5))
+    copy = sqlite3.connect(tmp)
+    try:
+        source.backup(copy)
+        # The copy inherits WAL mode from the primary's header; the
+        # read-only replica connections need a plain journal
+        copy.execute('PRAGMA journal_mode = DELETE')
+        pages = copy.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        copy.close()
+        source.close()
+
+    # Open replica connections keep reading the old file until they reconnect
+    os.replace(tmp, target)
+    return pages
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent by SoftDeleteQuerySet.soft_delete() / restore() after their bulk
+# UPDATE with sender=<model>, pks=[...], deleted=True|False, using=<alias>
+soft_delete_changed = Signal()
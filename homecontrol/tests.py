@@ -1,3 +1,64 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import checks
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .checks import sqlite_transaction_mode
+from .metrics import registry, render_timed
+
+
+class BudgetTestRunnerTests(SimpleTestCase):
+
+    def test_budgets_raise(self):
+        self.assertTrue(settings.QUERY_BUDGETS_RAISE)
+
+    def test_every_budgeted_view_has_a_test(self):
+        from chat.tests import QueryBudgetTests as ChatBudgetTests
+        from finance.tests import QueryBudgetTests as FinanceBudgetTests
+
+        tested = {
+            view_name
+            for case in (FinanceBudgetTests, ChatBudgetTests)
+            for view_name in case.budgeted_views
+        }
+        self.assertEqual(tested, set(settings.QUERY_BUDGETS))
+
+
+class RenderTimingTests(TestCase):
+    """
+    Render time comes from the TimedTemplates backend in TEMPLATES, the
+    same as in production, not from anything the test runner installs
+    """
+
+    def test_render_timed_by_default(self):
+        self.assertTrue(render_timed())
+
+    def test_render_time_reported(self):
+        self.client.force_login(User.objects.create_user('render_user'))
+        registry.reset()
+
+        response = self.client.get(reverse('finance:finance_dashboard', kwargs={'module': 'finance'}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('render;dur=', response['Server-Timing'])
+        self.assertGreater(registry.render_seconds['finance:finance_dashboard'], 0)
+
+
+class DatabaseCheckTests(SimpleTestCase):
+
+    def check_ids(self, **kwargs):
+        return {message.id for message in checks.run_checks(tags=[checks.Tags.database], **kwargs)}
+
+    def test_profile_only_on_deploy(self):
+        self.assertNotIn('homecontrol.I001', self.check_ids())
+        self.assertIn('homecontrol.I001', self.check_ids(include_deployment_checks=True))
+
+    def test_sqlite_without_immediate_transactions(self):
+        self.assertNotIn('homecontrol.W001', self.check_ids())
+        deferred = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+        with mock.patch('homecontrol.checks.settings', DATABASES=deferred):
+            messages = sqlite_transaction_mode(None)
+        self.assertEqual([message.id for message in messages], ['homecontrol.W001'])
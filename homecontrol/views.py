@@ -6,6 +6,11 @@ from django.contrib.auth.decorators import login_required
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_protect
 from django.shortcuts import redirect
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .metrics import prometheus_text
 
 
 
@@ -45,3 +50,19 @@ def dashboard(request):
     messages.warning(request, f"Welcome back, {request.user.username}! You have successfully logged in.")
     messages.info(request, f"Welcome back, {request.user.username}! You have successfully logged in.")
     return render(request, 'index/dashboard.html', context=context)
+
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint: superusers, or `Authorization: Bearer <METRICS_TOKEN>`
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    auth = request.headers.get('Authorization', '')
+    allowed = request.user.is_superuser or (
+        token and auth.startswith('Bearer ') and constant_time_compare(auth[len('Bearer '):], token)
+    )
+    if not allowed:
+        return HttpResponseForbidden("Forbidden")
+
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
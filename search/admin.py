@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import SearchIndexState
+
+# Register your models here.
+
+@admin.register(SearchIndexState)
+class SearchIndexStateList(admin.ModelAdmin):
+    list_display = ('kind', 'indexed_until', 'updated_at')
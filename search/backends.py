@@ -0,0 +1,192 @@
+"""
+Storage for the search index.
+
+FTS5Backend keeps everything in one SQLite FTS5 virtual table; the rowid
+encodes (kind, object id) and the scope is stored as a token of its own
+column, so per-user scoping is part of the MATCH and uses the index.
+
+TableBackend is the portable fallback: an inverted index in SearchPosting
+(one row per term and document), queried with two SELECTs over the
+searched scopes only: the term counts that weight the terms, then the
+grouped match.
+
+Both receive documents as (kind, object_id, scope, terms) where `terms`
+come from search.index.tokenize(), and queries as [(term, is_prefix)].
+"""
+import math
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import Case, When, Value, Count, Max, Sum, F, Q, FloatField, IntegerField
+
+from .models import SearchPosting
+
+
+# rowid = object_id * KIND_SLOTS + code
+KIND_CODES = {'expense': 1, 'chat': 2}
+KIND_SLOTS = 8
+KIND_NAMES = {code: kind for kind, code in KIND_CODES.items()}
+
+MAX_TERM_LENGTH = 64
+
+
+class FTS5Backend:
+    name = 'fts5'
+    table = 'search_fts'
+
+    @classmethod
+    def available(cls):
+        if connection.vendor != 'sqlite':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+    def ensure_schema(self):
+        with connection.cursor() as cursor:
+            # prefix='2 3': short prefix queries read a prebuilt index
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "body, owner, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+
+    @staticmethod
+    def rowid(kind, object_id):
+        return object_id * KIND_SLOTS + KIND_CODES[kind]
+
+    def index(self, documents):
+        removed = [self.rowid(kind, pk) for kind, pk, scope, terms in documents]
+        rows = [
+            (self.rowid(kind, pk), ' '.join(terms), scope)
+            for kind, pk, scope, terms in documents if terms
+        ]
+        with connection.cursor() as cursor:
+            self._delete(cursor, removed)
+            if rows:
+                cursor.executemany(f"INSERT INTO {self.table} (rowid, body, owner) VALUES (%s, %s, %s)", rows)
+
+    def remove(self, kind, ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, [self.rowid(kind, pk) for pk in ids])
+
+    def _delete(self, cursor, rowids):
+        # Stay well below SQLite's bound parameter limit
+        for start in range(0, len(rowids), 500):
+            chunk = rowids[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", chunk)
+
+    def clear(self, kind=None):
+        with connection.cursor() as cursor:
+            if kind is None:
+                cursor.execute(f"DELETE FROM {self.table}")
+            else:
+                cursor.execute(f"DELETE FROM {self.table} WHERE rowid %% {KIND_SLOTS} = %s", [KIND_CODES[kind]])
+
+    def search(self, terms, scopes, limit):
+        body = ' '.join(f'"{term}"*' if prefix else f'"{term}"' for term, prefix in terms)
+        owner = ' OR '.join(f'"{scope}"' for scope in scopes)
+        match = f'body : ({body}) AND owner : ({owner})'
+
+        with connection.cursor() as cursor:
+            # bm25() is lower for better matches; the owner column does not rank
+            cursor.execute(
+                f"SELECT rowid, bm25({self.table}, 1.0, 0.0) AS score FROM {self.table} "
+                f"WHERE {self.table} MATCH %s ORDER BY score LIMIT %s",
+                [match, limit]
+            )
+            return [
+                (KIND_NAMES[rowid % KIND_SLOTS], rowid // KIND_SLOTS, -score)
+                for rowid, score in cursor.fetchall()
+            ]
+
+
+class TableBackend:
+    name = 'table'
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def ensure_schema(self):
+        pass
+
+    def index(self, documents):
+        by_kind = {}
+        for kind, pk, scope, terms in documents:
+            by_kind.setdefault(kind, []).append(pk)
+        for kind, ids in by_kind.items():
+            self.remove(kind, ids)
+
+        SearchPosting.objects.bulk_create([
+            SearchPosting(kind=kind, object_id=pk, scope=scope, term=term, tf=tf)
+            for kind, pk, scope, terms in documents
+            for term, tf in Counter(terms).items()
+        ], batch_size=1000)
+
+    def remove(self, kind, ids):
+        SearchPosting.objects.filter(kind=kind, object_id__in=ids).delete()
+
+    def clear(self, kind=None):
+        postings = SearchPosting.objects.all()
+        if kind is not None:
+            postings = postings.filter(kind=kind)
+        postings._raw_delete(postings.db)
+
+    @staticmethod
+    def _term_q(term, prefix):
+        if prefix:
+            # A range instead of LIKE, so the term index is used
+            return Q(term__gte=term, term__lt=term + '\U0010ffff')
+        return Q(term=term)
+
+    def search(self, terms, scopes, limit):
+        matches = [self._term_q(term, prefix) for term, prefix in terms]
+        in_scope = SearchPosting.objects.filter(scope__in=scopes)
+
+        # Rarer terms weigh more. Counted in the user's scopes, one query on
+        # the (term, scope) index: the cost follows the user's data, not the
+        # corpus, and other users' notes don't change the ranking
+        counts = in_scope.filter(reduce(or_, matches)).aggregate(**{
+            f'df_{i}': Count('pk', filter=q) for i, q in enumerate(matches)
+        })
+        weights = []
+        for i in range(len(matches)):
+            df = counts[f'df_{i}']
+            if not df:
+                return []
+            weights.append(1.0 / (1.0 + math.log(df)))
+
+        hits = {
+            f'hit_{i}': Max(Case(When(q, then=Value(1)), default=Value(0), output_field=IntegerField()))
+            for i, q in enumerate(matches)
+        }
+        score = Sum(Case(
+            *[When(q, then=F('tf') * Value(weight)) for q, weight in zip(matches, weights)],
+            default=Value(0.0),
+            output_field=FloatField(),
+        ))
+
+        postings = in_scope.filter(reduce(or_, matches))
+        if len(matches) > 1:
+            # Only documents that have the rarest term can match at all
+            rarest = matches[weights.index(max(weights))]
+            postings = postings.filter(object_id__in=in_scope.filter(rarest).values('object_id'))
+
+        rows = (
+            postings
+            .values('kind', 'object_id')
+            .annotate(score=score, **hits)
+            # Every term must match
+            .filter(**{name: 1 for name in hits})
+            .order_by('-score', '-object_id')[:limit]
+        )
+        return [(row['kind'], row['object_id'], row['score']) for row in rows]
+
+
+BACKENDS = {
+    FTS5Backend.name: FTS5Backend,
+    TableBackend.name: TableBackend,
+}
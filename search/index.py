@@ -0,0 +1,273 @@
+"""
+Full-text search over chat messages and expense notes.
+
+    from search.index import search
+    search(request.user, 'petrol pum*', kinds=['expense'])
+
+Terms are ANDed; a trailing * makes a prefix query. Expenses are scoped to
+their owner and chat messages to the conversations the user belongs to.
+
+The index is kept up to date by search/signals.py on save/delete and by
+index_instances() from the bulk writers (chat batches, expense import);
+`manage.py reindex_search` catches up on anything else incrementally.
+"""
+import re
+import unicodedata
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils.timezone import now
+
+from .backends import BACKENDS, FTS5Backend, TableBackend, MAX_TERM_LENGTH
+from .models import SearchIndexState
+
+
+EXPENSE = 'expense'
+CHAT = 'chat'
+KINDS = [EXPENSE, CHAT]
+
+MAX_QUERY_TERMS = 8
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+REINDEX_BATCH_SIZE = 2000
+
+TOKEN_RE = re.compile(r'\w+\*?')
+
+
+class Source:
+    """
+    Where documents of one kind come from
+    """
+    def __init__(self, model, text_field, scope_field, scope_prefix):
+        self.model_label = model
+        self.text_field = text_field
+        self.scope_field = scope_field
+        self.scope_prefix = scope_prefix
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def scope(self, value):
+        return f'{self.scope_prefix}{value}'
+
+
+SOURCES = {
+    EXPENSE: Source('finance.Expense', 'note', 'user_id', 'u'),
+    CHAT: Source('chat.Chats', 'chat', 'chat_conversation_id', 'c'),
+}
+
+
+# ----------------------------------------------------------------------
+# 🔹 TOKENIZING
+# ----------------------------------------------------------------------
+
+def normalize(text):
+    """
+    Lower case without diacritics (same as FTS5 unicode61 remove_diacritics)
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in re.findall(r'\w+', normalize(text))]
+
+
+def parse_query(query):
+    """
+    [(term, is_prefix)] of a user query
+    """
+    terms = []
+    for token in TOKEN_RE.findall(normalize(query)):
+        prefix = token.endswith('*')
+        term = token.rstrip('*')[:MAX_TERM_LENGTH]
+        if (term, prefix) not in terms:
+            terms.append((term, prefix))
+    return terms[:MAX_QUERY_TERMS]
+
+
+# ----------------------------------------------------------------------
+# 🔹 BACKEND
+# ----------------------------------------------------------------------
+
+_backend = None
+
+
+def get_backend():
+    """
+    SEARCH_BACKEND = 'auto' (default) uses FTS5 when SQLite has it
+    """
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'SEARCH_BACKEND', 'auto')
+        if name == 'auto':
+            backend_class = FTS5Backend if FTS5Backend.available() else TableBackend
+        else:
+            backend_class = BACKENDS[name]
+
+        backend = backend_class()
+        backend.ensure_schema()
+        _backend = backend
+    return _backend
+
+
+# ----------------------------------------------------------------------
+# 🔹 INDEXING
+# ----------------------------------------------------------------------
+
+def _document(kind, pk, text, scope_value, is_deleted):
+    source = SOURCES[kind]
+    # No terms: the document is only removed
+    terms = [] if is_deleted else tokenize(text)
+    return kind, pk, source.scope(scope_value), terms
+
+
+def index_instances(kind, objects):
+    """
+    (Re)index saved model instances, e.g. right after bulk_create()
+    """
+    source = SOURCES[kind]
+    documents = [
+        _document(
+            kind, obj.pk,
+            getattr(obj, source.text_field),
+            getattr(obj, source.scope_field),
+            obj.is_deleted,
+        )
+        for obj in objects if obj.pk is not None
+    ]
+    if documents:
+        get_backend().index(documents)
+
+
+def remove_instances(kind, ids):
+    if ids:
+        get_backend().remove(kind, list(ids))
+
+
+def reindex(kinds=None, full=False, batch_size=REINDEX_BATCH_SIZE):
+    """
+    Index rows changed since the last run (everything with `full`).
+    Returns {kind: rows indexed}.
+    """
+    backend = get_backend()
+    counts = {}
+
+    for kind in kinds or KINDS:
+        source = SOURCES[kind]
+        state, _ = SearchIndexState.objects.get_or_create(kind=kind)
+        # Taken before reading, so rows saved meanwhile are seen next time
+        started = now()
+
+        # _base_manager: soft deleted rows must still reach the index
+        rows = source.model._base_manager.all()
+        if not full and state.indexed_until is not None:
+            rows = rows.filter(updated_at__gte=state.indexed_until)
+
+        rows = rows.order_by().values_list('pk', source.text_field, source.scope_field, 'is_deleted')
+
+        with transaction.atomic():
+            if full:
+                backend.clear(kind)
+
+            counts[kind] = 0
+            batch = []
+            for pk, text, scope_value, is_deleted in rows.iterator(chunk_size=batch_size):
+                batch.append(_document(kind, pk, text, scope_value, is_deleted))
+                if len(batch) >= batch_size:
+                    backend.index(batch)
+                    counts[kind] += len(batch)
+                    batch = []
+            if batch:
+                backend.index(batch)
+                counts[kind] += len(batch)
+
+            state.indexed_until = started
+            state.save(update_fields=['indexed_until', 'updated_at'])
+
+    return counts
+
+
+# ----------------------------------------------------------------------
+# 🔹 SEARCHING
+# ----------------------------------------------------------------------
+
+def user_scopes(user, kinds):
+    scopes = []
+    if EXPENSE in kinds:
+        scopes.append(SOURCES[EXPENSE].scope(user.pk))
+    if CHAT in kinds:
+        conversation_ids = user.chat_memberships.values_list('conversation_id', flat=True)
+        scopes += [SOURCES[CHAT].scope(pk) for pk in conversation_ids]
+    return scopes
+
+
+def _expense_results(user, ids):
+    Expense = SOURCES[EXPENSE].model
+    rows = (
+        Expense.objects
+        .filter(pk__in=ids, user=user, is_deleted=False)
+        .values('id', 'note', 'amount', 'expense_date', 'category__name')
+    )
+    return {
+        row['id']: {
+            'text': row['note'],
+            'title': f"₹{row['amount']} · {row['category__name'] or 'Uncategorized'}",
+            'date': row['expense_date'].isoformat(),
+            'url': reverse('finance:exp_edit', kwargs={'module': 'finance', 'pk': row['id']}),
+        }
+        for row in rows
+    }
+
+
+def _chat_results(user, ids):
+    Chats = SOURCES[CHAT].model
+    rows = (
+        Chats.objects
+        .filter(pk__in=ids, chat_conversation__members__user=user, is_deleted=False)
+        .values('id', 'chat', 'chat_conversation_id', 'created_at', 'sender__username')
+    )
+    return {
+        row['id']: {
+            'text': row['chat'],
+            'title': row['sender__username'],
+            'date': row['created_at'].isoformat(),
+            'url': f"{reverse('chat:chat_index')}?c={row['chat_conversation_id']}",
+        }
+        for row in rows
+    }
+
+
+def search(user, query, kinds=None, limit=DEFAULT_LIMIT):
+    """
+    Ranked hits for `user`: [{'kind', 'id', 'score', 'text', 'title', 'date', 'url'}]
+    """
+    terms = parse_query(query)
+    kinds = [kind for kind in (kinds or KINDS) if kind in SOURCES]
+    if not terms or not kinds:
+        return []
+
+    scopes = user_scopes(user, kinds)
+    if not scopes:
+        return []
+
+    limit = max(1, min(limit, MAX_LIMIT))
+    hits = get_backend().search(terms, scopes, limit)
+
+    # Rows are read back with the same scoping, so a stale index entry
+    # can never leak another user's data
+    details = {}
+    for kind, loader in ((EXPENSE, _expense_results), (CHAT, _chat_results)):
+        ids = [pk for hit_kind, pk, score in hits if hit_kind == kind]
+        if ids:
+            details[kind] = loader(user, ids)
+
+    results = []
+    for kind, pk, score in hits:
+        detail = details.get(kind, {}).get(pk)
+        if detail is not None:
+            results.append({'kind': kind, 'id': pk, 'score': round(score, 6), **detail})
+    return results
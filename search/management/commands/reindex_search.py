@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from search.index import reindex, get_backend, KINDS, REINDEX_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Index chat messages and expense notes changed since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=KINDS, action='append', help="Only this kind (repeatable)")
+        parser.add_argument('--full', action='store_true', help="Drop and rebuild the index")
+        parser.add_argument('--batch-size', type=int, default=REINDEX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        counts = reindex(
+            kinds=options['kind'],
+            full=options['full'],
+            batch_size=options['batch_size'],
+        )
+        for kind, count in counts.items():
+            self.stdout.write(f"{kind}: {count} rows indexed")
+        self.stdout.write(self.style.SUCCESS(f"Search index up to date ({get_backend().name})"))
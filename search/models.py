@@ -0,0 +1,38 @@
+from django.db import models
+
+
+
+class SearchPosting(models.Model):
+    """
+    Inverted index used when the database has no FTS5 (search/backends.py).
+    One row per (term, document); derived data, rebuilt by reindex_search.
+    """
+    term = models.CharField(max_length=64)
+    kind = models.CharField(max_length=16)
+    object_id = models.PositiveBigIntegerField()
+    scope = models.CharField(max_length=32)
+    tf = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # Term (or term prefix range) inside the scopes of one user
+            models.Index(fields=['term', 'scope'], name='search_term_scope_idx'),
+            # Reindexing / removing one document
+            models.Index(fields=['kind', 'object_id'], name='search_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.term} → {self.kind}:{self.object_id}'
+
+
+
+class SearchIndexState(models.Model):
+    """
+    High-water mark of the incremental reindex, per document kind
+    """
+    kind = models.CharField(max_length=16, unique=True)
+    indexed_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.kind} indexed until {self.indexed_until}'
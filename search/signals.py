@@ -0,0 +1,50 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_save, post_delete, post_migrate
+from django.dispatch import receiver
+
+from chat.models import Chats
+from finance.models import Expense
+from homecontrol.signals import soft_delete_changed
+
+from .index import get_backend, index_instances, remove_instances, EXPENSE, CHAT
+
+
+@receiver(post_migrate)
+def create_search_schema(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # The backend's own table is made with the schema too, not only lazily
+    # on first use, where a transaction rolling back (a TestCase) drops it
+    if sender.name == 'search' and using == DEFAULT_DB_ALIAS:
+        get_backend().ensure_schema()
+
+
+@receiver(post_save, sender=Expense)
+def expense_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_instances(EXPENSE, [instance])
+
+
+@receiver(post_delete, sender=Expense)
+def expense_deleted(sender, instance, **kwargs):
+    remove_instances(EXPENSE, [instance.pk])
+
+
+@receiver(post_save, sender=Chats)
+def chat_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_instances(CHAT, [instance])
+
+
+@receiver(post_delete, sender=Chats)
+def chat_deleted(sender, instance, **kwargs):
+    remove_instances(CHAT, [instance.pk])
+
+
+@receiver(soft_delete_changed, sender=Expense)
+@receiver(soft_delete_changed, sender=Chats)
+def rows_soft_deleted(sender, pks, deleted, **kwargs):
+    kind = EXPENSE if sender is Expense else CHAT
+    if deleted:
+        remove_instances(kind, pks)
+    else:
+        for start in range(0, len(pks), 500):
+            index_instances(kind, sender.all_objects.filter(pk__in=pks[start:start + 500]))
@@ -0,0 +1,116 @@
+from datetime import date
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from chat.inbox import send_message
+from chat.models import Conversation
+from finance.models import Expense
+
+from .backends import FTS5Backend, TableBackend
+from .index import search, EXPENSE, CHAT
+
+
+class SearchTestsMixin:
+    """
+    The same behaviour for every backend: `backend_class` is patched in as
+    the process-wide backend, so the save / delete signals index into it.
+    """
+    backend_class = None
+
+    @classmethod
+    def setUpClass(cls):
+        backend = cls.backend_class()
+        backend.ensure_schema()
+        cls._backend_patch = mock.patch('search.index._backend', backend)
+        cls._backend_patch.start()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._backend_patch.stop()
+
+    def setUp(self):
+        self.user = User.objects.create_user('search_user')
+        self.other = User.objects.create_user('search_other')
+
+    def expense(self, user, note):
+        return Expense.objects.create(
+            user=user, amount=10, payment_mode='cash', expense_date=date.today(), note=note,
+        )
+
+    def ids(self, user, query, kinds=None):
+        return [(hit['kind'], hit['id']) for hit in search(user, query, kinds=kinds)]
+
+    def test_indexed_on_save(self):
+        expense = self.expense(self.user, 'Petrol at the highway pump')
+        self.assertEqual(self.ids(self.user, 'petrol'), [(EXPENSE, expense.pk)])
+
+        expense.note = 'Diesel'
+        expense.save()
+        self.assertEqual(self.ids(self.user, 'petrol'), [])
+        self.assertEqual(self.ids(self.user, 'diesel'), [(EXPENSE, expense.pk)])
+
+    def test_every_term_must_match(self):
+        both = self.expense(self.user, 'petrol pump')
+        self.expense(self.user, 'petrol station')
+        self.assertEqual(self.ids(self.user, 'petrol pump'), [(EXPENSE, both.pk)])
+
+    def test_prefix(self):
+        expense = self.expense(self.user, 'Groceries for the week')
+        self.assertEqual(self.ids(self.user, 'groc*'), [(EXPENSE, expense.pk)])
+        self.assertEqual(self.ids(self.user, 'groc'), [])
+
+    def test_scoped_to_owner(self):
+        own = self.expense(self.user, 'Rent for March')
+        self.expense(self.other, 'Rent for March')
+        self.assertEqual(self.ids(self.user, 'rent'), [(EXPENSE, own.pk)])
+
+    def test_chat_scoped_to_members(self):
+        conversation, _ = Conversation.objects.get_or_create_private(self.user, self.other)
+        message = send_message(conversation, self.other, 'Dinner on friday?', receiver=self.user)
+        outsider = User.objects.create_user('search_outsider')
+
+        self.assertEqual(self.ids(self.user, 'dinner', kinds=[CHAT]), [(CHAT, message.pk)])
+        self.assertEqual(self.ids(outsider, 'dinner', kinds=[CHAT]), [])
+
+    def test_removed_on_delete(self):
+        deleted = self.expense(self.user, 'Movie tickets')
+        soft_deleted = self.expense(self.user, 'Movie snacks')
+
+        deleted.delete()
+        Expense.objects.filter(pk=soft_deleted.pk).soft_delete()
+        self.assertEqual(self.ids(self.user, 'movie'), [])
+
+        Expense.all_objects.filter(pk=soft_deleted.pk).restore()
+        self.assertEqual(self.ids(self.user, 'movie'), [(EXPENSE, soft_deleted.pk)])
+
+    def test_ranking_ignores_other_users(self):
+        rare = self.expense(self.user, 'taxi')
+        common = self.expense(self.user, 'lunch lunch')
+        for _ in range(3):
+            self.expense(self.user, 'taxi home')
+        # Lots of 'lunch' elsewhere must not make it the rarer term here
+        for _ in range(20):
+            self.expense(self.other, 'lunch')
+
+        hits = self.ids(self.user, 'lunch')
+        self.assertEqual(hits, [(EXPENSE, common.pk)])
+        self.assertIn((EXPENSE, rare.pk), self.ids(self.user, 'taxi'))
+
+
+class TableBackendTests(SearchTestsMixin, TestCase):
+    backend_class = TableBackend
+
+    def test_term_weights_use_one_query(self):
+        self.expense(self.user, 'petrol pump')
+        # Term counts in the user's scopes, matches, expense rows
+        with self.assertNumQueries(3):
+            search(self.user, 'petrol pum*', kinds=[EXPENSE])
+
+
+@skipUnless(FTS5Backend.available(), "SQLite without FTS5")
+class FTS5BackendTests(SearchTestsMixin, TestCase):
+    backend_class = FTS5Backend
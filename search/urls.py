@@ -0,0 +1,9 @@
+from django.urls import path
+from search import views
+
+app_name = 'search'
+
+urlpatterns = [
+    path('', views.search_page, name='search'),
+    path('api/', views.search_api, name='search_api'),
+]
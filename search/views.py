@@ -0,0 +1,36 @@
+from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from .index import search, KINDS, DEFAULT_LIMIT
+
+
+def _search_params(request):
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind')
+    kinds = [kind] if kind in KINDS else None
+    try:
+        limit = int(request.GET.get('limit') or DEFAULT_LIMIT)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    return query, kinds, limit
+
+
+@login_required
+def search_page(request):
+    query, kinds, limit = _search_params(request)
+    context = {
+        'query': query,
+        'kind': kinds[0] if kinds else '',
+        'results': search(request.user, query, kinds=kinds, limit=limit) if query else [],
+    }
+    return render(request, 'search_results.html', context=context)
+
+
+@login_required
+def search_api(request):
+    query, kinds, limit = _search_params(request)
+    return JsonResponse({
+        'query': query,
+        'results': search(request.user, query, kinds=kinds, limit=limit),
+    })